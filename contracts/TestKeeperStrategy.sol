@@ -0,0 +1,42 @@
+// SPDX-License-Identifier: AGPL-3.0
+pragma solidity 0.6.12;
+
+// Stand-in for a Strategy with the keeper surface only (triggers, tend and
+// harvest), so the keeper executor can be exercised without Maker state
+contract TestKeeperStrategy {
+    uint256 public tends;
+    uint256 public harvests;
+
+    bool internal shouldTend;
+    bool internal shouldHarvest;
+    bool internal revertCalls;
+
+    function setTriggers(bool _shouldTend, bool _shouldHarvest) external {
+        shouldTend = _shouldTend;
+        shouldHarvest = _shouldHarvest;
+    }
+
+    function setRevertCalls(bool _revertCalls) external {
+        revertCalls = _revertCalls;
+    }
+
+    function tendTrigger(uint256) external view returns (bool) {
+        return shouldTend;
+    }
+
+    function harvestTrigger(uint256) external view returns (bool) {
+        return shouldHarvest;
+    }
+
+    function tend() external {
+        require(!revertCalls, "!tend");
+        tends = tends + 1;
+        shouldTend = false;
+    }
+
+    function harvest() external {
+        require(!revertCalls, "!harvest");
+        harvests = harvests + 1;
+        shouldHarvest = false;
+    }
+}
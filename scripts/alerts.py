@@ -0,0 +1,213 @@
+from pathlib import Path
+
+from scripts.metadata_cache import DEFAULT_CACHE_PATH
+from scripts.triggers import (
+    MIN_MINTABLE,
+    Revert,
+    balance_of_dai_available_to_mint,
+    binding_source,
+)
+
+import json
+import os
+import threading
+import time
+
+DEFAULT_ALERTS_PATH = DEFAULT_CACHE_PATH.parent / "alerts.json"
+
+# Fraction of the threshold a value has to move back past before the
+# condition is considered cleared: of rebalanceTolerance for the band, of the
+# debt for profit/loss and of MIN_MINTABLE for the debt ceiling
+DEFAULT_HYSTERESIS = {"band": 0.1, "pnl": 0.001, "mintable": 0.1}
+
+# Levels reported the first time a strategy is seen, the others are only
+# reported when they are reached
+ALERT_LEVELS = {
+    "band": {"below", "above"},
+    "pnl": {"loss"},
+    "mintable": {"low"},
+    "read": {"failed"},
+}
+
+MESSAGES = {
+    ("band", "below"): "c-ratio fell below the rebalance band",
+    ("band", "above"): "c-ratio rose above the rebalance band",
+    ("band", "inside"): "c-ratio is back inside the rebalance band",
+    ("band", "idle"): "no debt left",
+    ("pnl", "loss"): "position flipped to a loss",
+    ("pnl", "profit"): "position is back in profit",
+    ("mintable", "low"): "DAI available to mint under MIN_MINTABLE",
+    ("mintable", "ok"): "DAI available to mint back above MIN_MINTABLE",
+    ("read", "failed"): "strategy can not be read",
+    ("read", "ok"): "strategy can be read again",
+}
+
+
+class Alert:
+    def __init__(self, strategy, condition, previous, current):
+        self.strategy = strategy
+        self.condition = condition
+        self.previous = previous
+        self.current = current
+
+    def __eq__(self, other):
+        return isinstance(other, Alert) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return (
+            f"<Alert {self.condition} {self.previous} -> {self.current} "
+            f"{self.strategy}>"
+        )
+
+
+def format_alert(alert):
+    if alert.condition == "binding":
+        return f"binding price source changed from {alert.previous} to {alert.current}"
+    return MESSAGES[alert.condition, alert.current]
+
+
+def _unknown(snapshot, *keys):
+    # Fields that came back None from a call that reverted in tryAggregate
+    # leave the level unknown (None), the last known one is kept
+    return any(snapshot[key] is None for key in keys)
+
+
+def band_level(snapshot, previous, hysteresis):
+    # Where getCurrentMakerVaultRatio sits against
+    # collateralizationRatio +/- rebalanceTolerance, as tendTrigger sees it
+    keys = ("debt", "current_ratio", "collateralization_ratio", "rebalance_tolerance")
+    if _unknown(snapshot, *keys):
+        return None
+    if snapshot["debt"] == 0:
+        return "idle"
+    ratio = snapshot["current_ratio"]
+    target = snapshot["collateralization_ratio"]
+    tolerance = snapshot["rebalance_tolerance"]
+    lower, upper = target - tolerance, target + tolerance
+    margin = tolerance * hysteresis
+    if previous == "below" and ratio < lower + margin:
+        return "below"
+    if previous == "above" and ratio > upper - margin:
+        return "above"
+    if ratio < lower:
+        return "below"
+    if ratio > upper:
+        return "above"
+    return "inside"
+
+
+def pnl_level(snapshot, previous, hysteresis):
+    if _unknown(snapshot, "shares", "price_per_share", "yvault_decimals", "debt"):
+        return None
+    value = (
+        snapshot["shares"]
+        * snapshot["price_per_share"]
+        // 10 ** snapshot["yvault_decimals"]
+    )
+    debt = snapshot["debt"]
+    if previous == "loss" and value < debt + debt * hysteresis:
+        return "loss"
+    return "loss" if value < debt else "profit"
+
+
+def mintable_level(snapshot, previous, hysteresis):
+    if _unknown(snapshot, "line", "Art", "rate"):
+        return None
+    available = balance_of_dai_available_to_mint(snapshot)
+    if previous == "low" and available < MIN_MINTABLE * (1 + hysteresis):
+        return "low"
+    return "low" if available < MIN_MINTABLE else "ok"
+
+
+class AlertEngine:
+    # Keeps the last known level of every condition of every strategy and
+    # only reports changes:
+    #  - band: c-ratio below, inside or above the rebalanceTolerance band
+    #  - pnl: value of the yVault shares against the debt
+    #  - binding: price source _getCollateralPrice uses (trigger states only)
+    #  - mintable: DAI left under the debt ceiling against MIN_MINTABLE
+    #  - read: whether the strategy could be read at all
+    # Numeric conditions only clear once they move back past the threshold by
+    # their `hysteresis`. After an alert a condition stays quiet for
+    # `quiet_period` seconds, a level that still differs from the last one
+    # reported is reported once that is over. State is kept in `path` (None
+    # to keep it in memory) so cron runs pick up where the last one stopped.
+    def __init__(
+        self,
+        path=DEFAULT_ALERTS_PATH,
+        hysteresis=None,
+        quiet_period=3600,
+        clock=time.time,
+    ):
+        self.path = None if path is None else Path(path)
+        self.hysteresis = dict(DEFAULT_HYSTERESIS, **(hysteresis or {}))
+        self.quiet_period = quiet_period
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = {}
+        if self.path is not None:
+            try:
+                with open(self.path) as f:
+                    self._state = json.load(f)
+            except (FileNotFoundError, ValueError):
+                pass
+
+    def levels(self, snapshot):
+        previous = {
+            condition: entry["level"]
+            for condition, entry in self._state.get(snapshot["strategy"], {}).items()
+        }
+        levels = {"read": "ok"}
+        for condition, level in (
+            ("band", band_level),
+            ("pnl", pnl_level),
+            ("mintable", mintable_level),
+        ):
+            levels[condition] = level(
+                snapshot, previous.get(condition), self.hysteresis[condition]
+            )
+        if "osm_current" in snapshot:
+            try:
+                levels["binding"] = binding_source(snapshot)
+            except (Revert, TypeError):
+                pass
+        return levels
+
+    def evaluate(self, snapshot):
+        return self.observe(snapshot["strategy"], self.levels(snapshot))
+
+    def observe(self, strategy, levels):
+        # Record the levels seen for a strategy, returns the Alerts to send
+        now = self.clock()
+        alerts = []
+        with self._lock:
+            entries = self._state.setdefault(strategy, {})
+            for condition, level in levels.items():
+                if level is None:
+                    continue
+                entry = entries.get(condition)
+                if entry is None:
+                    entries[condition] = {"level": level, "notified": level, "at": None}
+                    if level in ALERT_LEVELS.get(condition, ()):
+                        entries[condition]["at"] = now
+                        alerts.append(Alert(strategy, condition, None, level))
+                    continue
+
+                entry["level"] = level
+                if level == entry["notified"]:
+                    continue
+                if entry["at"] is not None and now - entry["at"] < self.quiet_period:
+                    continue
+                alerts.append(Alert(strategy, condition, entry["notified"], level))
+                entry["notified"], entry["at"] = level, now
+            self._save()
+        return alerts
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,177 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from eth_utils import to_checksum_address
+from scripts.daemon import MonitorDaemon
+from scripts.ilks import AMOUNTS, scan
+from scripts.metadata_cache import MetadataCache
+from scripts.multicall import MULTICALL2_ADDRESS, install_read_cache
+from scripts.read_cache import ReadCache
+from scripts.registry import DEFAULT_REGISTRY, load_registry, load_strategies
+from scripts.stream import plain, to_record
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+CONTENT_TYPE = "application/json"
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 512
+
+
+class Response:
+    # A rendered JSON body with its ETag and gzipped copy, built once and sent
+    # as is to every client
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(",", ":")).encode()
+        digest = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+        self.etag = f'"{digest}"'
+        self.gzipped = None
+        if len(self.body) >= GZIP_MIN_SIZE:
+            self.gzipped = gzip.compress(self.body, compresslevel=6)
+
+
+class ApiCache:
+    # Every response the API can give for the current block, rendered when
+    # the block is published. Requests only look them up, so any number of
+    # dashboards polling it add no RPC calls. History ranges are read from the
+    # SnapshotStore (no RPC either) and kept until the next block.
+    def __init__(self, history=None, max_history_entries=1024):
+        self.history = history
+        self.max_history_entries = max_history_entries
+        self.block = None
+        self._responses = {}
+        self._history = {}
+        self._lock = threading.Lock()
+
+    def publish(self, block, snapshots, ilks=()):
+        # Render the fleet and ilks as of `block` and swap them in at once
+        records = {s["strategy"]: to_record(s) for s in snapshots}
+        rows = {row["name"]: plain(row, AMOUNTS) for row in ilks}
+        responses = {
+            "/": Response({"block": block}),
+            "/strategies": Response(
+                {"block": block, "strategies": list(records.values())}
+            ),
+            "/ilks": Response({"block": block, "ilks": list(rows.values())}),
+        }
+        for strategy, record in records.items():
+            responses[f"/strategies/{strategy.lower()}"] = Response(record)
+        for name, row in rows.items():
+            response = Response(dict(row, block=block))
+            responses[f"/ilks/{name.lower()}"] = response
+            responses[f"/ilks/{row['ilk']}"] = response
+        with self._lock:
+            self.block = block
+            self._responses = responses
+            self._history = {}
+
+    def get(self, path, query=None):
+        # Response for the request path, None when there is nothing there
+        path = path.rstrip("/").lower() or "/"
+        response = self._responses.get(path)
+        if response is not None or self.history is None:
+            return response
+
+        parts = path.split("/")
+        if len(parts) != 4 or parts[1] != "strategies" or parts[3] != "history":
+            return None
+        if f"/strategies/{parts[2]}" not in self._responses:
+            return None
+        query = query or {}
+        start, end = _int(query.get("start")), _int(query.get("end"))
+        key = (parts[2], start, end)
+        with self._lock:
+            response = self._history.get(key)
+        if response is None:
+            rows = self.history.query(to_checksum_address(parts[2]), start, end)
+            response = Response({"block": self.block, "history": rows})
+            with self._lock:
+                if len(self._history) >= self.max_history_entries:
+                    self._history.clear()
+                self._history[key] = response
+        return response
+
+
+def _int(values):
+    return None if not values else int(values[0])
+
+
+def serve(cache, host="0.0.0.0", port=9102):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            try:
+                response = cache.get(url.path, parse_qs(url.query))
+            except ValueError:
+                self.send_error(400)
+                return
+            if response is None:
+                self.send_error(404)
+                return
+
+            etags = [
+                tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")
+            ]
+            if response.etag in etags or "*" in etags:
+                self.send_response(304)
+                self.send_header("ETag", response.etag)
+                self.end_headers()
+                return
+
+            body = response.body
+            encoding = self.headers.get("Accept-Encoding", "")
+            compress = response.gzipped is not None and "gzip" in encoding
+            if compress:
+                body = response.gzipped
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            if compress:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(registry=DEFAULT_REGISTRY, port=9102, poll_interval=1):
+    # One MonitorDaemon and ilk scan for every dashboard: only the strategies
+    # something happened to are read again, then the whole API is published
+    # for the new block
+    from scripts.history import SnapshotStore
+
+    install_read_cache(ReadCache())
+    history = SnapshotStore()
+    cache = ApiCache(history)
+    daemon = MonitorDaemon(
+        load_strategies(registry),
+        history.append,
+        cache=MetadataCache(),
+        max_workers=load_registry(registry).get("max_workers", 16),
+    )
+    server = serve(cache, port=int(port))
+    host, port = server.server_address
+    print(f"Serving strategy state on http://{host}:{port}/strategies")
+    ilks = []
+    while True:
+        daemon.poll()
+        if daemon.block != cache.block:
+            try:
+                ilks = scan(daemon.block, MULTICALL2_ADDRESS)
+            except Exception as e:
+                # Keep serving the last scan
+                print(f"Failed to scan ilks at block {daemon.block}: {e!r}")
+            cache.publish(daemon.block, daemon.snapshots.values(), ilks)
+        time.sleep(float(poll_interval))
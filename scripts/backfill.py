@@ -0,0 +1,206 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from eth_utils import to_checksum_address
+from scripts.client import connect, endpoint_uri
+from scripts.history import SnapshotStore
+from scripts.metadata_cache import DEFAULT_CACHE_PATH
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate, install_read_cache
+from scripts.read_cache import ReadCache
+from scripts.registry import DEFAULT_REGISTRY, load_strategies
+
+import json
+import os
+
+DEFAULT_CHECKPOINT_PATH = DEFAULT_CACHE_PATH.parent / "backfill.json"
+
+# About one hour of mainnet blocks
+DEFAULT_STEP = 300
+
+# key, getter read on the strategy at every block. Its yvDAI shares and their
+# price are read on the yVault.
+STRATEGY_READS = [
+    ("collateral", "balanceOfMakerVault()(uint256)"),
+    ("debt", "balanceOfDebt()(uint256)"),
+    ("current_ratio", "getCurrentMakerVaultRatio()(uint256)"),
+    ("estimated_total_assets", "estimatedTotalAssets()(uint256)"),
+    ("yvault", "yVault()(address)"),
+]
+
+
+def main(
+    start_block,
+    end_block,
+    step=DEFAULT_STEP,
+    registry=DEFAULT_REGISTRY,
+    processes=None,
+):
+    store = SnapshotStore()
+    blocks = backfill(
+        load_strategies(registry),
+        int(start_block),
+        int(end_block),
+        int(step),
+        store,
+        processes=None if processes is None else int(processes),
+    )
+    store.close()
+    print(f"Backfilled {blocks} blocks")
+
+
+def backfill(
+    strategies,
+    start_block,
+    end_block,
+    step=DEFAULT_STEP,
+    store=None,
+    checkpoint=DEFAULT_CHECKPOINT_PATH,
+    processes=None,
+    chunk_size=24,
+    multicall_address=MULTICALL2_ADDRESS,
+):
+    # Reads every `step` blocks between start_block and end_block (inclusive)
+    # on a process pool. Each worker handles chunks of `chunk_size` blocks with
+    # one multicall per block for the whole fleet. Finished chunks are
+    # recorded in `checkpoint`, running the same job again only reads the
+    # chunks that are missing. Returns the number of blocks read.
+    strategies = [to_checksum_address(str(s)) for s in strategies]
+    blocks = list(range(start_block, end_block + 1, step))
+    chunks = [blocks[i : i + chunk_size] for i in range(0, len(blocks), chunk_size)]
+
+    job = dict(strategies=strategies, start=start_block, end=end_block, step=step)
+    done = _load_checkpoint(checkpoint, job)
+    todo = [chunk for chunk in chunks if chunk[0] not in done]
+    if not todo:
+        return 0
+
+    read = 0
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=_init_worker, initargs=(endpoint_uri(),),
+    ) as executor:
+        futures = {
+            executor.submit(read_blocks, strategies, chunk, multicall_address): chunk
+            for chunk in todo
+        }
+        for future in as_completed(futures):
+            chunk = futures[future]
+            records = future.result()
+            if store is not None:
+                store.append_many(records)
+            done.add(chunk[0])
+            _save_checkpoint(checkpoint, job, done)
+            read += len(chunk)
+    return read
+
+
+def read_blocks(strategies, blocks, multicall_address=MULTICALL2_ADDRESS):
+    # Records of every strategy deployed at each block, in block order
+    wiring = resolve_wiring(strategies, blocks[0], multicall_address)
+    records = []
+    for block in blocks:
+        block_records = read_block(strategies, wiring, block, multicall_address)
+        if block_records is None:
+            # A yVault migration or a new deployment happened, re-resolve
+            wiring = resolve_wiring(strategies, block, multicall_address)
+            block_records = read_block(strategies, wiring, block, multicall_address)
+        records += block_records or []
+    return records
+
+
+def resolve_wiring(strategies, block, multicall_address=MULTICALL2_ADDRESS):
+    # yVault and decimals of every strategy already deployed at `block`
+    _, values = aggregate(
+        [Call(s, "yVault()(address)") for s in strategies]
+        + [Call(s, "want()(address)") for s in strategies],
+        block,
+        multicall_address,
+    )
+    live = [
+        (s, yvault, want)
+        for s, yvault, want in zip(
+            strategies, values[: len(strategies)], values[len(strategies) :]
+        )
+        if yvault is not None and want is not None
+    ]
+    _, decimals = aggregate(
+        [
+            call
+            for _, yvault, want in live
+            for call in (
+                Call(yvault, "decimals()(uint256)"),
+                Call(want, "decimals()(uint8)"),
+            )
+        ],
+        block,
+        multicall_address,
+    )
+    return {
+        s: dict(
+            yvault=yvault,
+            yvault_decimals=decimals[2 * i],
+            want_decimals=decimals[2 * i + 1],
+        )
+        for i, (s, yvault, _) in enumerate(live)
+    }
+
+
+def read_block(strategies, wiring, block, multicall_address=MULTICALL2_ADDRESS):
+    # One multicall for the whole fleet. Returns None when the wiring is stale
+    # at this block (yVault moved or a strategy got deployed).
+    calls = [Call(multicall_address, "getCurrentBlockTimestamp()(uint256)")]
+    for s in strategies:
+        if s in wiring:
+            yvault = wiring[s]["yvault"]
+            calls += [Call(s, signature) for _, signature in STRATEGY_READS]
+            calls += [
+                Call(yvault, "balanceOf(address)(uint256)", [s]),
+                Call(yvault, "pricePerShare()(uint256)"),
+            ]
+        else:
+            calls.append(Call(s, "yVault()(address)"))
+    _, values = aggregate(calls, block, multicall_address)
+
+    timestamp, values = values[0], iter(values[1:])
+    records = []
+    for s in strategies:
+        if s not in wiring:
+            if next(values) is not None:
+                return None
+            continue
+        record = dict(strategy=s, block=block, timestamp=timestamp, **wiring[s])
+        for key, _ in STRATEGY_READS:
+            record[key] = next(values)
+        record["shares"] = next(values)
+        record["price_per_share"] = next(values)
+        if record["yvault"] != wiring[s]["yvault"]:
+            return None
+        if None not in record.values():
+            records.append(record)
+    return records
+
+
+def _init_worker(uri):
+    # Every worker gets its own connection and read cache
+    connect(uri)
+    install_read_cache(ReadCache(maxsize=4096))
+
+
+def _load_checkpoint(path, job):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return set()
+    # A checkpoint only applies to the exact same job
+    if data.get("job") != job:
+        return set()
+    return set(data["done"])
+
+
+def _save_checkpoint(path, job, done):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"job": job, "done": sorted(done)}, f)
+    os.replace(tmp, path)
@@ -0,0 +1,142 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.client import web3
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+from scripts.snapshot import BASE_FEE_ORACLE
+from scripts.triggers import ZERO_ADDRESS
+
+import math
+
+# EIP-1559 parameters
+BASE_FEE_MAX_CHANGE_DENOMINATOR = 8
+ELASTICITY_MULTIPLIER = 2
+
+
+def next_base_fee(base_fee, gas_used, gas_limit):
+    # Base fee of the block following one with these values (EIP-1559)
+    target = gas_limit // ELASTICITY_MULTIPLIER
+    if gas_used == target:
+        return base_fee
+    delta = base_fee * abs(gas_used - target) // target
+    delta //= BASE_FEE_MAX_CHANGE_DENOMINATOR
+    if gas_used > target:
+        return base_fee + max(delta, 1)
+    return base_fee - delta
+
+
+class BaseFeeForecaster:
+    # Predicts when IBaseFee(baseFeeOracle).isCurrentBaseFeeAcceptable() will
+    # next return true, from the last `window` block headers:
+    #  - the next block's base fee is known exactly from the latest header
+    #  - further out, the base fee is projected with the distribution of its
+    #    changes over the same number of blocks within the window
+    #  - it cannot fall faster than 12.5% a block, horizons that would need
+    #    more are never considered
+    def __init__(
+        self,
+        oracle=BASE_FEE_ORACLE,
+        multicall_address=MULTICALL2_ADDRESS,
+        window=512,
+        block_time=12,
+        max_workers=16,
+    ):
+        self.oracle = oracle
+        self.multicall_address = multicall_address
+        self.block_time = block_time
+        self.max_workers = max_workers
+        # (number, timestamp, base fee, gas used, gas limit)
+        self.headers = deque(maxlen=window)
+
+        self.threshold = None
+        self.provider = None
+        self.manual_acceptable = None
+
+    def update(self, block_identifier="latest"):
+        latest = web3.eth.get_block(block_identifier)
+        first = latest["number"] - self.headers.maxlen + 1
+        if self.headers:
+            first = max(first, self.headers[-1][0] + 1)
+        numbers = range(max(first, 0), latest["number"])
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            blocks = list(executor.map(web3.eth.get_block, numbers))
+        for block in blocks + [latest]:
+            if self.headers and block["number"] <= self.headers[-1][0]:
+                continue
+            self.headers.append(
+                (
+                    block["number"],
+                    block["timestamp"],
+                    block["baseFeePerGas"],
+                    block["gasUsed"],
+                    block["gasLimit"],
+                )
+            )
+
+        _, (self.threshold, self.provider, self.manual_acceptable) = aggregate(
+            [
+                Call(self.oracle, "maxAcceptableBaseFee()(uint256)"),
+                Call(self.oracle, "baseFeeProvider()(address)"),
+                Call(self.oracle, "manualBaseFeeBool()(bool)"),
+            ],
+            latest["number"],
+            self.multicall_address,
+        )
+        return latest["number"]
+
+    def next_base_fee(self):
+        _, _, base_fee, gas_used, gas_limit = self.headers[-1]
+        return next_base_fee(base_fee, gas_used, gas_limit)
+
+    def probability_acceptable(self, blocks, threshold=None):
+        # Probability that the base fee `blocks` blocks after the latest one
+        # is at most the threshold
+        threshold = self.threshold if threshold is None else threshold
+        upcoming = self.next_base_fee()
+        if blocks <= 1:
+            return float(upcoming <= threshold)
+
+        fees = [header[2] for header in self.headers]
+        span = blocks - 1
+        ratios = [
+            fees[i + span] / fees[i] for i in range(len(fees) - span) if fees[i] > 0
+        ]
+        if not ratios:
+            return None
+        return sum(upcoming * ratio <= threshold for ratio in ratios) / len(ratios)
+
+    def wake_block(self, threshold=None, confidence=0.5, max_blocks=None):
+        # First block expected to pass the oracle, None when the oracle is
+        # manual and closed or no horizon within the window is likely enough
+        if self.provider == ZERO_ADDRESS and threshold is None:
+            # Without a provider the oracle answers manualBaseFeeBool
+            return self.headers[-1][0] + 1 if self.manual_acceptable else None
+
+        threshold = self.threshold if threshold is None else threshold
+        latest = self.headers[-1][0]
+        if threshold is None:
+            # The oracle could not be read, do not hold anything back
+            return latest + 1
+        upcoming = self.next_base_fee()
+        if upcoming <= threshold:
+            return latest + 1
+        if threshold <= 0:
+            return None
+
+        decay = 1 - 1 / BASE_FEE_MAX_CHANGE_DENOMINATOR
+        fastest = math.ceil(math.log(threshold / upcoming) / math.log(decay)) + 1
+        max_blocks = len(self.headers) - 1 if max_blocks is None else max_blocks
+        for blocks in range(max(2, fastest), max_blocks + 1):
+            probability = self.probability_acceptable(blocks, threshold)
+            if probability is not None and probability >= confidence:
+                return latest + blocks
+        return None
+
+    def wake_time(self, threshold=None, confidence=0.5):
+        # Estimated timestamp of wake_block
+        block = self.wake_block(threshold, confidence)
+        if block is None:
+            return None
+        number, timestamp = self.headers[-1][:2]
+        return timestamp + (block - number) * self.block_time
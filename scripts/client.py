@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+
+# JSON-RPC endpoint of the stand-alone client, same variable web3 uses. Several
+# endpoints of the same chain can be given, separated by commas.
+PROVIDER_ENV = "WEB3_PROVIDER_URI"
+
+_web3 = None
+_lock = threading.Lock()
+
+
+def get_web3():
+    # The connection used by the monitoring scripts. Under `brownie run` or
+    # `brownie test` it is brownie's own. Stand-alone (python -m
+    # scripts.monitor) it is a plain web3 HTTP client created on first use,
+    # so neither brownie nor its project, compiler and network stack are ever
+    # imported.
+    brownie = sys.modules.get("brownie")
+    if brownie is not None and brownie.network.is_connected():
+        return brownie.web3
+    with _lock:
+        if _web3 is None:
+            uri = os.getenv(PROVIDER_ENV)
+            if not uri:
+                raise ConnectionError(f"Not connected, set {PROVIDER_ENV}")
+            _connect(uri)
+        return _web3
+
+
+def connect(uri):
+    # Point the connection used by the scripts at another endpoint
+    brownie = sys.modules.get("brownie")
+    if brownie is not None and brownie.network.is_connected():
+        brownie.web3.connect(uri)
+        return
+    with _lock:
+        _connect(uri)
+
+
+def endpoint_uri():
+    # URI to give connect() in another process for the same connection
+    provider = get_web3().provider
+    endpoints = getattr(provider, "endpoints", None)
+    if endpoints is not None:
+        return ",".join(endpoint.uri for endpoint in endpoints)
+    return provider.endpoint_uri
+
+
+def _connect(uri):
+    # Several comma separated endpoints get a scripts.endpoints.HedgedProvider
+    global _web3
+    from web3 import HTTPProvider, Web3
+
+    uris = [u.strip() for u in uri.split(",") if u.strip()]
+    if len(uris) > 1:
+        from scripts.endpoints import HedgedProvider
+
+        _web3 = Web3(HedgedProvider(uris))
+    else:
+        _web3 = Web3(HTTPProvider(uris[0], request_kwargs={"timeout": 30}))
+
+
+class LazyWeb3:
+    # Stands for get_web3() so modules can keep `web3.eth...` at module scope
+    # without connecting, or importing web3, at import time
+    def __getattr__(self, name):
+        return getattr(get_web3(), name)
+
+    def __repr__(self):
+        return "<LazyWeb3>"
+
+
+web3 = LazyWeb3()
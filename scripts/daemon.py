@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
+from scripts.client import web3
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+from scripts.snapshot import SPOTTER, VAT, take_snapshot
+
+import time
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Vat calls are logged through LibNote: topic0 holds the function selector and
+# topic1..3 the first three arguments, i.e. (ilk, urn, ...) for frob and grab
+VAT_FROB = bytes.fromhex("76088703")
+VAT_GRAB = bytes.fromhex("7bab3f40")
+VAT_FORK = bytes.fromhex("870c616d")
+VAT_FOLD = bytes.fromhex("b65337df")
+
+SPOTTER_POKE = keccak(text="Poke(bytes32,bytes32,uint256)")
+
+
+class MonitorDaemon:
+    # Follows the chain block by block and only snapshots a strategy again when
+    # something it depends on has moved:
+    #  - Vat frob/grab/fork on its urn or fold (stability fee accrual) on its ilk
+    #  - Spotter poke for its ilk or a new value in the ilk OSM (pip)
+    #  - a new Chainlink round on its price feed
+    #  - a new yvDAI pricePerShare
+    #  - any event emitted by the strategy itself (harvest, tend, setters...)
+    # Everything is refreshed every `full_refresh_blocks` as a safety net.
+    # `reader` produces the snapshot of one strategy at a given block.
+    # `prefetch(strategies, block)` runs once before the strategies of a
+    # refresh are read, e.g. scripts.prices.PriceEngine.prefetch. A
+    # `read_many(strategies, block)` returning (snapshots, {strategy: error})
+    # reads them instead of `reader`, e.g. scripts.shards.ShardedMonitor.
+    def __init__(
+        self,
+        strategies,
+        on_snapshot,
+        reader=take_snapshot,
+        multicall_address=MULTICALL2_ADDRESS,
+        cache=None,
+        poll_interval=1,
+        full_refresh_blocks=300,
+        max_block_range=1000,
+        max_workers=16,
+        prefetch=None,
+        read_many=None,
+    ):
+        self.strategies = [to_checksum_address(s) for s in strategies]
+        self.on_snapshot = on_snapshot
+        self.reader = reader
+        self.multicall_address = multicall_address
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.full_refresh_blocks = full_refresh_blocks
+        self.max_block_range = max_block_range
+        self.max_workers = max_workers
+        self.prefetch = prefetch
+        self.read_many = read_many
+
+        self.block = None
+        self.last_full_refresh = None
+        self.snapshots = {}
+        self.aggregators = {}
+        self.prices_per_share = {}
+
+    def run(self):
+        while True:
+            self.poll()
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        latest = web3.eth.block_number
+        if self.block is None:
+            self.refresh(self.strategies, latest)
+            self.block = self.last_full_refresh = latest
+            return
+        if latest <= self.block:
+            return
+
+        to_block = min(latest, self.block + self.max_block_range)
+        if to_block - self.last_full_refresh >= self.full_refresh_blocks:
+            dirty = set(self.strategies)
+            self.last_full_refresh = to_block
+        else:
+            dirty = self.strategies_touched_by_logs(self.block + 1, to_block)
+            dirty |= self.strategies_with_new_pps(to_block)
+            # Strategies that failed to read last time are always retried
+            dirty |= set(self.strategies) - set(self.snapshots)
+
+        self.refresh([s for s in self.strategies if s in dirty], to_block)
+        self.block = to_block
+
+    def refresh(self, strategies, block):
+        if self.prefetch is not None and strategies:
+            try:
+                self.prefetch(strategies, block)
+            except Exception as e:
+                # The reader fetches what it needs itself
+                print(f"Failed to prefetch at block {block}: {e!r}")
+
+        if self.read_many is not None:
+            snapshots, errors = self.read_many(strategies, block)
+            for s, error in errors.items():
+                print(f"Failed to read strategy {s} at block {block}: {error}")
+        else:
+            snapshots = self._read(strategies, block)
+
+        for snapshot in snapshots:
+            self.snapshots[snapshot["strategy"]] = snapshot
+            if snapshot["price_per_share"] is not None:
+                self.prices_per_share[snapshot["yvault"]] = snapshot["price_per_share"]
+        try:
+            self._resolve_aggregators()
+        except Exception as e:
+            print(f"Failed to resolve Chainlink aggregators at block {block}: {e!r}")
+
+        for snapshot in snapshots:
+            # A field that could not be read is None, one strategy the
+            # callback cannot handle must not stop the others
+            try:
+                self.on_snapshot(snapshot)
+            except Exception as e:
+                print(
+                    f"Failed to handle strategy {snapshot['strategy']} "
+                    f"at block {block}: {e!r}"
+                )
+        return snapshots
+
+    def _read(self, strategies, block):
+        def read(s):
+            try:
+                return self.reader(s, block, self.multicall_address, self.cache)
+            except Exception as e:
+                print(f"Failed to read strategy {s} at block {block}: {e!r}")
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            return [s for s in executor.map(read, strategies) if s is not None]
+
+    def strategies_touched_by_logs(self, from_block, to_block):
+        logs = web3.eth.get_logs(
+            {
+                "address": self._watched_addresses(),
+                "fromBlock": from_block,
+                "toBlock": to_block,
+            }
+        )
+        dirty = set()
+        for log in logs:
+            dirty.update(self._affected_by(log))
+        return dirty
+
+    def strategies_with_new_pps(self, block):
+        yvaults = list(self.prices_per_share)
+        if not yvaults:
+            return set()
+        _, prices = aggregate(
+            [Call(yvault, "pricePerShare()(uint256)") for yvault in yvaults],
+            block,
+            self.multicall_address,
+        )
+        moved = {
+            yvault
+            for yvault, price in zip(yvaults, prices)
+            if price != self.prices_per_share[yvault]
+        }
+        return {s for s, snap in self.snapshots.items() if snap["yvault"] in moved}
+
+    def _watched_addresses(self):
+        addresses = {VAT, SPOTTER, *self.strategies}
+        for snapshot in self.snapshots.values():
+            addresses.add(snapshot["pip"])
+            addresses.add(self.aggregators.get(snapshot["chainlink"], ZERO_ADDRESS))
+        addresses.discard(ZERO_ADDRESS)
+        addresses.discard(None)
+        return sorted(addresses)
+
+    def _affected_by(self, log):
+        address = to_checksum_address(log["address"])
+        topics = [bytes(HexBytes(topic)) for topic in log["topics"]]
+
+        for s, snapshot in self.snapshots.items():
+            ilk = snapshot["ilk"]
+            urn = bytes(HexBytes(snapshot["urn"])).rjust(32, b"\0")
+
+            if address == VAT:
+                if len(topics) < 3 or topics[1] != ilk:
+                    continue
+                selector = topics[0][:4]
+                if (
+                    selector == VAT_FOLD
+                    or (selector in (VAT_FROB, VAT_GRAB) and topics[2] == urn)
+                    or (selector == VAT_FORK and urn in topics[2:4])
+                ):
+                    yield s
+            elif address == SPOTTER:
+                data = bytes(HexBytes(log["data"]))
+                if topics and topics[0] == SPOTTER_POKE and data[:32] == ilk:
+                    yield s
+            elif address in {
+                s,
+                snapshot["pip"],
+                self.aggregators.get(snapshot["chainlink"]),
+            } - {None}:
+                yield s
+
+    def _resolve_aggregators(self):
+        # Chainlink proxies do not emit round updates, their aggregator does
+        feeds = {
+            snapshot["chainlink"]
+            for snapshot in self.snapshots.values()
+            if snapshot["chainlink"] not in (None, ZERO_ADDRESS)
+        } - set(self.aggregators)
+        if not feeds:
+            return
+        feeds = sorted(feeds)
+        _, aggregators = aggregate(
+            [Call(feed, "aggregator()(address)") for feed in feeds],
+            "latest",
+            self.multicall_address,
+        )
+        for feed, aggregator in zip(feeds, aggregators):
+            self.aggregators[feed] = aggregator or feed
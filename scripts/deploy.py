@@ -2,6 +2,7 @@ from pathlib import Path
 
 from brownie import Strategy, accounts, config, network, project, web3
 from eth_utils import is_checksum_address
+from scripts.rpc_trace import traced
 import click
 
 API_VERSION = config["dependencies"][0].split("@")[-1]
@@ -29,6 +30,7 @@ def get_address(msg: str, default: str = None) -> str:
         val = click.prompt(msg)
 
 
+@traced
 def main():
     print(f"You are using the '{network.show_active()}' network")
     dev = accounts.load(click.prompt("Account", type=click.Choice(accounts.load())))
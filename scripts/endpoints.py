@@ -0,0 +1,265 @@
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from web3 import HTTPProvider
+from web3.providers.base import JSONBaseProvider
+
+import threading
+import time
+
+# Methods answered the same by every node, safe to send twice
+READ_METHODS = frozenset(
+    {
+        "eth_blockNumber",
+        "eth_call",
+        "eth_chainId",
+        "eth_estimateGas",
+        "eth_feeHistory",
+        "eth_gasPrice",
+        "eth_getBalance",
+        "eth_getBlockByHash",
+        "eth_getBlockByNumber",
+        "eth_getCode",
+        "eth_getLogs",
+        "eth_getStorageAt",
+        "eth_getTransactionByHash",
+        "eth_getTransactionCount",
+        "eth_getTransactionReceipt",
+        "eth_maxPriorityFeePerGas",
+        "net_version",
+        "web3_clientVersion",
+    }
+)
+
+# Position of the block parameter of the methods that take a block hash
+# instead of a number (EIP-1898)
+BLOCK_PARAMETER = {
+    "eth_call": 1,
+    "eth_getBalance": 1,
+    "eth_getCode": 1,
+    "eth_getTransactionCount": 1,
+    "eth_getStorageAt": 2,
+}
+
+# Errors of a node that is behind the others, another node may answer
+LAG_ERRORS = ("header not found", "unknown block", "block not found", "missing trie")
+
+BLOCK_TAGS = ("latest", "pending", "earliest", "safe", "finalized")
+
+
+class EndpointError(Exception):
+    pass
+
+
+class Endpoint:
+    # One JSON-RPC node and its recent latencies and outcomes
+    def __init__(self, uri, window=256, timeout=30):
+        self.uri = uri
+        self.provider = HTTPProvider(uri, request_kwargs={"timeout": timeout})
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, params):
+        start = time.perf_counter()
+        try:
+            response = self.provider.make_request(method, params)
+        except Exception:
+            self._record(time.perf_counter() - start, False)
+            raise
+        if _lagging(method, params, response):
+            self._record(time.perf_counter() - start, False)
+            raise EndpointError(f"{self.uri} is behind: {response.get('error')}")
+        self._record(time.perf_counter() - start, True)
+        return response
+
+    def quantile(self, q):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    @property
+    def p50(self):
+        return self.quantile(0.5)
+
+    @property
+    def p99(self):
+        return self.quantile(0.99)
+
+    @property
+    def error_rate(self):
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+    def _record(self, latency, ok):
+        with self._lock:
+            self.requests += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+
+    def __repr__(self):
+        return f"<Endpoint {self.uri}>"
+
+
+def _lagging(method, params, response):
+    error = response.get("error")
+    if error:
+        message = str(error.get("message", "") if isinstance(error, dict) else error)
+        return any(lag in message.lower() for lag in LAG_ERRORS)
+    # A block the node has not seen yet
+    return (
+        method == "eth_getBlockByNumber"
+        and response.get("result") is None
+        and params[0] not in BLOCK_TAGS
+    )
+
+
+def _connected(provider):
+    check = getattr(provider, "is_connected", None) or provider.isConnected
+    try:
+        return bool(check())
+    except Exception:
+        return False
+
+
+class HedgedProvider(JSONBaseProvider):
+    # web3 provider spreading requests over several endpoints of the same
+    # chain:
+    #  - endpoints are ranked by p50 latency, the ones failing more than
+    #    `max_error_rate` of their recent requests come last
+    #  - a read still running after `hedge_after` seconds (by default the p95
+    #    latency of the endpoint it went to) is sent to the next endpoint as
+    #    well and the first answer wins; a failed read moves on at once
+    #  - other requests (transactions) fail over in order, never duplicated
+    #  - reads at a block number are pinned to the hash of that block as seen
+    #    by the first endpoint that knows it (EIP-1898), so every read of a
+    #    snapshot comes from the same block whichever node answers it
+    def __init__(
+        self,
+        uris,
+        hedge_after=None,
+        max_error_rate=0.25,
+        pin_blocks=True,
+        max_workers=32,
+        window=256,
+        timeout=30,
+    ):
+        super().__init__()
+        self.endpoints = [Endpoint(uri, window, timeout) for uri in uris]
+        self.hedge_after = hedge_after
+        self.max_error_rate = max_error_rate
+        self.pin_blocks = pin_blocks
+        self.hedges = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_request(self, method, params):
+        endpoints = self.ranked()
+        if method not in READ_METHODS:
+            return self._failover(endpoints, method, params)
+        return self._hedged(endpoints, method, self._pin(method, params))
+
+    def isConnected(self):
+        # web3 v5 (brownie < 2) name, web3 v6 and later call is_connected
+        return any(_connected(e.provider) for e in self.endpoints)
+
+    def is_connected(self, show_traceback=False):
+        return self.isConnected()
+
+    def ranked(self):
+        def rank(endpoint):
+            unhealthy = endpoint.error_rate > self.max_error_rate
+            # Endpoints without samples go first so they get measured
+            return unhealthy, endpoint.p50 or 0.0
+
+        return sorted(self.endpoints, key=rank)
+
+    def hedge_delay(self, endpoint):
+        if self.hedge_after is not None:
+            return self.hedge_after
+        latency = endpoint.quantile(0.95)
+        return 0.5 if latency is None else min(max(latency, 0.05), 5.0)
+
+    def stats(self):
+        return {
+            e.uri: dict(
+                p50=e.p50, p99=e.p99, error_rate=e.error_rate, requests=e.requests
+            )
+            for e in self.endpoints
+        }
+
+    def _failover(self, endpoints, method, params):
+        error = None
+        for endpoint in endpoints:
+            try:
+                return endpoint.request(method, params)
+            except Exception as e:
+                error = e
+        raise error
+
+    def _hedged(self, endpoints, method, params):
+        remaining = list(endpoints)
+        pending, error = set(), None
+
+        def launch():
+            endpoint = remaining.pop(0)
+            future = self._executor.submit(endpoint.request, method, params)
+            pending.add(future)
+            return endpoint
+
+        last = launch()
+        while pending:
+            timeout = self.hedge_delay(last) if remaining else None
+            done, pending = wait(pending, timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                self.hedges += 1
+                last = launch()
+                continue
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+                    if remaining:
+                        last = launch()
+        raise error
+
+    def _pin(self, method, params):
+        index = BLOCK_PARAMETER.get(method)
+        if not self.pin_blocks or index is None or len(params) <= index:
+            return params
+        block = params[index]
+        if not isinstance(block, str) or block in BLOCK_TAGS:
+            return params
+        block_hash = self._block_hash(block)
+        if block_hash is None:
+            return params
+        params = list(params)
+        params[index] = {"blockHash": block_hash}
+        return params
+
+    def _block_hash(self, number):
+        with self._lock:
+            if number in self._hashes:
+                self._hashes.move_to_end(number)
+                return self._hashes[number]
+        try:
+            response = self._hedged(
+                self.ranked(), "eth_getBlockByNumber", [number, False]
+            )
+        except Exception:
+            return None
+        block_hash = (response.get("result") or {}).get("hash")
+        if block_hash is not None:
+            with self._lock:
+                self._hashes[number] = block_hash
+                while len(self._hashes) > 1024:
+                    self._hashes.popitem(last=False)
+        return block_hash
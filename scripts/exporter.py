@@ -0,0 +1,236 @@
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.daemon import MonitorDaemon
+from scripts.metadata_cache import MetadataCache
+from scripts.multicall import install_read_cache
+from scripts.prices import PriceEngine
+from scripts.read_cache import ReadCache
+from scripts.registry import DEFAULT_REGISTRY, load_registry, load_strategies
+from scripts.triggers import Revert, binding_source, price_sources, read_trigger_state
+
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name, help, function of the snapshot returning the value
+METRICS = [
+    (
+        "collateral",
+        "Collateral locked in the CDP in want units",
+        lambda s: s["ink"] / 1e18,
+    ),
+    ("debt_dai", "DAI debt of the CDP", lambda s: s["debt"] / 1e18),
+    (
+        "investment_value_dai",
+        "Value of the yvDAI position in DAI",
+        lambda s: s["shares"]
+        * s["price_per_share"]
+        / 10 ** s["yvault_decimals"]
+        / 1e18,
+    ),
+    (
+        "profit_dai",
+        "Value of the yvDAI position minus the CDP debt (negative is a loss)",
+        lambda s: (
+            s["shares"] * s["price_per_share"] / 10 ** s["yvault_decimals"] - s["debt"]
+        )
+        / 1e18,
+    ),
+    (
+        "yvault_price_per_share",
+        "yvDAI pricePerShare",
+        lambda s: s["price_per_share"] / 10 ** s["yvault_decimals"],
+    ),
+    (
+        "target_c_ratio",
+        "Target collateralization ratio",
+        lambda s: s["collateralization_ratio"] / 1e18,
+    ),
+    (
+        "rebalance_tolerance",
+        "Allowed drift around the target c-ratio",
+        lambda s: s["rebalance_tolerance"] / 1e18,
+    ),
+    (
+        "current_c_ratio",
+        "getCurrentMakerVaultRatio",
+        lambda s: s["current_ratio"] / 1e18,
+    ),
+    (
+        "liquidation_ratio",
+        "Maker liquidation ratio of the ilk",
+        lambda s: s["liquidation_ratio"] / 1e27,
+    ),
+    (
+        "debt_ratio",
+        "Debt ratio of the strategy in its vault",
+        lambda s: s["debt_ratio"] / 10_000,
+    ),
+    (
+        "tend_trigger",
+        "1 when tendTrigger is true",
+        lambda s: int(bool(s["tend_trigger"])),
+    ),
+    ("snapshot_block", "Block the snapshot was read at", lambda s: s["block"]),
+    ("snapshot_timestamp", "Timestamp of the snapshot block", lambda s: s["timestamp"]),
+]
+
+
+def _prices(snapshot):
+    # Every input of Strategy._getCollateralPrice that could be read and the
+    # one it ends up using
+    try:
+        return price_sources(snapshot), binding_source(snapshot)
+    except (Revert, TypeError):
+        # latestAnswer reverted, so does the Strategy
+        if snapshot["spot_price"] is None:
+            return [], None
+        return [("spotter", snapshot["spot_price"])], None
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _sample(value, snapshot):
+    # None when an input of the metric could not be read (a call that
+    # reverted inside tryAggregate), the series is then left out
+    try:
+        return value(snapshot)
+    except (KeyError, TypeError, ZeroDivisionError):
+        return None
+
+
+def ilk_name(ilk):
+    return ilk.rstrip(b"\0").decode(errors="replace")
+
+
+def format_metrics(snapshots, prefix="maker_v3"):
+    # Prometheus text exposition format
+    lines = []
+    labels = {
+        s["strategy"]: dict(
+            strategy=s["strategy"],
+            name=s["name"],
+            ilk=ilk_name(s["ilk"]),
+            want=s["want_symbol"],
+        )
+        for s in snapshots
+    }
+
+    for name, description, value in METRICS:
+        lines.append(f"# HELP {prefix}_{name} {description}")
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        for snapshot in snapshots:
+            sample = _sample(value, snapshot)
+            if sample is None:
+                continue
+            series = _labels(**labels[snapshot["strategy"]])
+            lines.append(f"{prefix}_{name}{{{series}}} {sample}")
+
+    prices = {s["strategy"]: _prices(s) for s in snapshots}
+    lines.append(f"# HELP {prefix}_collateral_price Collateral price per source in USD")
+    lines.append(f"# TYPE {prefix}_collateral_price gauge")
+    for strategy, (sources, _) in prices.items():
+        for source, price in sources:
+            series = _labels(**labels[strategy], source=source)
+            lines.append(f"{prefix}_collateral_price{{{series}}} {price / 1e18}")
+
+    lines.append(
+        f"# HELP {prefix}_collateral_price_binding "
+        "1 for the source _getCollateralPrice currently uses"
+    )
+    lines.append(f"# TYPE {prefix}_collateral_price_binding gauge")
+    for strategy, (sources, binding) in prices.items():
+        for source, _ in sources:
+            series = _labels(**labels[strategy], source=source)
+            value = int(source == binding)
+            lines.append(f"{prefix}_collateral_price_binding{{{series}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsStore:
+    # Latest snapshot per strategy. The exposition text is rendered once per
+    # update so scrapes never trigger any RPC or formatting work.
+    def __init__(self, prefix="maker_v3"):
+        self.prefix = prefix
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._rendered = format_metrics([], prefix).encode()
+
+    def update(self, snapshot):
+        with self._lock:
+            self._snapshots[snapshot["strategy"]] = snapshot
+            self._rendered = format_metrics(
+                list(self._snapshots.values()), self.prefix
+            ).encode()
+
+    def update_many(self, snapshots):
+        # Same as update for a batch of snapshots, rendered once
+        with self._lock:
+            for snapshot in snapshots:
+                self._snapshots[snapshot["strategy"]] = snapshot
+            self._rendered = format_metrics(
+                list(self._snapshots.values()), self.prefix
+            ).encode()
+
+    def render(self):
+        return self._rendered
+
+
+def serve(store, host="0.0.0.0", port=9101):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = store.render()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(registry=DEFAULT_REGISTRY, port=9101, poll_interval=1, read_many=None):
+    # `read_many` is handed to the MonitorDaemon, scripts.shards passes one
+    # reading on worker processes
+    install_read_cache(ReadCache())
+    cache = MetadataCache()
+    store = MetricsStore()
+    # Snapshots of one refresh are rendered together, once per block
+    pending = []
+    # Price inputs of every strategy of a refresh are read in one go
+    prices = PriceEngine(cache=cache)
+    daemon = MonitorDaemon(
+        load_strategies(registry),
+        pending.append,
+        reader=partial(read_trigger_state, prices=prices),
+        cache=cache,
+        # Workers fetch their own price inputs
+        prefetch=prices.prefetch if read_many is None else None,
+        max_workers=load_registry(registry).get("max_workers", 16),
+        read_many=read_many,
+    )
+    server = serve(store, port=int(port))
+    host, port = server.server_address
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    while True:
+        daemon.poll()
+        if pending:
+            store.update_many(pending)
+            pending.clear()
+        time.sleep(float(poll_interval))
@@ -0,0 +1,241 @@
+from itertools import groupby
+from pathlib import Path
+
+from eth_utils import to_checksum_address
+from scripts.metadata_cache import DEFAULT_CACHE_PATH
+
+import sqlite3
+import threading
+
+DEFAULT_HISTORY_PATH = DEFAULT_CACHE_PATH.parent / "history.sqlite"
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# name, function of the snapshot returning the value stored for it. Values a
+# record does not carry (e.g. backfilled blocks) are stored as NULL.
+FIELDS = [
+    ("collateral", lambda s: s["collateral"] / 1e18),
+    ("debt", lambda s: s["debt"] / 1e18),
+    (
+        "investment",
+        lambda s: s["shares"]
+        * s["price_per_share"]
+        / 10 ** s["yvault_decimals"]
+        / 1e18,
+    ),
+    (
+        "profit",
+        lambda s: (
+            s["shares"] * s["price_per_share"] / 10 ** s["yvault_decimals"] - s["debt"]
+        )
+        / 1e18,
+    ),
+    ("price_per_share", lambda s: s["price_per_share"] / 10 ** s["yvault_decimals"]),
+    ("current_ratio", lambda s: s["current_ratio"] / 1e18),
+    ("target_ratio", lambda s: s["collateralization_ratio"] / 1e18),
+    ("spot_price", lambda s: s["spot_price"] / 1e18),
+    (
+        "estimated_total_assets",
+        lambda s: s["estimated_total_assets"] / 10 ** s["want_decimals"],
+    ),
+]
+COLUMNS = [name for name, _ in FIELDS]
+
+
+class SnapshotStore:
+    # SQLite history of strategy snapshots, one row per strategy per block,
+    # kept at three resolutions:
+    #  - samples: every snapshot, for `sample_retention` seconds
+    #  - hourly: last value of each hour, for `hourly_retention` seconds
+    #  - daily: last value of each day, forever
+    # Older rows are rolled into the next resolution at most once an hour as
+    # snapshots are appended. Rolled up rows keep the lowest c-ratio seen in
+    # their bucket as `min_ratio` so short dips are not averaged away.
+    def __init__(
+        self,
+        path=DEFAULT_HISTORY_PATH,
+        sample_retention=2 * DAY,
+        hourly_retention=90 * DAY,
+    ):
+        # (table, bucket size in seconds, retention in seconds)
+        self.tiers = [
+            ("samples", None, sample_retention),
+            ("hourly", HOUR, hourly_retention),
+            ("daily", DAY, None),
+        ]
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._last_downsample = None
+        self._create_tables()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def append(self, snapshot):
+        self.append_many([snapshot])
+
+    def append_many(self, snapshots):
+        rows = [
+            (
+                self._strategy_id(snapshot["strategy"]),
+                snapshot["block"],
+                snapshot["timestamp"],
+                *[_value(value, snapshot) for _, value in FIELDS],
+                _value(lambda s: s["current_ratio"] / 1e18, snapshot),
+            )
+            for snapshot in snapshots
+        ]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO samples VALUES ({_placeholders(rows[0])})",
+                rows,
+            )
+        latest = max(row[2] for row in rows)
+        if self._last_downsample is None or latest - self._last_downsample >= HOUR:
+            self.downsample(latest)
+
+    def downsample(self, now):
+        # Roll every row older than the retention of its tier into the next one
+        with self._lock, self._db:
+            for (table, _, retention), (target, bucket, _) in zip(
+                self.tiers, self.tiers[1:]
+            ):
+                cutoff = (now - retention) // bucket * bucket
+                rows = self._db.execute(
+                    f"SELECT * FROM {table} WHERE timestamp < ? "
+                    "ORDER BY strategy, timestamp, block",
+                    (cutoff,),
+                ).fetchall()
+                self._db.executemany(_upsert(target), _rollup(rows, bucket))
+                self._db.execute(f"DELETE FROM {table} WHERE timestamp < ?", (cutoff,))
+        self._last_downsample = now
+
+    def query(self, strategy, start=None, end=None):
+        # Rows between the `start` and `end` timestamps (inclusive) at the
+        # finest resolution still stored for each period, oldest first
+        strategy_id = self._strategy_id(strategy)
+        start = 0 if start is None else start
+        end = 2 ** 62 if end is None else end
+
+        result, until = [], end + 1
+        with self._lock:
+            for table, _, _ in self.tiers:
+                rows = self._db.execute(
+                    f"SELECT block, timestamp, {', '.join(COLUMNS)}, min_ratio "
+                    f"FROM {table} WHERE strategy = ? AND timestamp >= ? "
+                    "AND timestamp < ? ORDER BY timestamp DESC, block DESC",
+                    (strategy_id, start, until),
+                ).fetchall()
+                for row in rows:
+                    result.append(
+                        dict(
+                            zip(["block", "timestamp", *COLUMNS, "min_ratio"], row),
+                            resolution=table,
+                        )
+                    )
+                if rows:
+                    until = rows[-1][1]
+        return result[::-1]
+
+    def series(self, strategy, field, start=None, end=None):
+        return [
+            (row["timestamp"], row[field]) for row in self.query(strategy, start, end)
+        ]
+
+    def c_ratio(self, strategy, start=None, end=None):
+        return self.series(strategy, "current_ratio", start, end)
+
+    def profit(self, strategy, start=None, end=None):
+        return self.series(strategy, "profit", start, end)
+
+    def price_per_share(self, strategy, start=None, end=None):
+        return self.series(strategy, "price_per_share", start, end)
+
+    def _create_tables(self):
+        columns = ", ".join(f"{name} REAL" for name in COLUMNS)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS strategies "
+                "(id INTEGER PRIMARY KEY, address TEXT UNIQUE NOT NULL)"
+            )
+            for table, bucket, _ in self.tiers:
+                # Samples are unique per block, rolled up rows per bucket
+                key = "block" if bucket is None else "timestamp"
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (strategy INTEGER NOT NULL, "
+                    f"block INTEGER NOT NULL, timestamp INTEGER NOT NULL, {columns}, "
+                    f"min_ratio REAL, PRIMARY KEY (strategy, {key})) WITHOUT ROWID"
+                )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS samples_timestamp "
+                "ON samples (strategy, timestamp)"
+            )
+
+    def _strategy_id(self, strategy):
+        address = to_checksum_address(str(strategy))
+        if address not in self._ids:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO strategies (address) VALUES (?)", (address,)
+                )
+                (self._ids[address],) = self._db.execute(
+                    "SELECT id FROM strategies WHERE address = ?", (address,)
+                ).fetchone()
+        return self._ids[address]
+
+
+def _value(value, snapshot):
+    # NULL for values the record does not carry or that could not be read
+    # (None from a call that reverted inside tryAggregate)
+    try:
+        return value(snapshot)
+    except (KeyError, TypeError):
+        return None
+
+
+def _placeholders(row):
+    return ", ".join("?" * len(row))
+
+
+def _rollup(rows, bucket):
+    # rows are (strategy, block, timestamp, *COLUMNS, min_ratio) ordered by
+    # strategy and time. Each bucket keeps its last row, stamped with the
+    # start of the bucket, and the lowest min_ratio.
+    def key(row):
+        return row[0], row[2] // bucket * bucket
+
+    for (strategy, start), group in groupby(rows, key):
+        group = list(group)
+        last = group[-1]
+        yield (
+            strategy,
+            last[1],
+            start,
+            *last[3:-1],
+            min((row[-1] for row in group if row[-1] is not None), default=None),
+        )
+
+
+def _upsert(table):
+    # A bucket can be rolled up more than once (e.g. after a backfill of older
+    # blocks): keep the values of its latest block and the lowest c-ratio
+    latest = ", ".join(
+        f"{name} = CASE WHEN excluded.block > {table}.block "
+        f"THEN excluded.{name} ELSE {table}.{name} END"
+        for name in COLUMNS
+    )
+    return (
+        f"INSERT INTO {table} VALUES ({', '.join('?' * (len(COLUMNS) + 4))}) "
+        f"ON CONFLICT (strategy, timestamp) DO UPDATE SET {latest}, "
+        # min() of SQLite is NULL as soon as one side is
+        f"min_ratio = min(coalesce({table}.min_ratio, excluded.min_ratio), "
+        f"coalesce(excluded.min_ratio, {table}.min_ratio)), "
+        f"block = max({table}.block, excluded.block)"
+    )
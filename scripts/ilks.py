@@ -0,0 +1,157 @@
+from eth_utils import to_checksum_address
+from scripts.metadata_cache import MetadataCache
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+from scripts.registry import DEFAULT_REGISTRY, load_strategies
+from scripts.snapshot import ILK_REGISTRY, RAY, VAT, WAD, resolve_strategy
+from scripts.triggers import MIN_MINTABLE
+
+import sys
+
+# DssAutoLine, raises the line of an ilk by `gap` at most every `ttl` seconds
+# up to its own `line`
+DSS_AUTO_LINE = "0xC7Bdd1F2B16447dcf3dE045C4a039A60EC2f0ba3"
+
+# Fields of an ilk_capacity row holding WAD, RAY or RAD amounts
+AMOUNTS = frozenset(
+    [
+        "debt",
+        "line",
+        "dust",
+        "debt_floor",
+        "available",
+        "max_mint",
+        "auto_line",
+        "auto_line_gap",
+        "auto_line_next_line",
+        "capacity",
+    ]
+)
+
+
+def ilk_name(ilk):
+    return bytes(ilk).rstrip(b"\0").decode(errors="replace")
+
+
+def scan(block_identifier="latest", multicall_address=MULTICALL2_ADDRESS):
+    # Every ilk of the IlkRegistry with its Vat and DssAutoLine settings and
+    # the DAI that can be minted on it, highest capacity first
+    _, (ilks, Line, debt) = aggregate(
+        [
+            Call(ILK_REGISTRY, "list()(bytes32[])"),
+            Call(VAT, "Line()(uint256)"),
+            Call(VAT, "debt()(uint256)"),
+        ],
+        block_identifier,
+        multicall_address,
+    )
+    calls = []
+    for ilk in ilks:
+        calls += [
+            Call(VAT, "ilks(bytes32)(uint256,uint256,uint256,uint256,uint256)", [ilk]),
+            Call(
+                DSS_AUTO_LINE,
+                "ilks(bytes32)(uint256,uint256,uint48,uint48,uint48)",
+                [ilk],
+            ),
+            Call(ILK_REGISTRY, "join(bytes32)(address)", [ilk]),
+        ]
+    block, values = aggregate(calls, block_identifier, multicall_address)
+
+    # Room left under the global ceiling, frob checks it too
+    global_room = max(0, Line - debt) // RAY
+    rows = []
+    for i, ilk in enumerate(ilks):
+        vat_ilk, auto_line, join = values[3 * i : 3 * i + 3]
+        if vat_ilk is None:
+            continue
+        rows.append(
+            ilk_capacity(ilk, vat_ilk, auto_line, global_room, block=block, join=join)
+        )
+    return sorted(rows, key=lambda row: row["capacity"], reverse=True)
+
+
+def ilk_capacity(ilk, vat_ilk, auto_line=None, global_room=None, **extra):
+    # Same math as MakerDaiDelegateLib.balanceOfDaiAvailableToMint,
+    # isDaiAvailableToMint and debtFloor, plus what DssAutoLine can add
+    Art, rate, spot, line, dust = vat_ilk
+    vat_debt = Art * rate
+    available = 0 if vat_debt >= line else (line - vat_debt) // RAY
+
+    # DssAutoLine(line, gap, ttl, last, lastInc), line is 0 when not set
+    auto_max, gap, ttl, _, last_inc = auto_line or (0, 0, 0, 0, 0)
+    if auto_max > 0:
+        ceiling = max(line, auto_max)
+        next_line = min(vat_debt + gap, auto_max)
+        next_exec = last_inc + ttl
+    else:
+        ceiling, next_line, next_exec = line, None, None
+    capacity = 0 if vat_debt >= ceiling else (ceiling - vat_debt) // RAY
+
+    if global_room is not None:
+        available = min(available, global_room)
+        capacity = min(capacity, global_room)
+
+    return dict(
+        ilk="0x" + bytes(ilk).hex(),
+        name=ilk_name(ilk),
+        debt=vat_debt // RAY,
+        line=line,
+        dust=dust,
+        debt_floor=dust // RAY,
+        available=available,
+        mintable=available >= MIN_MINTABLE,
+        # available minus what _forceMintWithinLimits keeps for rounding
+        max_mint=0 if available < MIN_MINTABLE else max(0, available - WAD),
+        auto_line=auto_max,
+        auto_line_gap=gap,
+        auto_line_next_line=next_line,
+        auto_line_next_exec=next_exec,
+        capacity=capacity,
+        **extra,
+    )
+
+
+def at_risk(
+    strategies,
+    rows,
+    margin=MIN_MINTABLE,
+    block_identifier="latest",
+    multicall_address=MULTICALL2_ADDRESS,
+    cache=None,
+):
+    # (strategy, row) of the strategies whose ilk has less than MIN_MINTABLE
+    # plus `margin` DAI left to mint: _forceMintWithinLimits mints nothing
+    # once it drops under MIN_MINTABLE
+    by_ilk = {row["ilk"]: row for row in rows}
+    flagged = []
+    for s in strategies:
+        info = resolve_strategy(s, block_identifier, multicall_address, cache)
+        row = by_ilk.get("0x" + bytes(info["ilk"]).hex())
+        if row is not None and row["available"] < MIN_MINTABLE + margin:
+            flagged.append((to_checksum_address(str(s)), row))
+    return flagged
+
+
+def main(registry=DEFAULT_REGISTRY, top=20):
+    rows = scan()
+    print(f"{'ilk':<16}{'capacity':>16}{'available':>16}{'dust':>10}  auto line")
+    for row in rows[: int(top)]:
+        auto = "-"
+        if row["auto_line"]:
+            auto = f"+{row['auto_line_gap'] // RAY / 1e6:,.1f}M up to "
+            auto += f"{row['auto_line'] // RAY / 1e6:,.1f}M"
+        print(
+            f"{row['name']:<16}{row['capacity'] / 1e18:>16,.0f}"
+            f"{row['available'] / 1e18:>16,.0f}{row['debt_floor'] / 1e18:>10,.0f}  "
+            f"{auto}"
+        )
+
+    for s, row in at_risk(load_strategies(registry), rows, cache=MetadataCache()):
+        print(
+            f"{s} ({row['name']}): {row['available'] / 1e18:,.0f} DAI left to mint, "
+            f"MIN_MINTABLE is {MIN_MINTABLE / 1e18:,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import subprocess
+import sys
+
+# Import time of the stand-alone monitor, measured with `python -X importtime`
+# in a fresh interpreter: python -m scripts.importtime [module]
+MODULE = "scripts.monitor"
+
+# Must not be imported until they are used
+DEFERRED = ("brownie", "numpy", "web3")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def measure(module=MODULE):
+    # ({module: cumulative microseconds}, total microseconds) of every module
+    # imported by `import module`, the total counting top level imports only
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, value, name = line.split("|")
+        cumulative[name.strip()] = int(value)
+        if not name.startswith("  "):
+            total += int(value)
+    return cumulative, total
+
+
+def main(module=MODULE, top=15):
+    cumulative, total = measure(module)
+    print(f"import {module}: {total / 1e6:.3f}s, {len(cumulative)} modules")
+    for name, value in sorted(cumulative.items(), key=lambda x: -x[1])[: int(top)]:
+        print(f"{value / 1e3:10.1f} ms  {name}")
+    deferred = [name for name in DEFERRED if name in cumulative]
+    if deferred:
+        print(f"Imported eagerly: {', '.join(deferred)}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,351 @@
+from collections import defaultdict
+from pathlib import Path
+
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
+from scripts.client import web3
+from scripts.daemon import VAT_FROB, VAT_GRAB
+from scripts.metadata_cache import DEFAULT_CACHE_PATH, MetadataCache
+from scripts.multicall import MULTICALL2_ADDRESS
+from scripts.registry import DEFAULT_REGISTRY, load_registry, load_strategies
+from scripts.snapshot import VAT, resolve_strategy
+
+try:
+    from eth_abi import decode
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi as decode
+
+import json
+import sqlite3
+import threading
+
+DEFAULT_INDEX_PATH = DEFAULT_CACHE_PATH.parent / "events.sqlite"
+
+# Errors nodes return when a range holds too many logs or takes too long
+TOO_MANY_RESULTS = (
+    "query returned more than",
+    "limit exceeded",
+    "too many",
+    "response size",
+    "timeout",
+    "-32005",
+)
+
+
+class Event:
+    # A log described by its Solidity declaration, e.g.
+    # Event("Cloned(address indexed clone)")
+    def __init__(self, declaration):
+        self.name, params = declaration[:-1].split("(", 1)
+        self.inputs = [
+            (words[0], words[-1], "indexed" in words)
+            for words in (param.split() for param in params.split(",") if param)
+        ]
+        types = ",".join(type_ for type_, _, _ in self.inputs)
+        self.topic = keccak(text=f"{self.name}({types})")
+
+    def decode(self, topics, data):
+        indexed = iter(topics[1:])
+        types = [type_ for type_, _, is_indexed in self.inputs if not is_indexed]
+        values = iter(decode(types, data))
+        return {
+            name: decode([type_], next(indexed))[0] if is_indexed else next(values)
+            for type_, name, is_indexed in self.inputs
+        }
+
+
+STRATEGY_EVENTS = [
+    Event(declaration)
+    for declaration in [
+        "Harvested(uint256 profit,uint256 loss,uint256 debtPayment,uint256 debtOutstanding)",
+        "UpdatedStrategist(address newStrategist)",
+        "UpdatedKeeper(address newKeeper)",
+        "UpdatedRewards(address rewards)",
+        "UpdatedMinReportDelay(uint256 delay)",
+        "UpdatedMaxReportDelay(uint256 delay)",
+        "UpdatedProfitFactor(uint256 profitFactor)",
+        "UpdatedDebtThreshold(uint256 debtThreshold)",
+        "EmergencyExitEnabled()",
+        "UpdatedMetadataURI(string metadataURI)",
+        "SetHealthCheck(address healthCheck)",
+        "SetDoHealthCheck(bool doHealthCheck)",
+    ]
+]
+
+# The debt ratio of a strategy lives in its vault
+VAULT_EVENTS = [
+    Event("StrategyUpdateDebtRatio(address indexed strategy,uint256 debtRatio)"),
+    Event("StrategyRevoked(address indexed strategy)"),
+]
+
+CLONER_EVENTS = [
+    Event("Cloned(address indexed clone)"),
+    Event("Deployed(address indexed original)"),
+]
+
+# Vat LibNote topic0: the selector left aligned in 32 bytes
+VAT_NOTES = {VAT_FROB.ljust(32, b"\0"): "frob", VAT_GRAB.ljust(32, b"\0"): "grab"}
+
+
+def _topic(value):
+    return "0x" + bytes(value).hex()
+
+
+def _address_topic(address):
+    return _topic(bytes(HexBytes(address)).rjust(32, b"\0"))
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if isinstance(value, int) and not isinstance(value, bool):
+        # Keep uint256 exact, JSON readers may parse numbers as doubles
+        return str(value)
+    return value
+
+
+def decode_vat_note(topics, data):
+    # LibNote data is abi encoded `bytes` holding the first 224 bytes of the
+    # calldata: frob/grab(bytes32 i, address u, address v, address w,
+    # int256 dink, int256 dart)
+    calldata = data[64:]
+    dink, dart = decode(["int256", "int256"], calldata[4 + 4 * 32 : 4 + 6 * 32])
+    return {
+        "ilk": topics[1],
+        "u": to_checksum_address(topics[2][-20:]),
+        "v": to_checksum_address(topics[3][-20:]),
+        "dink": dink,
+        "dart": dart,
+    }
+
+
+class EventIndexer:
+    # Local SQLite index of the logs the monitor cares about:
+    #  - BaseStrategy events emitted by every strategy
+    #  - StrategyUpdateDebtRatio/StrategyRevoked of each strategy in its vault
+    #  - Cloned/Deployed from the cloners in the registry
+    #  - Vat frob/grab on the urn of every strategy
+    # Every source keeps its own checkpoint so a strategy added to the
+    # registry catches up on its own while the others only read new blocks.
+    # Sources that share a checkpoint are fetched with a single filter. Block
+    # ranges shrink when the node refuses a range and grow while they are
+    # sparse. Only blocks `confirmations` deep are indexed so reorgs never
+    # reach the index.
+    def __init__(
+        self,
+        strategies,
+        cloners=(),
+        path=DEFAULT_INDEX_PATH,
+        multicall_address=MULTICALL2_ADDRESS,
+        cache=None,
+        start_block=0,
+        confirmations=12,
+        initial_range=2_000,
+        max_range=200_000,
+        target_logs=2_000,
+    ):
+        self.strategies = [to_checksum_address(str(s)) for s in strategies]
+        self.cloners = [
+            (to_checksum_address(c["address"]), c.get("from_block", start_block))
+            for c in cloners
+        ]
+        self.multicall_address = multicall_address
+        self.cache = cache
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.max_range = max_range
+        self.target_logs = target_logs
+        self.block_range = initial_range
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._wiring = {}
+        self._create_tables()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def update(self, to_block=None):
+        # Index every source up to `to_block`, returns the number of new events
+        if to_block is None:
+            to_block = web3.eth.block_number - self.confirmations
+
+        groups = defaultdict(list)
+        for source, start in self._sources():
+            checkpoint = self._checkpoint(source, start)
+            if checkpoint < to_block:
+                groups[(source[0], checkpoint)].append(source)
+
+        added = 0
+        for (kind, checkpoint), sources in groups.items():
+            log_filter, subjects = self._filter(kind, [member for _, member in sources])
+            for _, chunk_end, logs in self._fetch(log_filter, checkpoint + 1, to_block):
+                rows = [self._row(kind, log, subjects) for log in logs]
+                rows = [row for row in rows if row is not None]
+                with self._lock, self._db:
+                    self._db.executemany(
+                        f"INSERT OR IGNORE INTO events VALUES ({', '.join('?' * 7)})",
+                        rows,
+                    )
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO checkpoints VALUES (?, ?)",
+                        [(f"{kind}:{member}", chunk_end) for _, member in sources],
+                    )
+                added += len(rows)
+        return added
+
+    def events(self, subject=None, event=None, from_block=None, to_block=None):
+        # Indexed events, oldest first. `subject` is the strategy an event is
+        # about (the clone for Cloned/Deployed).
+        query, params = "SELECT * FROM events WHERE 1", []
+        for clause, value in [
+            ("subject = ?", subject and to_checksum_address(str(subject))),
+            ("event = ?", event),
+            ("block >= ?", from_block),
+            ("block <= ?", to_block),
+        ]:
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        with self._lock:
+            rows = self._db.execute(
+                query + " ORDER BY block, log_index", params
+            ).fetchall()
+        columns = ["block", "log_index", "transaction_hash", "address", "event"]
+        return [
+            dict(zip(columns, row[:5]), subject=row[5], args=json.loads(row[6]))
+            for row in rows
+        ]
+
+    def _sources(self):
+        for s in self.strategies:
+            yield ("strategy", s), self.start_block
+            yield ("vault", s), self.start_block
+            yield ("urn", s), self.start_block
+        for cloner, from_block in self.cloners:
+            yield ("cloner", cloner), from_block
+
+    def _checkpoint(self, source, start):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT block FROM checkpoints WHERE source = ?",
+                (f"{source[0]}:{source[1]}",),
+            ).fetchone()
+        return start - 1 if row is None else row[0]
+
+    def _wiring_of(self, strategy):
+        if strategy not in self._wiring:
+            self._wiring[strategy] = resolve_strategy(
+                strategy, "latest", self.multicall_address, self.cache
+            )
+        return self._wiring[strategy]
+
+    def _filter(self, kind, members):
+        # eth_getLogs filter for a group of sources and the map used to find
+        # the strategy a log is about
+        if kind == "strategy":
+            topics = [[_topic(e.topic) for e in STRATEGY_EVENTS]]
+            return {"address": members, "topics": topics}, {m: m for m in members}
+        if kind == "vault":
+            vaults = sorted({self._wiring_of(s)["vault"] for s in members})
+            topics = [
+                [_topic(e.topic) for e in VAULT_EVENTS],
+                [_address_topic(s) for s in members],
+            ]
+            return {"address": vaults, "topics": topics}, {m: m for m in members}
+        if kind == "urn":
+            urns = {to_checksum_address(self._wiring_of(s)["urn"]): s for s in members}
+            topics = [
+                [_topic(note) for note in VAT_NOTES],
+                None,
+                [_address_topic(urn) for urn in urns],
+            ]
+            return {"address": VAT, "topics": topics}, urns
+        topics = [[_topic(e.topic) for e in CLONER_EVENTS]]
+        return {"address": members, "topics": topics}, {}
+
+    def _fetch(self, log_filter, from_block, to_block):
+        # Yields (from_block, to_block, logs) for consecutive ranges, adapting
+        # the range size to the density of logs
+        while from_block <= to_block:
+            end = min(to_block, from_block + self.block_range - 1)
+            try:
+                logs = web3.eth.get_logs(
+                    dict(log_filter, fromBlock=from_block, toBlock=end)
+                )
+            except Exception as e:
+                message = str(e).lower()
+                if self.block_range > 1 and any(s in message for s in TOO_MANY_RESULTS):
+                    self.block_range = max(1, self.block_range // 2)
+                    continue
+                raise
+            yield from_block, end, logs
+            if len(logs) < self.target_logs // 2:
+                self.block_range = min(self.max_range, self.block_range * 2)
+            elif len(logs) > self.target_logs:
+                self.block_range = max(1, self.block_range // 2)
+            from_block = end + 1
+
+    def _row(self, kind, log, subjects):
+        address = to_checksum_address(log["address"])
+        topics = [bytes(HexBytes(topic)) for topic in log["topics"]]
+        data = bytes(HexBytes(log["data"]))
+
+        if kind == "urn":
+            event = VAT_NOTES[topics[0]]
+            args = decode_vat_note(topics, data)
+            subject = subjects.get(args["u"])
+        else:
+            events = {
+                "strategy": STRATEGY_EVENTS,
+                "vault": VAULT_EVENTS,
+                "cloner": CLONER_EVENTS,
+            }[kind]
+            match = next((e for e in events if e.topic == topics[0]), None)
+            if match is None:
+                return None
+            event, args = match.name, match.decode(topics, data)
+            if kind == "strategy":
+                subject = address
+            else:
+                subject = to_checksum_address(next(iter(args.values())))
+
+        return (
+            log["blockNumber"],
+            log["logIndex"],
+            "0x" + bytes(HexBytes(log["transactionHash"])).hex(),
+            address,
+            event,
+            subject,
+            json.dumps({key: _jsonable(value) for key, value in args.items()}),
+        )
+
+    def _create_tables(self):
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS events (block INTEGER NOT NULL, "
+                "log_index INTEGER NOT NULL, transaction_hash TEXT NOT NULL, "
+                "address TEXT NOT NULL, event TEXT NOT NULL, subject TEXT, "
+                "args TEXT NOT NULL, PRIMARY KEY (block, log_index)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS events_subject "
+                "ON events (subject, event, block)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints "
+                "(source TEXT PRIMARY KEY, block INTEGER NOT NULL)"
+            )
+
+
+def main(registry=DEFAULT_REGISTRY):
+    indexer = EventIndexer(
+        load_strategies(registry),
+        load_registry(registry).get("cloners") or [],
+        cache=MetadataCache(),
+    )
+    print(f"Indexed {indexer.update()} new events")
+    indexer.close()
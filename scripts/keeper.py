@@ -0,0 +1,368 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+from scripts.basefee import BaseFeeForecaster
+from scripts.client import web3
+from scripts.metadata_cache import MetadataCache
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+from scripts.prices import PriceEngine
+from scripts.registry import DEFAULT_REGISTRY, load_registry, load_strategies
+from scripts.triggers import read_trigger_state, screen
+from web3.exceptions import TransactionNotFound
+
+import math
+import threading
+import time
+
+GWEI = 10 ** 9
+
+# Nodes only accept a replacement that raises both fees by at least 10%,
+# replacements raise them by a bit more
+MIN_REPLACEMENT_BUMP = 1.1
+REPLACEMENT_BUMP = 1.125
+
+# Most a tend or harvest may cost in wei when strategies.yml sets no
+# keeper.max_call_cost
+MAX_CALL_COST = 10 ** 17
+
+METHODS = ("tend", "harvest")
+
+
+def replica_screen(strategies, block, multicall_address, cache, max_workers):
+    # Triggers evaluated off-chain from the snapshot (scripts.triggers). The
+    # price inputs of the whole fleet are read once, up front.
+    prices = PriceEngine(multicall_address, cache, max_workers)
+    try:
+        prices.prefetch(strategies, block)
+    except Exception as e:
+        print(f"Failed to prefetch prices at block {block}: {e!r}")
+
+    def read(s):
+        try:
+            return read_trigger_state(s, block, multicall_address, cache, prices)
+        except Exception as e:
+            print(f"Failed to read strategy {s} at block {block}: {e!r}")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        states = [state for state in executor.map(read, strategies) if state]
+    return screen(states)
+
+
+def onchain_screen(strategies, block, multicall_address, cache, max_workers):
+    # tendTrigger/harvestTrigger as seen by the chain, one multicall
+    _, values = aggregate(
+        [
+            Call(s, f"{method}Trigger(uint256)(bool)", [1])
+            for s in strategies
+            for method in METHODS
+        ],
+        block,
+        multicall_address,
+    )
+    tend = [s for i, s in enumerate(strategies) if values[2 * i]]
+    harvest = [s for i, s in enumerate(strategies) if values[2 * i + 1]]
+    return tend, harvest
+
+
+class NonceManager:
+    # Hands out consecutive nonces locally so several transactions can be in
+    # flight at once. `sync` re-reads the pending nonce from the node.
+    def __init__(self, address):
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None
+
+    def sync(self):
+        with self._lock:
+            self._next = web3.eth.get_transaction_count(self.address, "pending")
+
+    def take(self):
+        with self._lock:
+            if self._next is None:
+                self._next = web3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+
+class Pending:
+    # A nonce in flight and every transaction hash broadcast for it
+    def __init__(self, nonce, strategy, method, tx, sent_at):
+        self.nonce = nonce
+        self.strategy = strategy
+        self.method = method
+        self.tx = tx
+        self.sent_at = sent_at
+        self.hashes = []
+
+    def __repr__(self):
+        return f"<Pending {self.method} {self.strategy} nonce={self.nonce}>"
+
+
+class Keeper:
+    # Tends and harvests a fleet from a single keeper account:
+    #  - triggers are screened for the whole fleet (`screener`)
+    #  - every candidate is simulated with eth_call and estimateGas, the ones
+    #    that revert or cost more than `max_call_cost` wei are skipped
+    #  - nonces come from a local NonceManager and transactions are signed and
+    #    broadcast concurrently
+    #  - EIP-1559 fees start at 2 * base fee + `priority_fee`; transactions not
+    #    mined after `replace_after` seconds are replaced with the same nonce
+    #    and fees raised by REPLACEMENT_BUMP, up to `max_fee_cap`
+    # A strategy with a transaction in flight is not submitted again.
+    # With a `forecaster` (scripts.basefee) the full screen only runs once the
+    # base fee oracle is expected to accept, or every `max_skip` blocks. The
+    # other blocks still go through `urgent_screener`: tends that repay debt
+    # and harvests past maxReportDelay fire whatever the base fee, and with
+    # the base fee refused the on-chain triggers return only those.
+    def __init__(
+        self,
+        account,
+        strategies,
+        screener=replica_screen,
+        multicall_address=MULTICALL2_ADDRESS,
+        cache=None,
+        max_workers=16,
+        priority_fee=2 * GWEI,
+        max_fee_cap=500 * GWEI,
+        max_call_cost=None,
+        gas_margin=1.2,
+        replace_after=60,
+        forecaster=None,
+        max_skip=25,
+        urgent_screener=onchain_screen,
+        clock=time.time,
+    ):
+        self.account = account
+        self.address = to_checksum_address(str(account))
+        self.strategies = [to_checksum_address(str(s)) for s in strategies]
+        self.screener = screener
+        self.multicall_address = multicall_address
+        self.cache = cache
+        self.max_workers = max_workers
+        self.priority_fee = priority_fee
+        self.max_fee_cap = max_fee_cap
+        self.max_call_cost = max_call_cost
+        self.gas_margin = gas_margin
+        self.replace_after = replace_after
+        self.forecaster = forecaster
+        self.max_skip = max_skip
+        self.urgent_screener = urgent_screener
+        self.clock = clock
+
+        self.nonces = NonceManager(self.address)
+        self.pending = {}
+        self.completed = []
+        self.last_screened = None
+        self._lock = threading.Lock()
+
+    def run(self, poll_interval=1):
+        block = None
+        while True:
+            latest = web3.eth.block_number
+            if latest != block:
+                block = latest
+                if self.due(block):
+                    self.work(block)
+                else:
+                    self.work(block, self.urgent_screener)
+            time.sleep(poll_interval)
+
+    def due(self, block):
+        # Whether `block` gets the full screen, see the forecaster above
+        if self.forecaster is None or self.last_screened is None:
+            return True
+        if block - self.last_screened >= self.max_skip:
+            return True
+        try:
+            self.forecaster.update(block)
+            wake = self.forecaster.wake_block()
+        except Exception as e:
+            # Without a forecast nothing can be skipped
+            print(f"Failed to forecast the base fee at block {block}: {e!r}")
+            return True
+        return wake is not None and wake <= block + 1
+
+    def work(self, block=None, screener=None):
+        # One keeper cycle, returns the Pending submitted in this cycle. A
+        # `screener` other than the keeper's own only looks for urgent work.
+        block = web3.eth.block_number if block is None else block
+        self.check_pending()
+
+        if screener is None:
+            screener = self.screener
+            self.last_screened = block
+        tend, harvest = screener(
+            self.strategies, block, self.multicall_address, self.cache, self.max_workers
+        )
+        busy = {p.strategy for p in self.pending.values()}
+        jobs = [(s, "tend") for s in tend if s not in busy]
+        jobs += [(s, "harvest") for s in harvest if s not in busy and s not in tend]
+        if not jobs:
+            return []
+
+        base_fee = web3.eth.get_block(block)["baseFeePerGas"]
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            gas = list(executor.map(lambda job: self.simulate(*job), jobs))
+        worth = [
+            (strategy, method, gas_limit)
+            for (strategy, method), gas_limit in zip(jobs, gas)
+            if gas_limit is not None
+            and (
+                self.max_call_cost is None
+                or gas_limit * (base_fee + self.priority_fee) <= self.max_call_cost
+            )
+        ]
+        return self.submit(worth, base_fee)
+
+    def simulate(self, strategy, method):
+        # Gas limit for the call, None when it would revert
+        data = "0x" + _calldata(method).hex()
+        tx = {"from": self.address, "to": strategy, "data": data}
+        try:
+            web3.eth.call(tx, "pending")
+            return math.ceil(web3.eth.estimate_gas(tx) * self.gas_margin)
+        except Exception as e:
+            print(f"{method}() of {strategy} would fail: {e!r}")
+            return None
+
+    def submit(self, jobs, base_fee):
+        # Nonces are taken in order, then every transaction is broadcast at
+        # once. A broadcast that fails leaves a gap which is filled with a
+        # cancellation so the following nonces are not stuck behind it.
+        priority_fee = min(self.priority_fee, self.max_fee_cap)
+        max_fee = min(2 * base_fee + priority_fee, self.max_fee_cap)
+        prepared = [
+            Pending(
+                self.nonces.take(),
+                strategy,
+                method,
+                {
+                    "from": self.address,
+                    "to": strategy,
+                    "data": "0x" + _calldata(method).hex(),
+                    "gas": gas_limit,
+                    "value": 0,
+                    "maxFeePerGas": max_fee,
+                    "maxPriorityFeePerGas": priority_fee,
+                    "chainId": web3.eth.chain_id,
+                    "type": 2,
+                },
+                self.clock(),
+            )
+            for strategy, method, gas_limit in jobs
+        ]
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            sent = list(executor.map(self._broadcast, prepared))
+
+        submitted = []
+        for pending, ok in zip(prepared, sent):
+            if not ok:
+                pending = self._cancel(pending)
+                if pending is None:
+                    continue
+            with self._lock:
+                self.pending[pending.nonce] = pending
+            if pending.method in METHODS:
+                submitted.append(pending)
+        return submitted
+
+    def check_pending(self):
+        # Settles mined nonces and replaces the ones stuck for too long
+        confirmed = web3.eth.get_transaction_count(self.address, "latest")
+        now = self.clock()
+        for nonce, pending in sorted(self.pending.items()):
+            if nonce < confirmed:
+                self._settle(pending)
+            elif now - pending.sent_at >= self.replace_after:
+                self.replace(pending)
+
+    def replace(self, pending):
+        # Fees are raised up to the cap. Only once the cap leaves no room for
+        # a bump the node accepts is the transaction left where it is.
+        tx = dict(pending.tx)
+        old_max_fee, old_priority_fee = tx["maxFeePerGas"], tx["maxPriorityFeePerGas"]
+        max_fee = min(math.ceil(old_max_fee * REPLACEMENT_BUMP), self.max_fee_cap)
+        priority_fee = min(math.ceil(old_priority_fee * REPLACEMENT_BUMP), max_fee)
+        if not (
+            _bumped(old_max_fee, max_fee) and _bumped(old_priority_fee, priority_fee)
+        ):
+            print(f"{pending} is stuck at the fee cap")
+            return False
+        tx.update(maxFeePerGas=max_fee, maxPriorityFeePerGas=priority_fee)
+        replacement = Pending(
+            pending.nonce, pending.strategy, pending.method, tx, self.clock()
+        )
+        replacement.hashes = list(pending.hashes)
+        if not self._broadcast(replacement):
+            return False
+        with self._lock:
+            self.pending[pending.nonce] = replacement
+        return True
+
+    def _broadcast(self, pending):
+        tx = dict(pending.tx, nonce=pending.nonce)
+        try:
+            private_key = getattr(self.account, "private_key", None)
+            if private_key is not None:
+                signed = web3.eth.account.sign_transaction(tx, private_key)
+                raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+                tx_hash = web3.eth.send_raw_transaction(raw)
+            else:
+                # Unlocked account on a dev node
+                tx_hash = web3.eth.send_transaction(tx)
+        except Exception as e:
+            print(f"Failed to broadcast {pending}: {e!r}")
+            return False
+        pending.hashes.append(bytes(tx_hash))
+        return True
+
+    def _cancel(self, pending):
+        # Zero value transfer to ourselves with the nonce of a failed broadcast
+        tx = dict(pending.tx, to=self.address, data="0x", gas=21_000)
+        cancel = Pending(pending.nonce, pending.strategy, "cancel", tx, self.clock())
+        if self._broadcast(cancel):
+            return cancel
+        # Nothing got the nonce, the node has to tell us again where we are
+        self.nonces.sync()
+        return None
+
+    def _settle(self, pending):
+        for tx_hash in reversed(pending.hashes):
+            try:
+                receipt = web3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            self.completed.append((pending, receipt))
+            break
+        with self._lock:
+            self.pending.pop(pending.nonce, None)
+
+
+def _bumped(old_fee, new_fee):
+    # Whether a node takes `new_fee` as the replacement of `old_fee`
+    return new_fee >= math.ceil(old_fee * MIN_REPLACEMENT_BUMP)
+
+
+def _calldata(method):
+    return function_signature_to_4byte_selector(f"{method}()")
+
+
+def main(account_id, registry=DEFAULT_REGISTRY):
+    from brownie import accounts
+
+    config = load_registry(registry)
+    # keeper.max_call_cost is in ETH
+    max_call_cost = config.get("keeper", {}).get("max_call_cost")
+    keeper = Keeper(
+        accounts.load(account_id),
+        load_strategies(registry),
+        cache=MetadataCache(),
+        max_workers=config.get("max_workers", 16),
+        max_call_cost=(
+            MAX_CALL_COST if max_call_cost is None else int(max_call_cost * 10 ** 18)
+        ),
+        forecaster=BaseFeeForecaster(),
+    )
+    keeper.run()
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from eth_utils import to_checksum_address
+
+import json
+import os
+import threading
+
+DEFAULT_CACHE_PATH = (
+    Path(os.getenv("MONITOR_CACHE_DIR", Path.home() / ".cache" / "maker-v3-monitor"))
+    / "metadata.json"
+)
+
+
+class MetadataCache:
+    # On-disk cache of metadata that never changes for a given address
+    # (symbol, decimals, ilk, urn, gemJoin...). Reads are signature-based
+    # multicalls, so no ABI is ever needed.
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        self._contracts = data.get("contracts", {})
+
+    def get(self, address):
+        entry = self._contracts.get(to_checksum_address(address))
+        if entry is None or entry["metadata"] is None:
+            return None
+        return dict(entry["metadata"])
+
+    def put(self, address, metadata):
+        with self._lock:
+            self._contracts[to_checksum_address(address)] = {
+                "metadata": None if metadata is None else dict(metadata)
+            }
+            self._save()
+
+    def invalidate(self, address):
+        with self._lock:
+            if self._contracts.pop(to_checksum_address(address), None) is not None:
+                self._save()
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves a torn cache
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"contracts": self._contracts}, f)
+        os.replace(tmp, self.path)
@@ -1,40 +1,214 @@
-from brownie import Contract
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from eth_utils import to_checksum_address
+from scripts.alerts import AlertEngine, format_alert
+from scripts.client import web3
+from scripts.metadata_cache import MetadataCache
+from scripts.multicall import MULTICALL2_ADDRESS, install_read_cache
+from scripts.notifier import TelegramNotifier
+from scripts.prices import PriceEngine
+from scripts.read_cache import ReadCache
+from scripts.registry import DEFAULT_REGISTRY, load_registry, load_strategies
+from scripts.rpc_trace import traced
+from scripts.snapshot import take_snapshot
+from scripts.triggers import read_trigger_state
 
 import os
-import requests
+import sys
+import threading
 
 telegram_bot_key = os.getenv("TELEGRAM_BOT_KEY")
+telegram_chat_id = "-1001580241915"
 
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+@traced
+def main(registry=DEFAULT_REGISTRY, read_many=None):
+    # Only strategies with a new alert are reported, see scripts.alerts.
+    # `read_many(strategies, block)` returns (states, {strategy: error}) like
+    # read_fleet, scripts.shards passes one reading on worker processes.
+    install_read_cache(ReadCache())
+    config = load_registry(registry)
+    if read_many is None:
+        read_many = partial(
+            read_fleet,
+            max_workers=config.get("max_workers", 16),
+            cache=MetadataCache(),
+        )
+    states, errors = read_many(load_strategies(registry), web3.eth.block_number)
+    engine = AlertEngine(**config.get("alerts", {}))
+    for report in alert_reports(states, errors, engine):
+        send_msg("\n".join(report))
+    close_notifier()
+
+
+@traced
+def daemon(registry=DEFAULT_REGISTRY, poll_interval=1):
+    # Long running mode: follow new blocks and report a strategy as soon as it
+    # leaves its tolerance band instead of waiting for the next cron run
+    from scripts.daemon import MonitorDaemon
+    from scripts.history import SnapshotStore
+
+    install_read_cache(ReadCache())
+    config = load_registry(registry)
+    cache = MetadataCache()
+    max_workers = config.get("max_workers", 16)
+    history = SnapshotStore()
+    alerts = AlertEngine(path=None, **config.get("alerts", {}))
+    # Snapshots carry the price inputs too, so the alerts know which price
+    # source binds. They are read for every strategy of a refresh in one go.
+    prices = PriceEngine(cache=cache, max_workers=max_workers)
+
+    def on_snapshot(snapshot):
+        history.append(snapshot)
+        fired = alerts.evaluate(snapshot)
+        if fired:
+            send_msg("\n".join(format_alerts(snapshot, fired)))
+
+    try:
+        MonitorDaemon(
+            load_strategies(registry),
+            on_snapshot,
+            reader=partial(read_trigger_state, prices=prices),
+            cache=cache,
+            poll_interval=float(poll_interval),
+            max_workers=max_workers,
+            prefetch=prices.prefetch,
+        ).run()
+    finally:
+        close_notifier()
+
+
+def monitor_fleet(
+    strategies,
+    block_identifier=None,
+    multicall_address=MULTICALL2_ADDRESS,
+    max_workers=16,
+    cache=None,
+):
+    # Every strategy is read from the same block, concurrently, so a cycle
+    # takes about as long as the slowest strategy instead of the sum of all
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+
+    def report(s):
+        try:
+            return print_monitoring_info_for_strategy(
+                s, block_identifier, multicall_address, cache
+            )
+        except Exception as e:
+            return ["```", f"Failed to read strategy {s}: {e!r}", "```"]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(report, strategies))
+
+
+def read_fleet(
+    strategies,
+    block_identifier=None,
+    multicall_address=MULTICALL2_ADDRESS,
+    max_workers=16,
+    cache=None,
+):
+    # (trigger states in fleet order, {strategy: error}). Same reads as
+    # monitor_fleet plus the price inputs, which are fetched for the whole
+    # fleet in one batch.
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+
+    prices = PriceEngine(multicall_address, cache, max_workers)
+    try:
+        prices.prefetch(strategies, block_identifier)
+    except Exception as e:
+        print(f"Failed to prefetch prices at block {block_identifier}: {e!r}")
+
+    def read(s):
+        try:
+            state = read_trigger_state(
+                s, block_identifier, multicall_address, cache, prices
+            )
+            return state, None
+        except Exception as e:
+            return None, repr(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(read, strategies))
+    states = [state for state, _ in results if state is not None]
+    errors = {
+        to_checksum_address(str(s)): error
+        for s, (_, error) in zip(strategies, results)
+        if error is not None
+    }
+    return states, errors
+
+
+def alert_reports(states, errors, engine):
+    # Reports of the strategies `engine` has a new alert for, then of the
+    # ones that could not be read or evaluated. One strategy that cannot be
+    # evaluated must not lose the alerts of the others.
+    reports = []
+    errors = dict(errors)
+    for state in states:
+        s = state["strategy"]
+        try:
+            fired = engine.evaluate(state)
+        except Exception as e:
+            errors[s] = repr(e)
+            continue
+        if fired:
+            try:
+                reports.append(format_alerts(state, fired))
+            except Exception:
+                # A field the report shows could not be read
+                alerts = [f"Alert: {format_alert(alert)}" for alert in fired]
+                reports.append(["```", f"Strategy {s}", *alerts, "```"])
+    for s, error in errors.items():
+        if engine.observe(s, {"read": "failed"}):
+            reports.append(["```", f"Failed to read strategy {s}: {error}", "```"])
+    return reports
 
-def main():
-    eth_c = print_monitoring_info_for_strategy(
-        "0xd33535e9F2E09485aC9cE8b27F865251161065E0"
-    )
-    send_msg("\n".join(eth_c))
 
-    yfi_a = print_monitoring_info_for_strategy(
-        "0x19b2c8b3C601E9690ee524B02d4aCA058Db8B0D7"
+def alert_fleet(
+    strategies,
+    engine,
+    block_identifier=None,
+    multicall_address=MULTICALL2_ADDRESS,
+    max_workers=16,
+    cache=None,
+):
+    # read_fleet, but only the strategies `engine` has a new alert for are
+    # reported
+    states, errors = read_fleet(
+        strategies, block_identifier, multicall_address, max_workers, cache
     )
-    send_msg("\n".join(yfi_a))
+    return alert_reports(states, errors, engine)
 
 
-def print_monitoring_info_for_strategy(s):
-    output = ["```"]
+def print_monitoring_info_for_strategy(
+    s, block_identifier="latest", multicall_address=MULTICALL2_ADDRESS, cache=None
+):
+    # All the reads happen in one multicall pinned to a single block
+    return format_snapshot(take_snapshot(s, block_identifier, multicall_address, cache))
 
-    s = Contract(s)
-    want = Contract(s.want())
-    vault = Contract(s.vault())
-    yvault = Contract(s.yVault())
-    maker_dai_delegate = Contract("0xf728c1645739b1d4367A94232d7473016Df908E7")
 
-    output.append(f"{s.name()} {s}")
+def format_snapshot(snapshot):
+    output = ["```"]
 
-    shares = yvault.balanceOf(s)
-    value = shares * yvault.pricePerShare() / 1e18
-    debt = s.balanceOfDebt()
+    symbol = snapshot["want_symbol"]
+    output.append(f"{snapshot['name']} {snapshot['strategy']}")
+
+    value = (
+        snapshot["shares"]
+        * snapshot["price_per_share"]
+        / 10 ** snapshot["yvault_decimals"]
+    )
+    debt = snapshot["debt"]
 
     output.append(
-        f"Balance of CDP #{s.cdpId()}: {s.balanceOfMakerVault()/1e18:.2f} {want.symbol()}"
+        f"Balance of CDP #{snapshot['cdp_id']}: {snapshot['collateral']/1e18:.2f} {symbol}"
     )
     output.append(f"Debt: {debt/1e18:.2f} DAI")
     output.append(f"Value of investment: {value/1e18:.2f} DAI")
@@ -44,30 +218,63 @@ def print_monitoring_info_for_strategy(s):
     else:
         output.append(f"Current loss: {(debt - value)/1e18:.2f} DAI")
 
-    output.append(
-        f"{want.symbol()} price (spotter): {maker_dai_delegate.getSpotPrice(s.ilk())/1e18:.2f}"
-    )
-    output.append(f"Target c-ratio: {s.collateralizationRatio()/1e18:.2f}")
-    output.append(f"Current c-ratio: {s.getCurrentMakerVaultRatio()/1e18:.2f}")
-    output.append(
-        f"Liquidation ratio: {maker_dai_delegate.getLiquidationRatio(s.ilk())/1e27:.2f}"
-    )
-    output.append(f"Debt ratio: {vault.strategies(s).dict()['debtRatio']/100:.2f}%")
+    output.append(f"{symbol} price (spotter): {snapshot['spot_price']/1e18:.2f}")
+    output.append(f"Target c-ratio: {snapshot['collateralization_ratio']/1e18:.2f}")
+    output.append(f"Current c-ratio: {snapshot['current_ratio']/1e18:.2f}")
+    output.append(f"Liquidation ratio: {snapshot['liquidation_ratio']/1e27:.2f}")
+    output.append(f"Debt ratio: {snapshot['debt_ratio']/100:.2f}%")
+
+    if debt > 0:
+        # numpy is only needed here, keep it out of the import of this module
+        from scripts.projection import Projection
+
+        projection = Projection([snapshot], shocks=[1.0])
+        repay_drop = max(0, 1 - projection.repay_shock[0])
+        liquidation_drop = max(0, 1 - projection.liquidation_shock[0])
+        output.append(f"Debt repayment after a {repay_drop:.2%} price drop")
+        output.append(f"Liquidation after a {liquidation_drop:.2%} price drop")
 
-    if s.tendTrigger(1):
+    if snapshot["tend_trigger"]:
         output.append(
             f"Strategy is outside the tolerance band and should be rebalanced. Call tend()!"
         )
     else:
         output.append(f"Everything looks OK")
 
+    output.append(f"Block: {snapshot['block']}")
     output.append("```")
     return output
 
 
+def format_alerts(snapshot, alerts):
+    output = format_snapshot(snapshot)
+    output[2:2] = [f"Alert: {format_alert(alert)}" for alert in alerts]
+    return output
+
+
+def get_notifier():
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = TelegramNotifier(telegram_bot_key, telegram_chat_id)
+        return _notifier
+
+
 def send_msg(text):
-    payload = {"chat_id": "-1001580241915", "text": text, "parse_mode": "MarkdownV2"}
-    r = requests.get(
-        "https://api.telegram.org/bot" + telegram_bot_key + "/sendMessage",
-        params=payload,
-    )
+    get_notifier().send(text)
+
+
+def close_notifier(timeout=None):
+    # Deliver what is queued and stop the notifier, the next send_msg starts
+    # a new one
+    global _notifier
+    with _notifier_lock:
+        notifier, _notifier = _notifier, None
+    if notifier is not None:
+        notifier.close(timeout)
+
+
+if __name__ == "__main__":
+    # Stand-alone entry point for cron, without brownie:
+    # WEB3_PROVIDER_URI=... python -m scripts.monitor [registry]
+    main(*sys.argv[1:])
@@ -0,0 +1,123 @@
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+from scripts.client import web3
+from scripts.rpc_trace import active_tracer
+
+try:
+    from eth_abi import decode, encode
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi as decode, encode_abi as encode
+
+# Multicall2 deployment on mainnet (https://github.com/makerdao/multicall)
+MULTICALL2_ADDRESS = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+
+TRY_BLOCK_AND_AGGREGATE = "tryBlockAndAggregate(bool,(address,bytes)[])"
+
+# Process wide scripts.read_cache.ReadCache consulted by aggregate, if any
+_read_cache = None
+
+
+def _split_types(types):
+    # "uint256,(address,bytes)[]" -> ["uint256", "(address,bytes)[]"]
+    parts, depth, current = [], 0, ""
+    for char in types:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+class Call:
+    # A single read described by its human readable signature, e.g.
+    # Call(yvault, "balanceOf(address)(uint256)", [strategy])
+    def __init__(self, target, signature, args=()):
+        self.target = to_checksum_address(str(target))
+        self.signature = signature
+        self.args = list(args)
+
+        name_and_inputs, outputs = signature.split(")(", 1)
+        self.function = name_and_inputs + ")"
+        self.input_types = _split_types(name_and_inputs.split("(", 1)[1])
+        self.output_types = _split_types(outputs[:-1])
+
+    @property
+    def calldata(self):
+        selector = function_signature_to_4byte_selector(self.function)
+        return selector + encode(self.input_types, self.args)
+
+    def decode_output(self, data):
+        values = decode(self.output_types, bytes(data))
+        if len(values) == 1:
+            return values[0]
+        return tuple(values)
+
+    def __repr__(self):
+        return f"<Call {self.target}.{self.function}>"
+
+
+def install_read_cache(cache):
+    # Route every aggregate through `cache` (None to disable), returns the
+    # previously installed one
+    global _read_cache
+    previous, _read_cache = _read_cache, cache
+    return previous
+
+
+def aggregate(calls, block_identifier="latest", multicall_address=MULTICALL2_ADDRESS):
+    # Execute every call in a single eth_call through Multicall2. All reads are
+    # served from the same block. Reverted calls are returned as None so a
+    # single failing getter (e.g. an unauthorized OSM peek) does not sink the
+    # whole batch.
+    calls = list(calls)
+    cache = _read_cache
+    tracer = active_tracer()
+    if cache is None and tracer is None:
+        return _aggregate(calls, block_identifier, multicall_address)
+
+    fetched = []
+
+    def fetch(missing):
+        if tracer is None:
+            return _aggregate(missing, block_identifier, multicall_address)
+        fetched.extend(missing)
+        with tracer.batch(missing):
+            return _aggregate(missing, block_identifier, multicall_address)
+
+    if tracer is not None:
+        tracer.name(TRY_BLOCK_AND_AGGREGATE)
+        start = tracer.clock()
+    if cache is not None:
+        result = cache.read(calls, block_identifier, fetch)
+    else:
+        result = fetch(calls)
+    if tracer is not None:
+        tracer.record_calls(calls, fetched, block_identifier, start, tracer.clock())
+    return result
+
+
+def _aggregate(calls, block_identifier, multicall_address):
+    aggregator = Call(
+        multicall_address,
+        f"{TRY_BLOCK_AND_AGGREGATE}(uint256,bytes32,(bool,bytes)[])",
+        [False, [(call.target, call.calldata) for call in calls]],
+    )
+    raw = web3.eth.call(
+        {"to": aggregator.target, "data": "0x" + aggregator.calldata.hex()},
+        block_identifier,
+    )
+    block_number, _, results = aggregator.decode_output(raw)
+
+    decoded = []
+    for call, (success, data) in zip(calls, results):
+        if not success or len(data) == 0:
+            decoded.append(None)
+            continue
+        try:
+            decoded.append(call.decode_output(data))
+        except Exception:
+            decoded.append(None)
+    return block_number, decoded
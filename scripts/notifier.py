@@ -0,0 +1,176 @@
+from collections import deque
+
+import requests
+import threading
+import time
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TelegramNotifier:
+    # Delivers messages to the Bot API from a background thread:
+    #  - one persistent HTTP session for every request
+    #  - a bounded outbound queue, the oldest message is dropped when full
+    #  - at most one request per chat every `min_interval` seconds
+    #  - messages queued for the same chat are merged into a single one
+    #  - 429s honour `retry_after`, 5xx and network errors back off
+    #  - each chat is scheduled on its own due time, so one chat waiting on
+    #    its rate limit or backoff does not delay the others
+    def __init__(
+        self,
+        bot_key,
+        chat_id,
+        api_url=TELEGRAM_API_URL,
+        max_queue=1000,
+        min_interval=3.0,
+        coalesce_delay=0.5,
+        max_retries=5,
+        backoff=1.0,
+        timeout=10,
+    ):
+        self.url = f"{api_url}/bot{bot_key}/sendMessage"
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.coalesce_delay = coalesce_delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.sent = self.failed = self.dropped = 0
+
+        self._queue = deque(maxlen=max_queue)
+        self._next_send = {}
+        self._queued_at = {}
+        self._attempts = {}
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def send(self, text, chat_id=None):
+        chat_id = chat_id or self.chat_id
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append((chat_id, text))
+            self._queued_at.setdefault(chat_id, time.monotonic())
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        # Block until every queued message has been delivered or given up on
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        self.session.close()
+
+    def _due(self, chat_id):
+        # When the next message to the chat can go: after the coalescing
+        # delay of its oldest queued report and its rate limit or backoff
+        return max(
+            self._queued_at.get(chat_id, 0) + self.coalesce_delay,
+            self._next_send.get(chat_id, 0),
+        )
+
+    def _run(self):
+        # Each chat waits on its own due time, a chat that is rate limited or
+        # backing off does not hold up the others
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._queue:
+                        return
+                    if not self._queue:
+                        self._cond.wait()
+                        continue
+                    chat_id = min({chat for chat, _ in self._queue}, key=self._due)
+                    wait = self._due(chat_id) - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                text = self._take_batch(chat_id)
+                self._busy = True
+
+            retry_after = self._deliver(chat_id, text)
+
+            with self._cond:
+                now = time.monotonic()
+                if retry_after is None:
+                    self._attempts.pop(chat_id, None)
+                    self._next_send[chat_id] = now + self.min_interval
+                elif len(self._queue) == self._queue.maxlen:
+                    # No room left to retry it, the oldest message is dropped
+                    # like in send()
+                    self.dropped += 1
+                    self._attempts.pop(chat_id, None)
+                    self._next_send[chat_id] = now + retry_after
+                else:
+                    # Back in front of the chat's queue until its backoff is over
+                    self._queue.appendleft((chat_id, text))
+                    self._queued_at.setdefault(chat_id, now)
+                    self._next_send[chat_id] = now + retry_after
+                self._busy = False
+                self._cond.notify_all()
+
+    def _take_batch(self, chat_id):
+        texts, length, remaining = [], 0, deque()
+        while self._queue:
+            chat, text = self._queue.popleft()
+            fits = not texts or length + len(text) + 1 <= MAX_MESSAGE_LENGTH
+            if chat == chat_id and fits:
+                texts.append(text)
+                length += len(text) + 1
+            else:
+                remaining.append((chat, text))
+        self._queue.extendleft(reversed(remaining))
+        self._queued_at.pop(chat_id, None)
+        if any(chat == chat_id for chat, _ in self._queue):
+            self._queued_at[chat_id] = time.monotonic()
+        return "\n".join(texts)
+
+    def _deliver(self, chat_id, text):
+        # One attempt. Returns None when done with the message, delivered or
+        # given up on, otherwise the seconds to wait before retrying it.
+        attempt = self._attempts.get(chat_id, 0)
+        delay = self.backoff * 2 ** attempt
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "MarkdownV2"}
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Telegram request failed: {e!r}")
+        else:
+            if response.ok:
+                self.sent += 1
+                return None
+            if response.status_code == 429:
+                try:
+                    parameters = response.json().get("parameters", {})
+                    delay = parameters.get("retry_after", delay)
+                except ValueError:
+                    pass
+            elif response.status_code < 500:
+                # Malformed message or bad chat, retrying will not help
+                print(f"Telegram rejected message: {response.text}")
+                attempt = self.max_retries
+        if attempt >= self.max_retries:
+            self.failed += 1
+            self._attempts.pop(chat_id, None)
+            return None
+        self._attempts[chat_id] = attempt + 1
+        return delay
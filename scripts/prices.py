@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils import to_checksum_address
+from scripts.client import web3
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+from scripts.snapshot import SPOTTER, VAT, resolve_strategy
+from scripts.triggers import (
+    ZERO_ADDRESS,
+    Revert,
+    binding_source,
+    collateral_price,
+    price_sources,
+    read_osm,
+)
+
+import threading
+
+
+class PriceEngine:
+    # Off-chain Strategy._getCollateralPrice for a whole fleet. For a block it
+    # reads, per batch of strategies:
+    #  - one multicall with the oracles set on every strategy and the Vat
+    #    spot and Spotter mat of every distinct ilk, plus par
+    #  - one multicall with latestAnswer of every distinct Chainlink feed
+    #  - the OSM read()/foresight() of every strategy, concurrently, from the
+    #    strategy itself since the proxies only answer to authorized callers
+    # and applies the same try/catch fallbacks and min logic as the Strategy.
+    # Inputs are kept for the last `max_blocks` blocks.
+    def __init__(
+        self,
+        multicall_address=MULTICALL2_ADDRESS,
+        cache=None,
+        max_workers=16,
+        max_blocks=8,
+    ):
+        self.multicall_address = multicall_address
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_blocks = max_blocks
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def quotes(self, strategies, block_identifier="latest"):
+        # {strategy: quote} where a quote holds the collateral price used by
+        # the Strategy (None where it would revert), the binding source and
+        # the price of every source
+        block = self._block_number(block_identifier)
+        states = self._states(strategies, block)
+        return {s: quote(states[s]) for s in states}
+
+    def prefetch(self, strategies, block_identifier="latest"):
+        # Reads the inputs of every strategy of a fleet at once, so the
+        # per-strategy inputs() calls that follow are served from memory
+        block = self._block_number(block_identifier)
+        self._states(strategies, block)
+        return block
+
+    def inputs(self, strategy, block_identifier="latest"):
+        # The oracle inputs of one strategy, as used by scripts.triggers
+        block = self._block_number(block_identifier)
+        state = self._states([strategy], block)[to_checksum_address(str(strategy))]
+        return {
+            key: state[key] for key in ("osm_current", "osm_future", "chainlink_answer")
+        }
+
+    def _block_number(self, block_identifier):
+        if isinstance(block_identifier, int):
+            return block_identifier
+        return web3.eth.get_block(block_identifier)["number"]
+
+    def _states(self, strategies, block):
+        strategies = [to_checksum_address(str(s)) for s in strategies]
+        with self._lock:
+            cached = self._blocks.get(block, {})
+            missing = [s for s in strategies if s not in cached]
+        if missing:
+            fetched = self._fetch(missing, block)
+            with self._lock:
+                self._blocks.setdefault(block, {}).update(fetched)
+                self._blocks.move_to_end(block)
+                while len(self._blocks) > self.max_blocks:
+                    self._blocks.popitem(last=False)
+                cached = self._blocks[block]
+        return {s: cached[s] for s in strategies}
+
+    def _fetch(self, strategies, block):
+        def resolve(s):
+            return resolve_strategy(s, block, self.multicall_address, self.cache)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            infos = dict(zip(strategies, executor.map(resolve, strategies)))
+        ilks = sorted({info["ilk"] for info in infos.values()})
+
+        calls = [Call(SPOTTER, "par()(uint256)")]
+        for s in strategies:
+            calls.append(Call(s, "wantToUSDOSMProxy()(address)"))
+            calls.append(Call(s, "chainlinkWantToUSDPriceFeed()(address)"))
+        for ilk in ilks:
+            calls.append(
+                Call(
+                    VAT, "ilks(bytes32)(uint256,uint256,uint256,uint256,uint256)", [ilk]
+                )
+            )
+            calls.append(Call(SPOTTER, "ilks(bytes32)(address,uint256)", [ilk]))
+        _, values = aggregate(calls, block, self.multicall_address)
+
+        par, values = values[0], iter(values[1:])
+        states = {
+            s: dict(
+                strategy=infos[s]["strategy"],
+                block=block,
+                ilk=infos[s]["ilk"],
+                par=par,
+                osm_proxy=next(values),
+                chainlink=next(values),
+            )
+            for s in strategies
+        }
+        spots = {}
+        for ilk in ilks:
+            _, _, spot, _, _ = next(values)
+            _, mat = next(values)
+            spots[ilk] = spot, mat
+        for state in states.values():
+            state["spot"], state["mat"] = spots[state["ilk"]]
+
+        feeds = sorted(
+            {state["chainlink"] for state in states.values()} - {ZERO_ADDRESS, None}
+        )
+        osm_reads = [
+            (s, key, signature)
+            for s, state in states.items()
+            if state["osm_proxy"] != ZERO_ADDRESS
+            for key, signature in (
+                ("osm_current", "read()(uint256,bool)"),
+                ("osm_future", "foresight()(uint256,bool)"),
+            )
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            answers = executor.submit(
+                aggregate,
+                [Call(feed, "latestAnswer()(int256)") for feed in feeds],
+                block,
+                self.multicall_address,
+            )
+            osm_values = executor.map(
+                lambda read: read_osm(states[read[0]], read[2], block), osm_reads
+            )
+            for (s, key, _), value in zip(osm_reads, osm_values):
+                states[s][key] = value
+            answers = dict(zip(feeds, answers.result()[1]))
+
+        for state in states.values():
+            state.setdefault("osm_current", None)
+            state.setdefault("osm_future", None)
+            state["chainlink_answer"] = answers.get(state["chainlink"])
+        return states
+
+
+def quote(state):
+    try:
+        sources = dict(price_sources(state))
+        return {
+            "price": collateral_price(state),
+            "binding": binding_source(state),
+            "sources": sources,
+        }
+    except Revert as e:
+        return {"price": None, "binding": None, "sources": {}, "error": str(e)}
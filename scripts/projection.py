@@ -0,0 +1,67 @@
+import numpy as np
+
+
+def shock_grid(low=0.5, high=1.5, points=10_000):
+    # Collateral price multipliers, 1.0 being the current price
+    return np.linspace(low, high, points)
+
+
+def _column(snapshots, key, scale):
+    return np.array([snapshot[key] / scale for snapshot in snapshots], dtype=float)
+
+
+def _liquidation_spot(snapshots):
+    # Vat spot (price with safety margin) used to decide liquidations. The
+    # OSM future price becomes the next spot after the hop, so when it is
+    # known the more pessimistic of both is used.
+    spots = []
+    for snapshot in snapshots:
+        spot = snapshot["spot"] / 1e27
+        future = snapshot.get("osm_future")
+        if future is not None and future[1] and future[0] > 0:
+            spot = min(spot, future[0] / 1e18 / (snapshot["mat"] / 1e27))
+        spots.append(spot)
+    return np.array(spots, dtype=float)
+
+
+class Projection:
+    # Applies every price shock to every strategy in one broadcasted pass.
+    # Rows are strategies and columns are shocks:
+    #  - ratio: projected getCurrentMakerVaultRatio
+    #  - repay: whether adjustPosition would call _repayDebt
+    #  - headroom: fraction of the collateral value that can still be lost
+    #    before the urn becomes unsafe in the Vat (negative = liquidatable)
+    def __init__(self, snapshots, shocks=None):
+        self.strategies = [snapshot["strategy"] for snapshot in snapshots]
+        self.shocks = shock_grid() if shocks is None else np.asarray(shocks)
+
+        current_ratio = _column(snapshots, "current_ratio", 1e18)
+        lower_band = _column(snapshots, "collateralization_ratio", 1e18) - _column(
+            snapshots, "rebalance_tolerance", 1e18
+        )
+        ink = _column(snapshots, "ink", 1e18)
+        debt = _column(snapshots, "art", 1e18) * _column(snapshots, "rate", 1e27)
+        spot = _liquidation_spot(snapshots)
+
+        # Every price source moves with the shock, so the pessimistic ratio
+        # scales linearly with it
+        self.ratio = np.outer(current_ratio, self.shocks)
+        self.repay = (self.ratio < lower_band[:, None]) & (debt[:, None] > 0)
+        with np.errstate(divide="ignore"):
+            safe_value = np.outer(ink * spot, self.shocks)
+            self.headroom = 1 - np.divide(debt[:, None], safe_value)
+
+        # Shock at which each threshold is crossed
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.repay_shock = np.where(debt > 0, lower_band / current_ratio, 0)
+            self.liquidation_shock = np.where(debt > 0, debt / (ink * spot), 0)
+
+    def for_strategy(self, strategy):
+        i = self.strategies.index(strategy)
+        return {
+            "ratio": self.ratio[i],
+            "repay": self.repay[i],
+            "headroom": self.headroom[i],
+            "repay_shock": self.repay_shock[i],
+            "liquidation_shock": self.liquidation_shock[i],
+        }
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+from scripts.snapshot import CDP_MANAGER
+
+import threading
+
+# Getters whose result never changes for a given target and calldata. Entries
+# are matched on the function alone or on (target, function). cdpId and yVault
+# are left out on purpose: governance can move them (shiftToCdp and
+# migrateToNewDaiYVault).
+PERMANENT_GETTERS = frozenset(
+    [
+        "want()",
+        "vault()",
+        "decimals()",
+        "symbol()",
+        (CDP_MANAGER, "ilks(uint256)"),
+        (CDP_MANAGER, "urns(uint256)"),
+    ]
+)
+
+
+class ReadCache:
+    # Read-through cache in front of Multicall2, keyed by
+    # (block, target, calldata):
+    #  - results pinned to a block number are kept in an LRU of `maxsize`
+    #  - permanent getters are kept forever whatever the block
+    #  - concurrent readers of the same key wait for the one already fetching
+    #    it, so a fleet sweep reads shared state (vat.ilks, spotter.par...)
+    #    once per block instead of once per strategy
+    # Reads at "latest" or another tag are only served permanent entries, their
+    # results are stored under the block number the multicall reports.
+    def __init__(self, maxsize=65536, permanent=PERMANENT_GETTERS):
+        self.maxsize = maxsize
+        self.permanent = permanent
+        self.hits = self.misses = 0
+
+        self._entries = OrderedDict()
+        self._permanent = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def is_permanent(self, call):
+        return (
+            call.function in self.permanent
+            or (call.target, call.function) in self.permanent
+        )
+
+    def __len__(self):
+        return len(self._entries) + len(self._permanent)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._permanent.clear()
+
+    def read(self, calls, block_identifier, fetch):
+        # `fetch(calls)` runs the multicall at `block_identifier` and returns
+        # (block_number, values) like aggregate
+        block = block_identifier if isinstance(block_identifier, int) else None
+        values = [None] * len(calls)
+        owned, waiting = [], []
+
+        with self._lock:
+            for i, call in enumerate(calls):
+                key = self._key(block, call)
+                entry = None if key is None else self._lookup(key)
+                if key is None:
+                    owned.append((i, None))
+                    self.misses += 1
+                elif entry:
+                    values[i] = entry[0]
+                    self.hits += 1
+                elif key in self._pending:
+                    waiting.append((i, key, self._pending[key]))
+                else:
+                    self._pending[key] = threading.Event()
+                    owned.append((i, key))
+                    self.misses += 1
+
+        block_number, fetched = block, []
+        try:
+            if owned or block is None:
+                block_number, fetched = fetch([calls[i] for i, _ in owned])
+        finally:
+            with self._lock:
+                for (i, key), value in zip(owned, fetched):
+                    values[i] = value
+                    self._store(key or self._key(block_number, calls[i]), value)
+                for _, key in owned:
+                    if key is not None:
+                        self._pending.pop(key).set()
+
+        retry = []
+        for i, key, event in waiting:
+            event.wait()
+            with self._lock:
+                entry = self._lookup(key)
+                self.hits += bool(entry)
+            if entry:
+                values[i] = entry[0]
+            else:
+                # The reader that owned the key failed, fetch it ourselves
+                retry.append(i)
+        if retry:
+            _, fetched = fetch([calls[i] for i in retry])
+            for i, value in zip(retry, fetched):
+                values[i] = value
+
+        return block_number, values
+
+    def _key(self, block, call):
+        if self.is_permanent(call):
+            return (None, call.target, bytes(call.calldata))
+        if block is None:
+            return None
+        return (block, call.target, bytes(call.calldata))
+
+    def _lookup(self, key):
+        # Returns a 1-tuple so cached None (reverted calls) is still a hit
+        if key[0] is None:
+            if key in self._permanent:
+                return (self._permanent[key],)
+        elif key in self._entries:
+            self._entries.move_to_end(key)
+            return (self._entries[key],)
+        return None
+
+    def _store(self, key, value):
+        if key[0] is None:
+            # A failed read of an immutable getter may succeed later
+            if value is not None:
+                self._permanent[key] = value
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from eth_utils import event_signature_to_log_topic, to_checksum_address
+from scripts.client import web3
+import yaml
+
+DEFAULT_REGISTRY = Path(__file__).parent.parent / "strategies.yml"
+
+CLONER_EVENTS = [
+    "0x" + event_signature_to_log_topic("Deployed(address)").hex(),
+    "0x" + event_signature_to_log_topic("Cloned(address)").hex(),
+]
+
+
+def load_registry(path=DEFAULT_REGISTRY):
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def discover_clones(cloner, from_block=0, to_block="latest"):
+    # Original strategies come from `Deployed`, clones from `Cloned`. Both
+    # events have the strategy address as their only (indexed) argument.
+    logs = web3.eth.get_logs(
+        {
+            "address": to_checksum_address(str(cloner)),
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [CLONER_EVENTS],
+        }
+    )
+    return [to_checksum_address(log["topics"][1][-20:]) for log in logs]
+
+
+def load_strategies(path=DEFAULT_REGISTRY):
+    registry = load_registry(path)
+
+    strategies = [to_checksum_address(s) for s in registry.get("strategies") or []]
+    for cloner in registry.get("cloners") or []:
+        strategies += discover_clones(cloner["address"], cloner.get("from_block", 0))
+
+    # Keep the configured order but never monitor a strategy twice
+    return list(dict.fromkeys(strategies))
@@ -0,0 +1,242 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from eth_utils import function_signature_to_4byte_selector
+from scripts.client import web3
+
+import json
+import os
+import sys
+import threading
+import time
+
+# Set to a file path to trace a run: a summary is printed at the end and a
+# Chrome trace (chrome://tracing, ui.perfetto.dev) is written to that path
+TRACE_ENV = "RPC_TRACE"
+
+# Methods whose first parameter is a transaction and second a block
+_CALL_METHODS = ("eth_call", "eth_estimateGas")
+
+# Process wide RpcTracer, if any
+_tracer = None
+
+
+class RpcTracer:
+    # Records every JSON-RPC round-trip made through the brownie web3 provider
+    # (method, target, function, block, latency, payload sizes) and every
+    # contract call read through scripts.multicall.aggregate with its cache
+    # status. Calls served by the read cache never reach the provider.
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.round_trips = []
+        self.calls = []
+        self.functions = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def name(self, function):
+        # Show round-trips to `function` by name instead of selector
+        selector = function_signature_to_4byte_selector(function)
+        self.functions["0x" + selector.hex()] = function
+
+    @contextmanager
+    def batch(self, calls):
+        # Attribute the round-trips made inside to these contract calls
+        previous = getattr(self._local, "calls", None)
+        self._local.calls = calls
+        try:
+            yield
+        finally:
+            self._local.calls = previous
+
+    def record_round_trip(self, method, params, response, start, end):
+        target = block = function = None
+        if method in _CALL_METHODS or method == "eth_sendTransaction":
+            tx = params[0] if params else {}
+            target = tx.get("to")
+            data = tx.get("data") or tx.get("input") or ""
+            function = self.functions.get(data[:10], data[:10] or None)
+            if method in _CALL_METHODS and len(params) > 1:
+                block = params[1]
+        elif method in ("eth_getBlockByNumber", "eth_getBlockByHash"):
+            block = params[0] if params else None
+        elif method in ("eth_getBalance", "eth_getCode", "eth_getTransactionCount"):
+            block = params[1] if len(params) > 1 else None
+
+        record = dict(
+            method=method,
+            target=target,
+            function=function,
+            block=block,
+            start=start - self.started,
+            latency=end - start,
+            request_bytes=_size(params),
+            response_bytes=_size(response),
+            error="error" in response if isinstance(response, dict) else False,
+            thread=threading.get_ident(),
+        )
+        calls = getattr(self._local, "calls", None)
+        if calls is not None:
+            record["calls"] = [f"{call.target}.{call.function}" for call in calls]
+        with self._lock:
+            self.round_trips.append(record)
+
+    def record_calls(self, calls, fetched, block_identifier, start, end):
+        # `fetched` are the calls that went to the node, the rest were hits
+        fetched = {id(call) for call in fetched}
+        thread = threading.get_ident()
+        for function in {call.function for call in calls}:
+            self.name(function)
+        with self._lock:
+            for call in calls:
+                self.calls.append(
+                    dict(
+                        target=call.target,
+                        function=call.function,
+                        block=block_identifier,
+                        cache="miss" if id(call) in fetched else "hit",
+                        start=start - self.started,
+                        latency=end - start,
+                        request_bytes=len(call.calldata),
+                        thread=thread,
+                    )
+                )
+
+    def summary(self, top=10):
+        with self._lock:
+            round_trips, calls = list(self.round_trips), list(self.calls)
+        total = sum(r["latency"] for r in round_trips)
+        methods = Counter(r["method"] for r in round_trips)
+        hits = sum(c["cache"] == "hit" for c in calls)
+
+        lines = [
+            f"RPC round-trips: {len(round_trips)} in {total:.3f}s, "
+            f"{sum(r['request_bytes'] for r in round_trips)} bytes sent, "
+            f"{sum(r['response_bytes'] for r in round_trips)} received",
+            "  " + ", ".join(f"{m}: {n}" for m, n in methods.most_common()),
+            f"Contract calls: {len(calls)}, {hits} cache hits, "
+            f"{len(calls) - hits} misses",
+            "Slowest round-trips:",
+        ]
+        slowest = sorted(round_trips, key=lambda r: r["latency"], reverse=True)
+        for r in slowest[:top]:
+            lines.append(f"  {r['latency'] * 1000:8.1f} ms  {_describe(r)}")
+
+        by_function = defaultdict(lambda: [0, 0.0])
+        for r in round_trips:
+            for name in r.get("calls") or [_describe(r)]:
+                by_function[name][0] += 1
+                by_function[name][1] += r["latency"]
+        lines.append("Busiest calls (round-trips, time spent in them):")
+        busiest = sorted(by_function.items(), key=lambda x: x[1][1], reverse=True)
+        for name, (count, latency) in busiest[:top]:
+            lines.append(f"  {count:6d} {latency:8.3f}s  {name}")
+        return lines
+
+    def chrome_trace(self):
+        # Trace Event Format, one complete ("X") event per round-trip and
+        # per contract call
+        pid = os.getpid()
+        with self._lock:
+            events = [_event(_describe(r), "rpc", r, pid) for r in self.round_trips] + [
+                _event(f"{c['target']}.{c['function']}", c["cache"], c, pid)
+                for c in self.calls
+            ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+
+def _size(value):
+    return len(json.dumps(value, default=str))
+
+
+def _describe(record):
+    description = record["method"]
+    if record.get("target"):
+        description += f" {record['target']}.{record['function']}"
+    if record.get("block") is not None:
+        description += f" @{record['block']}"
+    return description
+
+
+def _event(name, category, record, pid):
+    args = {
+        key: value
+        for key, value in record.items()
+        if key not in ("start", "latency", "thread")
+    }
+    return dict(
+        name=name,
+        cat=category,
+        ph="X",
+        ts=record["start"] * 1e6,
+        dur=record["latency"] * 1e6,
+        pid=pid,
+        tid=record["thread"],
+        args=args,
+    )
+
+
+def _traced(make_request):
+    @wraps(make_request)
+    def make_request_traced(method, params):
+        tracer = _tracer
+        if tracer is None:
+            return make_request(method, params)
+        start = tracer.clock()
+        response = make_request(method, params)
+        tracer.record_round_trip(method, params, response, start, tracer.clock())
+        return response
+
+    make_request_traced.rpc_traced = True
+    return make_request_traced
+
+
+def active_tracer():
+    return _tracer
+
+
+def install_tracer(tracer):
+    # Trace the round-trips of the connected provider with `tracer` (None to
+    # stop), returns the previously installed one
+    global _tracer
+    provider = web3.provider
+    if tracer is not None and provider is not None:
+        if not getattr(provider.make_request, "rpc_traced", False):
+            provider.make_request = _traced(provider.make_request)
+            # web3 keeps the middleware chain built around the old make_request
+            if hasattr(provider, "_request_func_cache"):
+                provider._request_func_cache = (None, None)
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+@contextmanager
+def tracing(path=None, top=10):
+    tracer = RpcTracer()
+    previous = install_tracer(tracer)
+    try:
+        yield tracer
+    finally:
+        install_tracer(previous)
+        # stderr, so traced output (e.g. NDJSON) stays parseable
+        print("\n".join(tracer.summary(top)), file=sys.stderr)
+        if path:
+            tracer.write_chrome_trace(path)
+            print(f"Chrome trace written to {path}", file=sys.stderr)
+
+
+def traced(func):
+    # Opt-in tracing of a script entry point, see TRACE_ENV
+    @wraps(func)
+    def run(*args, **kwargs):
+        path = os.getenv(TRACE_ENV)
+        with tracing(path) if path else nullcontext():
+            return func(*args, **kwargs)
+
+    return run
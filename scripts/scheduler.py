@@ -0,0 +1,178 @@
+from collections import defaultdict
+
+from scripts.metadata_cache import MetadataCache
+from scripts.monitor import close_notifier, format_snapshot, send_msg
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+from scripts.registry import DEFAULT_REGISTRY, load_strategies
+from scripts.snapshot import RAY
+from scripts.triggers import Revert, read_trigger_state, tend_trigger
+
+import heapq
+import time
+
+PRE_HOP = "pre-hop"
+POST_HOP = "post-hop"
+
+
+def next_price_state(state):
+    # The trigger state once the OSM hops: foresight() becomes read() and,
+    # after the Spotter is poked, the Vat spot. The following future price is
+    # not known yet, the current one is kept as the best guess.
+    future = state.get("osm_future")
+    if future is None or not future[1] or future[0] == 0:
+        return None
+    price = future[0]
+    # Spotter.poke: spot = rdiv(rdiv(val * 10 ** 9, par), mat)
+    spot = price * 10 ** 9 * RAY // state["par"] * RAY // state["mat"]
+    return dict(state, osm_current=future, spot=spot)
+
+
+def forecast_tend(state):
+    # Whether tendTrigger fires once the next OSM price takes effect, None
+    # when the future price is unknown or the trigger would revert
+    next_state = next_price_state(state)
+    if next_state is None:
+        return None
+    try:
+        return bool(tend_trigger(next_state))
+    except Revert:
+        return None
+
+
+class HopScheduler:
+    # Wakes up around OSM hops instead of polling every block. Every OSM
+    # (the `pip` of an ilk) publishes its next price `hop` seconds after its
+    # last poke (`zzz`), and foresight() already tells what that price will
+    # be. For every pip two re-evaluations are queued for the strategies on
+    # it:
+    #  - `lead` seconds before the hop, with the forecast of tendTrigger
+    #    computed from the future price, so keepers are ready
+    #  - `lag` seconds after the hop, once the new price is live
+    # `on_evaluate(state, reason, forecast)` receives the fresh trigger state.
+    def __init__(
+        self,
+        strategies,
+        on_evaluate,
+        reader=read_trigger_state,
+        multicall_address=MULTICALL2_ADDRESS,
+        cache=None,
+        lead=30,
+        lag=15,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        self.strategies = list(strategies)
+        self.on_evaluate = on_evaluate
+        self.reader = reader
+        self.multicall_address = multicall_address
+        self.cache = cache
+        self.lead = lead
+        self.lag = lag
+        self.clock = clock
+        self.sleep = sleep
+
+        self.hops = {}
+        self.pips = defaultdict(list)
+        self._queue = []
+
+    def run(self):
+        self.refresh()
+        while True:
+            if not self._queue:
+                # No OSM to follow (e.g. every read failed), try again later
+                self.sleep(self.lead)
+                self.refresh()
+                continue
+            self.sleep(max(0, self._queue[0][0] - self.clock()))
+            self.run_pending()
+
+    def refresh(self, block_identifier="latest"):
+        # Read every strategy and the hop schedule of every pip they use
+        states = self._read(self.strategies, block_identifier)
+        self.pips.clear()
+        for state in states:
+            self.pips[state["pip"]].append(state["strategy"])
+
+        pips = sorted(self.pips)
+        _, values = aggregate(
+            [
+                call
+                for pip in pips
+                for call in (Call(pip, "zzz()(uint64)"), Call(pip, "hop()(uint16)"))
+            ],
+            block_identifier,
+            self.multicall_address,
+        )
+        self._queue = []
+        for i, pip in enumerate(pips):
+            zzz, hop = values[2 * i], values[2 * i + 1]
+            if zzz is None or hop is None:
+                continue
+            self.schedule(pip, zzz + hop)
+        return states
+
+    def schedule(self, pip, next_hop):
+        self.hops[pip] = next_hop
+        heapq.heappush(self._queue, (next_hop - self.lead, PRE_HOP, pip))
+        heapq.heappush(self._queue, (next_hop + self.lag, POST_HOP, pip))
+
+    def run_pending(self, now=None):
+        # Evaluate the strategies of every pip whose event is due. Returns
+        # the (state, reason, forecast) that were handed to on_evaluate.
+        now = self.clock() if now is None else now
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            _, reason, pip = heapq.heappop(self._queue)
+            due.append((reason, pip))
+
+        evaluated = []
+        for reason, pip in due:
+            if reason == POST_HOP:
+                next_hop = self._next_hop(pip)
+                if next_hop is not None and next_hop <= self.hops[pip]:
+                    # The OSM has not been poked yet, the new price is not live
+                    heapq.heappush(self._queue, (now + self.lag, POST_HOP, pip))
+                    continue
+            for state in self._read(self.pips[pip], "latest"):
+                forecast = forecast_tend(state)
+                self.on_evaluate(state, reason, forecast)
+                evaluated.append((state, reason, forecast))
+            if reason == POST_HOP and next_hop is not None:
+                self.schedule(pip, next_hop)
+        return evaluated
+
+    def _next_hop(self, pip):
+        _, (zzz, hop) = aggregate(
+            [Call(pip, "zzz()(uint64)"), Call(pip, "hop()(uint16)")],
+            "latest",
+            self.multicall_address,
+        )
+        if zzz is None or hop is None:
+            return None
+        return zzz + hop
+
+    def _read(self, strategies, block_identifier):
+        states = []
+        for s in strategies:
+            try:
+                states.append(
+                    self.reader(s, block_identifier, self.multicall_address, self.cache)
+                )
+            except Exception as e:
+                print(f"Failed to read strategy {s}: {e!r}")
+        return states
+
+
+def main(registry=DEFAULT_REGISTRY):
+    def on_evaluate(state, reason, forecast):
+        if state["tend_trigger"] or forecast:
+            lines = format_snapshot(state)
+            lines.insert(-1, f"OSM {reason}, tendTrigger after the hop: {forecast}")
+            send_msg("\n".join(lines))
+
+    try:
+        HopScheduler(
+            load_strategies(registry), on_evaluate, cache=MetadataCache()
+        ).run()
+    finally:
+        close_notifier()
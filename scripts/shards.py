@@ -0,0 +1,172 @@
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from eth_utils import to_checksum_address
+from scripts.client import connect, endpoint_uri, web3
+from scripts.exporter import main as exporter_main
+from scripts.metadata_cache import DEFAULT_CACHE_PATH, MetadataCache
+from scripts.monitor import main as monitor_main
+from scripts.multicall import MULTICALL2_ADDRESS, install_read_cache
+from scripts.read_cache import ReadCache
+from scripts.registry import DEFAULT_REGISTRY, load_registry
+from scripts.snapshot import take_snapshot
+from scripts.triggers import read_trigger_state
+
+import hashlib
+import os
+
+# Metadata cache of the shard a worker process is pinned to
+_cache = None
+
+
+def _hash(value):
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HashRing:
+    # Consistent hashing of strategies onto shards: changing the number of
+    # shards only moves about 1/n of the strategies, the others stay on the
+    # shard whose caches already hold them
+    def __init__(self, shards, replicas=128):
+        self.shards = shards
+        ring = sorted(
+            (_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shards)
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in ring]
+        self._shards = [shard for _, shard in ring]
+
+    def shard(self, strategy):
+        point = _hash(to_checksum_address(str(strategy)))
+        return self._shards[bisect(self._points, point) % len(self._points)]
+
+    def assign(self, strategies):
+        assignment = {}
+        for s in strategies:
+            assignment.setdefault(self.shard(s), []).append(s)
+        return assignment
+
+
+def shard_cache_path(shard):
+    return DEFAULT_CACHE_PATH.with_name(f"metadata-shard-{shard}.json")
+
+
+def _init_worker(uri, shard):
+    # Every worker serves a single shard, with its own connection, read cache
+    # and metadata cache file. No other process writes to that file.
+    global _cache
+    connect(uri)
+    install_read_cache(ReadCache())
+    _cache = MetadataCache(shard_cache_path(shard))
+
+
+def read_shard(strategies, block, reader, multicall_address, max_workers):
+    # [(strategy, snapshot, error)] of the worker's shard, read with threads
+    def read(s):
+        try:
+            return s, reader(s, block, multicall_address, _cache), None
+        except Exception as e:
+            return s, None, repr(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(read, strategies))
+
+
+class ShardedMonitor:
+    # Reads a fleet on `shards` worker processes (one per core by default).
+    # Strategies are spread by consistent hashing and every shard is pinned
+    # to its own single worker executor, so a worker keeps the RPC
+    # connection, read cache and metadata cache of its shard between reads,
+    # and decodes the responses of that shard only. `read` merges the shards
+    # back into one list of snapshots, all read at the same block.
+    # `reader(strategy, block, multicall_address, cache)` has to be a module
+    # level function so it can be sent to the workers.
+    def __init__(
+        self,
+        strategies=(),
+        shards=None,
+        reader=take_snapshot,
+        multicall_address=MULTICALL2_ADDRESS,
+        max_workers=16,
+        uri=None,
+    ):
+        self.strategies = [to_checksum_address(str(s)) for s in strategies]
+        self.ring = HashRing(shards or os.cpu_count() or 1)
+        self.assignment = self.ring.assign(self.strategies)
+        self.reader = reader
+        self.multicall_address = multicall_address
+        self.max_workers = max_workers
+        self.uri = uri or endpoint_uri()
+        self._executors = {}
+        for shard in sorted(self.assignment):
+            self._executor(shard)
+
+    def _executor(self, shard):
+        if shard not in self._executors:
+            self._executors[shard] = ProcessPoolExecutor(
+                max_workers=1, initializer=_init_worker, initargs=(self.uri, shard)
+            )
+        return self._executors[shard]
+
+    def read(self, block_identifier=None):
+        # (snapshots in fleet order, {strategy: error})
+        return self.read_many(self.strategies, block_identifier)
+
+    def read_many(self, strategies, block_identifier=None):
+        # Same as read for any `strategies`, e.g. the ones a MonitorDaemon
+        # refreshes. A strategy outside the fleet starts its shard's worker.
+        strategies = [to_checksum_address(str(s)) for s in strategies]
+        if not isinstance(block_identifier, int):
+            block = web3.eth.get_block(block_identifier or "latest")
+            block_identifier = block["number"]
+        futures = [
+            self._executor(shard).submit(
+                read_shard,
+                assigned,
+                block_identifier,
+                self.reader,
+                self.multicall_address,
+                self.max_workers,
+            )
+            for shard, assigned in sorted(self.ring.assign(strategies).items())
+        ]
+        snapshots, errors = {}, {}
+        for future in futures:
+            for s, snapshot, error in future.result():
+                if snapshot is None:
+                    errors[s] = error
+                else:
+                    snapshots[s] = snapshot
+        return [snapshots[s] for s in strategies if s in snapshots], errors
+
+    def close(self):
+        for executor in self._executors.values():
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(registry=DEFAULT_REGISTRY, shards=None):
+    # scripts.monitor.main over a sharded fleet
+    with ShardedMonitor(
+        shards=shards and int(shards),
+        reader=read_trigger_state,
+        max_workers=load_registry(registry).get("max_workers", 16),
+    ) as monitor:
+        monitor_main(registry, read_many=monitor.read_many)
+
+
+def metrics(registry=DEFAULT_REGISTRY, port=9101, shards=None, poll_interval=1):
+    # scripts.exporter over a sharded fleet
+    with ShardedMonitor(
+        shards=shards and int(shards),
+        reader=read_trigger_state,
+        max_workers=load_registry(registry).get("max_workers", 16),
+    ) as monitor:
+        exporter_main(registry, port, poll_interval, read_many=monitor.read_many)
@@ -0,0 +1,164 @@
+from eth_utils import to_checksum_address
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+
+# Maker core contracts
+VAT = "0x35D1b3F3D7966A1DFe207aa4514C12a259A0492B"
+CDP_MANAGER = "0x5ef30b9986345249bc32d8928B7ee64DE9435E39"
+SPOTTER = "0x65C79fcB50Ca1594B025960e539eD7A9a6D434A3"
+ILK_REGISTRY = "0x5a464C28D19848f44199D003BeF5ecc87d090F87"
+
+DAI = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+
+# BaseFee oracle used by Strategy.isBaseFeeAcceptable
+BASE_FEE_ORACLE = "0xb5e1CAcB567d98faaDB60a1fD4820720141f064F"
+
+# Units used in Maker contracts
+WAD = 10 ** 18
+RAY = 10 ** 27
+
+
+def _read(calls, block_identifier, multicall_address):
+    keys = list(calls)
+    block_number, values = aggregate(
+        [calls[key] for key in keys], block_identifier, multicall_address
+    )
+    return block_number, dict(zip(keys, values))
+
+
+def resolve_strategy(
+    strategy,
+    block_identifier="latest",
+    multicall_address=MULTICALL2_ADDRESS,
+    cache=None,
+):
+    # Addresses and identifiers that do not change between blocks. yVault and
+    # cdpId can be moved by governance, take_snapshot re-checks them on every
+    # read and drops the cached entry when they change.
+    strategy = to_checksum_address(str(strategy))
+    if cache is not None:
+        info = cache.get(strategy)
+        if info is not None:
+            info["ilk"] = bytes.fromhex(info["ilk"])
+            return info
+
+    _, wiring = _read(
+        {
+            "name": Call(strategy, "name()(string)"),
+            "want": Call(strategy, "want()(address)"),
+            "vault": Call(strategy, "vault()(address)"),
+            "yvault": Call(strategy, "yVault()(address)"),
+            "cdp_id": Call(strategy, "cdpId()(uint256)"),
+        },
+        block_identifier,
+        multicall_address,
+    )
+    _, maker = _read(
+        {
+            "ilk": Call(CDP_MANAGER, "ilks(uint256)(bytes32)", [wiring["cdp_id"]]),
+            "urn": Call(CDP_MANAGER, "urns(uint256)(address)", [wiring["cdp_id"]]),
+            "want_symbol": Call(wiring["want"], "symbol()(string)"),
+            "want_decimals": Call(wiring["want"], "decimals()(uint8)"),
+            "yvault_decimals": Call(wiring["yvault"], "decimals()(uint256)"),
+        },
+        block_identifier,
+        multicall_address,
+    )
+    _, registry = _read(
+        {"gem_join": Call(ILK_REGISTRY, "join(bytes32)(address)", [maker["ilk"]])},
+        block_identifier,
+        multicall_address,
+    )
+    info = dict(strategy=strategy, **wiring, **maker, **registry)
+
+    if cache is not None:
+        cache.put(strategy, dict(info, ilk=info["ilk"].hex()))
+    return info
+
+
+def take_snapshot(
+    strategy,
+    block_identifier="latest",
+    multicall_address=MULTICALL2_ADDRESS,
+    cache=None,
+):
+    # Every value that changes with the chain is read through one aggregate
+    # eth_call so debt, collateral and prices always come from the same block
+    info = resolve_strategy(strategy, block_identifier, multicall_address, cache)
+    s = info["strategy"]
+    ilk = info["ilk"]
+
+    block_number, state = _read(
+        {
+            "timestamp": Call(multicall_address, "getCurrentBlockTimestamp()(uint256)"),
+            "current_yvault": Call(s, "yVault()(address)"),
+            "current_cdp_id": Call(s, "cdpId()(uint256)"),
+            "shares": Call(info["yvault"], "balanceOf(address)(uint256)", [s]),
+            "price_per_share": Call(info["yvault"], "pricePerShare()(uint256)"),
+            "collateral": Call(s, "balanceOfMakerVault()(uint256)"),
+            "debt": Call(s, "balanceOfDebt()(uint256)"),
+            "collateralization_ratio": Call(s, "collateralizationRatio()(uint256)"),
+            "rebalance_tolerance": Call(s, "rebalanceTolerance()(uint256)"),
+            "current_ratio": Call(s, "getCurrentMakerVaultRatio()(uint256)"),
+            "estimated_total_assets": Call(s, "estimatedTotalAssets()(uint256)"),
+            "tend_trigger": Call(s, "tendTrigger(uint256)(bool)", [1]),
+            "osm_proxy": Call(s, "wantToUSDOSMProxy()(address)"),
+            "want_balance": Call(info["want"], "balanceOf(address)(uint256)", [s]),
+            "dai_balance": Call(DAI, "balanceOf(address)(uint256)", [s]),
+            "credit_available": Call(
+                info["vault"], "creditAvailable(address)(uint256)", [s]
+            ),
+            "credit_threshold": Call(s, "creditThreshold()(uint256)"),
+            "min_report_delay": Call(s, "minReportDelay()(uint256)"),
+            "max_report_delay": Call(s, "maxReportDelay()(uint256)"),
+            "base_fee_acceptable": Call(
+                BASE_FEE_ORACLE, "isCurrentBaseFeeAcceptable()(bool)"
+            ),
+            "chainlink": Call(s, "chainlinkWantToUSDPriceFeed()(address)"),
+            "vault_params": Call(
+                info["vault"],
+                "strategies(address)(uint256,uint256,uint256,uint256,uint256,uint256,uint256,uint256,uint256)",
+                [s],
+            ),
+            "vat_ilk": Call(
+                VAT, "ilks(bytes32)(uint256,uint256,uint256,uint256,uint256)", [ilk]
+            ),
+            "vat_urn": Call(
+                VAT, "urns(bytes32,address)(uint256,uint256)", [ilk, info["urn"]]
+            ),
+            "spotter_ilk": Call(SPOTTER, "ilks(bytes32)(address,uint256)", [ilk]),
+            "par": Call(SPOTTER, "par()(uint256)"),
+        },
+        block_identifier,
+        multicall_address,
+    )
+
+    current = (state.pop("current_yvault"), state.pop("current_cdp_id"))
+    if cache is not None and current != (info["yvault"], info["cdp_id"]):
+        # Governance moved the yVault or the CDP since the wiring was cached
+        cache.invalidate(s)
+        return take_snapshot(s, block_identifier, multicall_address, cache)
+
+    art_total, rate, spot, line, dust = state.pop("vat_ilk")
+    ink, art = state.pop("vat_urn")
+    pip, mat = state.pop("spotter_ilk")
+    params = state.pop("vault_params")
+
+    snapshot = dict(info, block=block_number, **state)
+    snapshot.update(
+        Art=art_total,
+        rate=rate,
+        spot=spot,
+        line=line,
+        dust=dust,
+        ink=ink,
+        art=art,
+        pip=pip,
+        mat=mat,
+        # Same math as MakerDaiDelegateLib.getSpotPrice / getLiquidationRatio
+        spot_price=spot * mat // (RAY * 10 ** 9),
+        liquidation_ratio=mat,
+        debt_ratio=params[2],
+        last_report=params[5],
+        total_debt=params[6],
+    )
+    return snapshot
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from scripts.client import web3
+from scripts.metadata_cache import MetadataCache
+from scripts.multicall import MULTICALL2_ADDRESS, install_read_cache
+from scripts.read_cache import ReadCache
+from scripts.registry import DEFAULT_REGISTRY, load_registry, load_strategies
+from scripts.rpc_trace import traced
+from scripts.snapshot import take_snapshot
+
+import json
+import sys
+
+# Decimals of the raw integers of a snapshot, a string names another field
+# holding them. Values not listed are plain counts, flags or addresses.
+DECIMALS = {
+    "collateral": 18,
+    "debt": 18,
+    "shares": "yvault_decimals",
+    "price_per_share": "yvault_decimals",
+    "current_ratio": 18,
+    "collateralization_ratio": 18,
+    "rebalance_tolerance": 18,
+    "estimated_total_assets": "want_decimals",
+    "want_balance": "want_decimals",
+    "dai_balance": 18,
+    "credit_available": "want_decimals",
+    "credit_threshold": "want_decimals",
+    "total_debt": "want_decimals",
+    "debt_ratio": 4,
+    "spot_price": 18,
+    "liquidation_ratio": 27,
+    "Art": 18,
+    "rate": 27,
+    "spot": 27,
+    "line": 45,
+    "dust": 45,
+    "ink": 18,
+    "art": 18,
+    "mat": 27,
+    "par": 27,
+}
+
+
+def plain(value, amounts=()):
+    # JSON value of a read: bytes as hex, integers as numbers. The `amounts`
+    # keys of a dict are always decimal strings, like scripts.indexer writes
+    # integers: WAD, RAY and RAD amounts do not fit a double, and a field
+    # keeps the same JSON type whatever its value.
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, dict):
+        return {
+            key: str(v) if key in amounts and _is_int(v) else plain(v)
+            for key, v in value.items()
+        }
+    return value
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def to_record(snapshot):
+    # One NDJSON record: every value as read, with the decimals to scale them
+    # by. Every amount is a decimal string so no digit is lost.
+    data = plain(snapshot, DECIMALS)
+    decimals = {
+        key: data[scale] if isinstance(scale, str) else scale
+        for key, scale in DECIMALS.items()
+        if key in data
+    }
+    return {
+        "type": "snapshot",
+        "strategy": data["strategy"],
+        "block": data["block"],
+        "data": data,
+        "decimals": decimals,
+    }
+
+
+def stream_fleet(
+    strategies,
+    out=sys.stdout,
+    block_identifier=None,
+    multicall_address=MULTICALL2_ADDRESS,
+    max_workers=16,
+    cache=None,
+):
+    # Writes one line per strategy as soon as its snapshot is read, in
+    # completion order. Every strategy is read from the same block.
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(
+                take_snapshot, s, block_identifier, multicall_address, cache
+            ): s
+            for s in strategies
+        }
+        for future in as_completed(futures):
+            try:
+                record = to_record(future.result())
+            except Exception as e:
+                record = {
+                    "type": "error",
+                    "strategy": str(futures[future]),
+                    "block": block_identifier,
+                    "error": repr(e),
+                }
+            out.write(json.dumps(record, separators=(",", ":")) + "\n")
+            out.flush()
+
+
+@traced
+def main(registry=DEFAULT_REGISTRY):
+    # brownie run stream, or without brownie:
+    # WEB3_PROVIDER_URI=... python -m scripts.stream [registry] | jq
+    install_read_cache(ReadCache())
+    stream_fleet(
+        load_strategies(registry),
+        max_workers=load_registry(registry).get("max_workers", 16),
+        cache=MetadataCache(),
+    )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
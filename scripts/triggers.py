@@ -0,0 +1,369 @@
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+from scripts.client import web3
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate
+from scripts.snapshot import RAY, WAD, take_snapshot
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Constants from Strategy and MakerDaiDelegateLib
+MAX_BPS = WAD
+MIN_MINTABLE = 500000 * WAD
+
+UINT256_MAX = 2 ** 256 - 1
+
+# Storage slots scanned when looking for forceHarvestTriggerOnce
+MAX_STORAGE_SLOT = 64
+
+# Slot of forceHarvestTriggerOnce found for each strategy, None when not found
+_force_harvest_slots = {}
+
+
+class Revert(Exception):
+    # Raised where the on-chain view would revert
+    pass
+
+
+# ----------------- SAFEMATH -----------------
+
+
+def _add(a, b):
+    if a + b > UINT256_MAX:
+        raise Revert("SafeMath: addition overflow")
+    return a + b
+
+
+def _sub(a, b):
+    if b > a:
+        raise Revert("SafeMath: subtraction overflow")
+    return a - b
+
+
+def _mul(a, b):
+    if a * b > UINT256_MAX:
+        raise Revert("SafeMath: multiplication overflow")
+    return a * b
+
+
+def _div(a, b):
+    if b == 0:
+        raise Revert("SafeMath: division by zero")
+    return a // b
+
+
+def _required(state, key):
+    # Inputs that come from calls the Strategy does not wrap in try/catch
+    if state[key] is None:
+        raise Revert(f"{key} reverted")
+    return state[key]
+
+
+# ----------------- MakerDaiDelegateLib -----------------
+
+
+def spot_price(state):
+    # getSpotPrice: convert ray*ray to wad
+    return _div(_mul(state["spot"], state["mat"]), RAY * 10 ** 9)
+
+
+def debt_for_cdp(state):
+    return _div(_mul(state["art"], state["rate"]), RAY)
+
+
+def balance_of_dai_available_to_mint(state):
+    vat_debt = _mul(state["Art"], state["rate"])
+    if vat_debt >= state["line"]:
+        return 0
+    return _div(_sub(state["line"], vat_debt), RAY)
+
+
+def pessimistic_ratio(state, external_price):
+    # getPessimisticRatioOfCdpWithExternalPrice
+    price = min(spot_price(state), external_price)
+    if price == 0:
+        raise Revert("invalid price")
+
+    total_collateral_value = _div(_mul(state["ink"], price), WAD)
+    total_debt = debt_for_cdp(state) or 1
+    return _div(_mul(total_collateral_value, MAX_BPS), total_debt)
+
+
+# ----------------- Strategy -----------------
+
+
+def price_sources(state):
+    # (source, price) pairs _getCollateralPrice takes the minimum of, in the
+    # order the Strategy compares them
+    sources = [("spotter", spot_price(state))]
+
+    if state["osm_proxy"] != ZERO_ADDRESS:
+        # Both OSM reads are wrapped in try/catch: a revert is stored as None
+        for key in ("osm_current", "osm_future"):
+            if state[key] is not None:
+                price, is_valid = state[key]
+                if is_valid and price > 0:
+                    sources.append((key, price))
+
+    if state["chainlink"] != ZERO_ADDRESS:
+        # uint256(int256) cast: a negative answer wraps and overflows the mul
+        answer = _required(state, "chainlink_answer") % 2 ** 256
+        chainlink_price = _mul(answer, 10 ** 10)
+        if chainlink_price > 0:
+            sources.append(("chainlink", chainlink_price))
+
+    return sources
+
+
+def binding_source(state):
+    # Source of the price _getCollateralPrice ends up using. Math.min returns
+    # its second argument on ties, so a later source wins a tie.
+    binding, min_price = None, None
+    for source, price in price_sources(state):
+        if min_price is None or price <= min_price:
+            binding, min_price = source, price
+    return binding
+
+
+def collateral_price(state):
+    # _getCollateralPrice: minimum of spotter, OSM current/future and Chainlink
+    min_price = min(price for _, price in price_sources(state))
+    if min_price == 0:
+        raise Revert("invalid spot price")
+
+    return _div(_mul(min_price, RAY), state["par"])
+
+
+def current_maker_vault_ratio(state):
+    return pessimistic_ratio(state, collateral_price(state))
+
+
+def convert_want_to_18_decimals(state):
+    if state["want_decimals"] < 18:
+        return 10 ** 18 // 10 ** state["want_decimals"]
+    return 1
+
+
+def estimated_total_assets(state):
+    conversion = convert_want_to_18_decimals(state)
+
+    def to_want(amount):
+        return _div(_div(_mul(amount, WAD), collateral_price(state)), conversion)
+
+    value_of_investment = _div(
+        _mul(state["shares"], state["price_per_share"]), 10 ** state["yvault_decimals"]
+    )
+    total = _add(state["want_balance"], _div(state["ink"], conversion))
+    total = _add(total, to_want(state["dai_balance"]))
+    total = _add(total, to_want(value_of_investment))
+    return _sub(total, to_want(debt_for_cdp(state)))
+
+
+def is_active(state):
+    # BaseStrategy.isActive
+    return state["debt_ratio"] > 0 or estimated_total_assets(state) > 0
+
+
+def tend_trigger(state):
+    # Nothing to adjust if there is no collateral locked
+    if state["ink"] == 0:
+        return False
+
+    current_ratio = current_maker_vault_ratio(state)
+    target = state["collateralization_ratio"]
+    tolerance = state["rebalance_tolerance"]
+
+    # Debt has to be repaid regardless of the call cost
+    if current_ratio < _sub(target, tolerance):
+        return True
+
+    # Mint more DAI if possible
+    return (
+        current_ratio > _add(target, tolerance)
+        and debt_for_cdp(state) > 0
+        and _required(state, "base_fee_acceptable")
+        and balance_of_dai_available_to_mint(state) >= MIN_MINTABLE
+    )
+
+
+def harvest_trigger(state):
+    if not is_active(state):
+        return False
+
+    since_last_report = _sub(state["timestamp"], state["last_report"])
+    if since_last_report > state["max_report_delay"]:
+        return True
+
+    if not _required(state, "base_fee_acceptable"):
+        return False
+
+    if state["force_harvest_trigger_once"] is None:
+        # forceHarvestTriggerOnce could not be read
+        return _required(state, "harvest_trigger")
+
+    if state["force_harvest_trigger_once"]:
+        return True
+
+    if since_last_report > state["min_report_delay"]:
+        return True
+
+    return state["credit_available"] > state["credit_threshold"]
+
+
+def evaluate(state):
+    # (tend, harvest) as the keeper would see them, None where the view reverts
+    results = []
+    for trigger in (tend_trigger, harvest_trigger):
+        try:
+            results.append(bool(trigger(state)))
+        except Revert:
+            results.append(None)
+    return tuple(results)
+
+
+# ----------------- STATE -----------------
+
+
+def _storage_word(address, slot, block_identifier):
+    return bytes(HexBytes(web3.eth.get_storage_at(address, slot, block_identifier)))
+
+
+def _is_gem_join(word, state, block_identifier, multicall_address):
+    # forceHarvestTriggerOnce at offset 0 and a GemJoin of the strategy's ilk
+    # at offset 1. gemJoinAdapter is internal and IlkRegistry may list
+    # another adapter for the ilk, or none at all, so the packed address is
+    # asked for its ilk when it is not the registry's.
+    if any(word[:11]) or word[31] > 1 or not any(word[11:31]):
+        return False
+    gem_join = to_checksum_address(word[11:31])
+    if state.get("gem_join") is not None and gem_join == to_checksum_address(
+        state["gem_join"]
+    ):
+        return True
+    _, (ilk,) = aggregate(
+        [Call(gem_join, "ilk()(bytes32)")], block_identifier, multicall_address
+    )
+    return ilk is not None and bytes(ilk) == bytes(state["ilk"])
+
+
+def find_force_harvest_slot(
+    state, block_identifier="latest", multicall_address=MULTICALL2_ADDRESS
+):
+    # forceHarvestTriggerOnce is internal. It is stored right after
+    # creditThreshold and packed with gemJoinAdapter, which makes its slot
+    # easy to recognise without hardcoding BaseStrategy's layout.
+    if state["credit_threshold"] is None:
+        return None
+    previous = None
+    for slot in range(MAX_STORAGE_SLOT):
+        word = _storage_word(state["strategy"], slot, block_identifier)
+        if (
+            previous is not None
+            and int.from_bytes(previous, "big") == state["credit_threshold"]
+            and _is_gem_join(word, state, block_identifier, multicall_address)
+        ):
+            return slot
+        previous = word
+    return None
+
+
+def force_harvest_slot(
+    state, block_identifier="latest", multicall_address=MULTICALL2_ADDRESS, cache=None
+):
+    # find_force_harvest_slot, once per strategy and process. A miss is kept
+    # too, in memory and in the MetadataCache, so it is not scanned again.
+    strategy = state["strategy"]
+    if strategy in _force_harvest_slots:
+        return _force_harvest_slots[strategy]
+    if "force_harvest_slot" in state:
+        slot = state["force_harvest_slot"]
+    elif state["credit_threshold"] is None:
+        # Nothing to recognise the slot by at this block, look again later
+        return None
+    else:
+        slot = find_force_harvest_slot(state, block_identifier, multicall_address)
+        metadata = None if cache is None else cache.get(strategy)
+        if metadata is not None:
+            cache.put(strategy, dict(metadata, force_harvest_slot=slot))
+    _force_harvest_slots[strategy] = slot
+    return slot
+
+
+def read_osm(state, signature, block_identifier):
+    # The OSM proxies only answer to whitelisted strategies, so peek from the
+    # strategy's own address like the Strategy does
+    if state["osm_proxy"] in (None, ZERO_ADDRESS):
+        return None
+    call = Call(state["osm_proxy"], signature)
+    try:
+        data = web3.eth.call(
+            {
+                "from": state["strategy"],
+                "to": call.target,
+                "data": "0x" + call.calldata.hex(),
+            },
+            block_identifier,
+        )
+        return call.decode_output(data)
+    except Exception:
+        return None
+
+
+def read_trigger_inputs(
+    snapshot, multicall_address=MULTICALL2_ADDRESS, cache=None, prices=None
+):
+    # Adds the oracle and storage reads the triggers need on top of a snapshot,
+    # pinned to the snapshot's block. With a scripts.prices.PriceEngine the
+    # oracle reads are shared with every other user of the engine.
+    state = dict(snapshot)
+    block = state["block"]
+
+    state["osm_current"] = state["osm_future"] = state["chainlink_answer"] = None
+    if prices is not None:
+        state.update(prices.inputs(state["strategy"], block))
+    elif state["osm_proxy"] != ZERO_ADDRESS:
+        state["osm_current"] = read_osm(state, "read()(uint256,bool)", block)
+        state["osm_future"] = read_osm(state, "foresight()(uint256,bool)", block)
+    if prices is None and state["chainlink"] not in (None, ZERO_ADDRESS):
+        _, (state["chainlink_answer"],) = aggregate(
+            [Call(state["chainlink"], "latestAnswer()(int256)")],
+            block,
+            multicall_address,
+        )
+
+    slot = force_harvest_slot(state, block, multicall_address, cache)
+    state["force_harvest_slot"] = slot
+    if slot is not None:
+        word = _storage_word(state["strategy"], slot, block)
+        state["force_harvest_trigger_once"] = word[-1] != 0
+    else:
+        # Unknown storage layout, harvest_trigger takes the Strategy's answer
+        state["force_harvest_trigger_once"] = None
+        _, (state["harvest_trigger"],) = aggregate(
+            [Call(state["strategy"], "harvestTrigger(uint256)(bool)", [1])],
+            block,
+            multicall_address,
+        )
+    return state
+
+
+def read_trigger_state(
+    strategy,
+    block_identifier="latest",
+    multicall_address=MULTICALL2_ADDRESS,
+    cache=None,
+    prices=None,
+):
+    snapshot = take_snapshot(strategy, block_identifier, multicall_address, cache)
+    return read_trigger_inputs(snapshot, multicall_address, cache, prices)
+
+
+def screen(states):
+    # Strategies whose tend or harvest trigger fires, evaluated locally
+    tend, harvest = [], []
+    for state in states:
+        should_tend, should_harvest = evaluate(state)
+        if should_tend:
+            tend.append(state["strategy"])
+        if should_harvest:
+            harvest.append(state["strategy"])
+    return tend, harvest
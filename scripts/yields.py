@@ -0,0 +1,247 @@
+from collections import deque
+
+from scripts.client import web3
+from scripts.metadata_cache import MetadataCache
+from scripts.multicall import MULTICALL2_ADDRESS, Call, aggregate, install_read_cache
+from scripts.read_cache import ReadCache
+from scripts.registry import DEFAULT_REGISTRY, load_strategies
+from scripts.snapshot import RAY, VAT, resolve_strategy
+
+import sys
+import time
+
+JUG = "0x19c0976f590D67707E62397C87829d896Dc0f1F1"
+
+YEAR = 365 * 24 * 60 * 60
+DAY = 24 * 60 * 60
+
+# Rolling windows the yield, fee and spread are reported over
+WINDOWS = {"1d": DAY, "7d": 7 * DAY, "30d": 30 * DAY}
+
+
+class Window:
+    # Growth of an ever increasing index (pricePerShare, Vat rate) over about
+    # the last `seconds`. Samples are kept in a ring buffer of `capacity`
+    # slots at least seconds / capacity apart, so memory does not grow with
+    # the number of blocks seen. The latest sample is always kept aside.
+    def __init__(self, seconds, capacity=256):
+        self.seconds = seconds
+        self.step = seconds / capacity
+        # Up to capacity + 1 samples fit in the window, plus the one at or
+        # before its start that anchors the growth
+        self.samples = deque(maxlen=capacity + 2)
+        self.latest = None
+
+    def add(self, timestamp, value):
+        if self.latest is not None and timestamp <= self.latest[0]:
+            return
+        self.latest = (timestamp, value)
+        if not self.samples or timestamp - self.samples[-1][0] >= self.step:
+            self.samples.append((timestamp, value))
+        # Drop what fell out of the window, keeping one sample at or before
+        # its start
+        while len(self.samples) > 1 and timestamp - self.samples[1][0] >= self.seconds:
+            self.samples.popleft()
+
+    def growth(self):
+        # (seconds covered, latest / oldest), None before two samples
+        if self.latest is None or not self.samples:
+            return None
+        (start, first), (end, last) = self.samples[0], self.latest
+        if end <= start or first == 0:
+            return None
+        return end - start, last / first
+
+    def apr(self):
+        growth = self.growth()
+        if growth is None:
+            return None
+        elapsed, ratio = growth
+        return (ratio - 1) * YEAR / elapsed
+
+    def apy(self):
+        growth = self.growth()
+        if growth is None:
+            return None
+        elapsed, ratio = growth
+        return ratio ** (YEAR / elapsed) - 1
+
+    def full(self):
+        # Whether the samples already span the whole window
+        growth = self.growth()
+        return growth is not None and growth[0] >= self.seconds
+
+
+def accrued_rate(rate, duty, base, rho, timestamp):
+    # Vat rate after a jug.drip at `timestamp`. rate only moves when someone
+    # drips, projecting it keeps the fee windows smooth between drips.
+    return rate * ((base + duty) / RAY) ** max(0, timestamp - rho)
+
+
+class YieldTracker:
+    # Follows what each strategy earns and pays:
+    #  - yield: growth of the yvDAI pricePerShare its DAI is invested in
+    #  - fee: growth of the Vat rate of its ilk, the stability fee charged on
+    #    its debt (Jug duty + base, accrued up to the sampled block)
+    #  - spread: yield - fee. Debt and investment are about the same amount of
+    #    DAI, so a negative spread is a loss the next harvest will report.
+    # Each yVault and ilk is sampled once per update however many strategies
+    # share it, in a single multicall, and only on new blocks.
+    def __init__(
+        self,
+        strategies,
+        multicall_address=MULTICALL2_ADDRESS,
+        windows=WINDOWS,
+        capacity=256,
+        cache=None,
+    ):
+        self.multicall_address = multicall_address
+        self.windows = windows
+        self.capacity = capacity
+        self.strategies = {}
+        for s in strategies:
+            info = resolve_strategy(s, "latest", multicall_address, cache)
+            self.strategies[info["strategy"]] = (info["yvault"], info["ilk"])
+        self.yields = {}
+        self.fees = {}
+        self.duties = {}
+        self.block = None
+
+    def _windows(self):
+        return {
+            name: Window(seconds, self.capacity)
+            for name, seconds in self.windows.items()
+        }
+
+    def update(self, block_identifier=None):
+        # Samples every yVault and ilk at the block, once per block
+        if block_identifier is None:
+            block_identifier = web3.eth.block_number
+        if self.block is not None and block_identifier <= self.block:
+            return self.block
+
+        yvaults = sorted({yvault for yvault, _ in self.strategies.values()})
+        ilks = sorted({ilk for _, ilk in self.strategies.values()})
+        calls = [
+            Call(self.multicall_address, "getCurrentBlockTimestamp()(uint256)"),
+            Call(JUG, "base()(uint256)"),
+        ]
+        calls += [Call(yvault, "pricePerShare()(uint256)") for yvault in yvaults]
+        for ilk in ilks:
+            calls += [
+                Call(
+                    VAT, "ilks(bytes32)(uint256,uint256,uint256,uint256,uint256)", [ilk]
+                ),
+                Call(JUG, "ilks(bytes32)(uint256,uint256)", [ilk]),
+            ]
+        block, values = aggregate(calls, block_identifier, self.multicall_address)
+        timestamp, base = values[:2]
+        prices = values[2 : 2 + len(yvaults)]
+        ilk_values = values[2 + len(yvaults) :]
+
+        for yvault, price in zip(yvaults, prices):
+            if price is None:
+                continue
+            for window in self.yields.setdefault(yvault, self._windows()).values():
+                window.add(timestamp, price)
+        for i, ilk in enumerate(ilks):
+            vat_ilk, jug_ilk = ilk_values[2 * i : 2 * i + 2]
+            if vat_ilk is None:
+                continue
+            rate = vat_ilk[1]
+            if jug_ilk is not None and base is not None:
+                duty, rho = jug_ilk
+                self.duties[ilk] = base + duty
+                rate = accrued_rate(rate, duty, base, rho, timestamp)
+            for window in self.fees.setdefault(ilk, self._windows()).values():
+                window.add(timestamp, rate)
+
+        self.block = block
+        return block
+
+    def report(self, strategy):
+        yvault, ilk = self.strategies[strategy]
+        yields = self.yields.get(yvault, {})
+        fees = self.fees.get(ilk, {})
+        duty = self.duties.get(ilk)
+        report = {
+            "strategy": strategy,
+            "block": self.block,
+            # Stability fee charged right now, before any window fills
+            "fee_apy": None if duty is None else (duty / RAY) ** YEAR - 1,
+            "windows": {},
+        }
+        for name in self.windows:
+            yield_window, fee_window = yields.get(name), fees.get(name)
+            row = {
+                "yield_apr": yield_window and yield_window.apr(),
+                "yield_apy": yield_window and yield_window.apy(),
+                "fee_apr": fee_window and fee_window.apr(),
+                "fee_apy": fee_window and fee_window.apy(),
+                "full": bool(yield_window and yield_window.full()),
+            }
+            row["spread_apr"] = (
+                None
+                if row["yield_apr"] is None or row["fee_apr"] is None
+                else row["yield_apr"] - row["fee_apr"]
+            )
+            report["windows"][name] = row
+        return report
+
+    def reports(self):
+        return [self.report(s) for s in self.strategies]
+
+
+def negative_carry(report):
+    # Names of the windows whose spread is negative
+    return [
+        name
+        for name, row in report["windows"].items()
+        if row["spread_apr"] is not None and row["spread_apr"] < 0
+    ]
+
+
+def format_report(report):
+    def pct(value):
+        return "     -" if value is None else f"{value:>6.2%}"
+
+    parts = [report["strategy"]]
+    for name, row in report["windows"].items():
+        parts.append(
+            f"{name}: {pct(row['yield_apr'])} - {pct(row['fee_apr'])}"
+            f" = {pct(row['spread_apr'])}"
+        )
+    if negative_carry(report):
+        parts.append("NEGATIVE CARRY")
+    return "  ".join(parts)
+
+
+def main(registry=DEFAULT_REGISTRY, poll_interval=12):
+    # Yield, stability fee and spread of every strategy, printed on every
+    # new block. WEB3_PROVIDER_URI=... python -m scripts.yields [registry]
+    from scripts.monitor import close_notifier, send_msg
+
+    install_read_cache(ReadCache())
+    tracker = YieldTracker(load_strategies(registry), cache=MetadataCache())
+    negative = set()
+    try:
+        while True:
+            block = tracker.block
+            if tracker.update() != block:
+                for report in tracker.reports():
+                    print(format_report(report))
+                    # Only the first block with a negative spread is sent
+                    s = report["strategy"]
+                    if negative_carry(report):
+                        if s not in negative:
+                            negative.add(s)
+                            send_msg(f"Negative carry: {format_report(report)}")
+                    else:
+                        negative.discard(s)
+            time.sleep(float(poll_interval))
+    finally:
+        close_notifier()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,109 @@
+from brownie import chain, web3
+from scripts.keeper import GWEI, REPLACEMENT_BUMP, Keeper, Pending, onchain_screen
+
+
+def deploy_targets(TestKeeperStrategy, gov, count):
+    return [TestKeeperStrategy.deploy({"from": gov}) for _ in range(count)]
+
+
+def keeper_for(keeper, targets, multicall, **kwargs):
+    return Keeper(
+        keeper,
+        targets,
+        screener=onchain_screen,
+        multicall_address=multicall.address,
+        **kwargs,
+    )
+
+
+def test_submits_concurrently_with_consecutive_nonces(
+    keeper, gov, TestKeeperStrategy, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    first, second, third = deploy_targets(TestKeeperStrategy, gov, 3)
+    first.setTriggers(True, False, {"from": gov})
+    second.setTriggers(False, True, {"from": gov})
+    third.setTriggers(True, True, {"from": gov})
+
+    bot = keeper_for(keeper, [first, second, third], multicall)
+    nonce = keeper.nonce
+    submitted = bot.work(chain.height)
+    assert sorted(p.nonce for p in submitted) == [nonce, nonce + 1, nonce + 2]
+    assert {(p.strategy, p.method) for p in submitted} == {
+        (first.address, "tend"),
+        (second.address, "harvest"),
+        (third.address, "tend"),
+    }
+
+    bot.check_pending()
+    assert bot.pending == {}
+    assert all(receipt["status"] == 1 for _, receipt in bot.completed)
+    assert (first.tends(), second.harvests(), third.tends()) == (1, 1, 1)
+
+    # Third still wants a harvest, the others are done
+    (pending,) = bot.work(chain.height)
+    assert (pending.strategy, pending.method) == (third.address, "harvest")
+
+
+def test_reverting_calls_are_not_submitted(
+    keeper, gov, TestKeeperStrategy, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    (target,) = deploy_targets(TestKeeperStrategy, gov, 1)
+    target.setTriggers(True, True, {"from": gov})
+    target.setRevertCalls(True, {"from": gov})
+
+    bot = keeper_for(keeper, [target], multicall)
+    assert bot.work(chain.height) == []
+    assert bot.pending == {}
+
+
+def test_stuck_transaction_is_replaced(keeper, gov, TestKeeperStrategy, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    (target,) = deploy_targets(TestKeeperStrategy, gov, 1)
+    target.setTriggers(True, False, {"from": gov})
+
+    now = [0]
+    bot = keeper_for(
+        keeper, [target], multicall, replace_after=60, clock=lambda: now[0]
+    )
+    web3.provider.make_request("miner_stop", [])
+    try:
+        (pending,) = bot.work(chain.height)
+        now[0] = 59
+        bot.check_pending()
+        assert bot.pending[pending.nonce] is pending
+
+        now[0] = 60
+        bot.check_pending()
+        replacement = bot.pending[pending.nonce]
+        assert replacement.hashes[:-1] == pending.hashes
+        assert replacement.tx["maxPriorityFeePerGas"] >= (
+            pending.tx["maxPriorityFeePerGas"] * REPLACEMENT_BUMP
+        )
+    finally:
+        web3.provider.make_request("miner_start", [])
+    chain.mine()
+
+    bot.check_pending()
+    ((settled, receipt),) = bot.completed
+    assert settled is replacement
+    assert bytes(receipt["transactionHash"]) == replacement.hashes[-1]
+    assert target.tends() == 1
+
+
+def test_replacement_is_capped(keeper):
+    bot = Keeper(keeper, [], max_fee_cap=100 * GWEI)
+    bot._broadcast = lambda pending: True
+    tx = {"maxFeePerGas": 90 * GWEI, "maxPriorityFeePerGas": 2 * GWEI}
+    pending = Pending(0, keeper.address, "tend", tx, 0)
+
+    # The bump is clamped to the cap while the node still takes it
+    assert bot.replace(pending)
+    replacement = bot.pending[0]
+    assert replacement.tx["maxFeePerGas"] == 100 * GWEI
+    assert replacement.tx["maxPriorityFeePerGas"] == 9 * GWEI // 4
+
+    # At the cap there is no valid bump left
+    assert not bot.replace(replacement)
+    assert bot.pending[0] is replacement
@@ -0,0 +1,118 @@
+from scripts.alerts import Alert, AlertEngine
+from scripts.snapshot import RAY, WAD
+
+STRATEGY = "0xd33535e9F2E09485aC9cE8b27F865251161065E0"
+
+
+def snapshot(**overrides):
+    state = dict(
+        strategy=STRATEGY,
+        debt=1_000 * WAD,
+        shares=1_100 * WAD,
+        price_per_share=WAD,
+        yvault_decimals=18,
+        current_ratio=225 * WAD // 100,
+        collateralization_ratio=225 * WAD // 100,
+        rebalance_tolerance=15 * WAD // 100,
+        Art=0,
+        rate=RAY,
+        line=10_000_000 * WAD * RAY,
+    )
+    state.update(overrides)
+    return state
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_only_changes_are_reported(tmp_path):
+    path = tmp_path / "alerts.json"
+    clock = Clock()
+    engine = AlertEngine(path, quiet_period=0, clock=clock)
+
+    # Nothing wrong the first time a strategy is seen
+    assert engine.evaluate(snapshot()) == []
+    assert engine.evaluate(snapshot()) == []
+
+    below = snapshot(current_ratio=200 * WAD // 100)
+    assert engine.evaluate(below) == [Alert(STRATEGY, "band", "inside", "below")]
+    assert engine.evaluate(below) == []
+
+    # Hysteresis: back above the lower bound, but not by 10% of the tolerance
+    assert engine.evaluate(snapshot(current_ratio=2_110 * WAD // 1_000)) == []
+    assert engine.evaluate(snapshot(current_ratio=2_120 * WAD // 1_000)) == [
+        Alert(STRATEGY, "band", "below", "inside")
+    ]
+
+    assert engine.evaluate(snapshot(shares=999 * WAD)) == [
+        Alert(STRATEGY, "pnl", "profit", "loss")
+    ]
+    assert engine.evaluate(snapshot(Art=9_600_000 * WAD)) == [
+        Alert(STRATEGY, "pnl", "loss", "profit"),
+        Alert(STRATEGY, "mintable", "ok", "low"),
+    ]
+
+    # State survives a restart, a failing read is reported once
+    engine = AlertEngine(path, quiet_period=0, clock=clock)
+    assert engine.observe(STRATEGY, {"read": "failed"}) == [
+        Alert(STRATEGY, "read", "ok", "failed")
+    ]
+    assert engine.observe(STRATEGY, {"read": "failed"}) == []
+    assert engine.evaluate(snapshot()) == [
+        Alert(STRATEGY, "read", "failed", "ok"),
+        Alert(STRATEGY, "mintable", "low", "ok"),
+    ]
+
+
+def test_problems_are_reported_when_first_seen():
+    engine = AlertEngine(path=None)
+    assert engine.evaluate(snapshot(current_ratio=3 * WAD, shares=0)) == [
+        Alert(STRATEGY, "band", None, "above"),
+        Alert(STRATEGY, "pnl", None, "loss"),
+    ]
+
+
+def test_quiet_period():
+    clock = Clock()
+    engine = AlertEngine(path=None, quiet_period=600, clock=clock)
+    engine.evaluate(snapshot())
+
+    below = snapshot(current_ratio=2 * WAD)
+    assert engine.evaluate(below) == [Alert(STRATEGY, "band", "inside", "below")]
+
+    # Flapping inside the quiet period is not reported at all
+    clock.now = 300
+    assert engine.evaluate(snapshot()) == []
+    assert engine.evaluate(below) == []
+    clock.now = 900
+    assert engine.evaluate(below) == []
+
+    # A change that lasts is reported once the quiet period is over
+    clock.now = 1_000
+    assert engine.evaluate(snapshot()) == [Alert(STRATEGY, "band", "below", "inside")]
+
+
+def test_unreadable_fields_keep_the_last_level():
+    engine = AlertEngine(None, quiet_period=0, clock=Clock())
+    engine.evaluate(snapshot(current_ratio=WAD))
+
+    state = snapshot(current_ratio=None, price_per_share=None, rate=None)
+    assert engine.levels(state) == {
+        "read": "ok",
+        "band": None,
+        "pnl": None,
+        "mintable": None,
+    }
+    assert engine.evaluate(state) == []
+    # Back to a readable state inside the band, the change is reported
+    (alert,) = engine.evaluate(snapshot())
+    assert (alert.condition, alert.previous, alert.current) == (
+        "band",
+        "below",
+        "inside",
+    )
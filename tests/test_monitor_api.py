@@ -0,0 +1,81 @@
+from brownie import chain
+from scripts.api import ApiCache, serve
+from scripts.history import SnapshotStore
+from scripts.ilks import AMOUNTS, scan
+from scripts.snapshot import take_snapshot
+
+import gzip
+import json
+import urllib.error
+import urllib.request
+
+
+def get(url, **headers):
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_serves_cached_state(
+    vault, strategy, token, amount, user, gov, ilk, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    snapshot = take_snapshot(strategy, chain.height, multicall.address)
+    history = SnapshotStore(":memory:")
+    history.append(snapshot)
+    cache = ApiCache(history)
+    cache.publish(chain.height, [snapshot], scan(chain.height, multicall.address))
+
+    server = serve(cache, host="127.0.0.1", port=0)
+    host, port = server.server_address
+    base = f"http://{host}:{port}"
+    try:
+        status, headers, body = get(f"{base}/strategies/{strategy.address}")
+        assert status == 200
+        record = json.loads(body)
+        assert record["data"]["debt"] == str(strategy.balanceOfDebt())
+        assert record["block"] == chain.height
+
+        # Same ETag on every request until the next block is published
+        etag = headers["ETag"]
+        status, _, body = get(
+            f"{base}/strategies/{strategy.address}", **{"If-None-Match": etag}
+        )
+        assert status == 304 and body == b""
+
+        status, headers, body = get(f"{base}/strategies", **{"Accept-Encoding": "gzip"})
+        assert headers["Content-Encoding"] == "gzip"
+        etag = headers["ETag"]
+        (listed,) = json.loads(gzip.decompress(body))["strategies"]
+        assert listed == record
+
+        status, _, body = get(f"{base}/ilks/{ilk}")
+        row = json.loads(body)
+        assert status == 200 and row["ilk"] == ilk.lower()
+        # Amounts are strings whatever their size
+        assert row["line"] == str(snapshot["line"])
+        assert all(isinstance(row[key], str) for key in AMOUNTS if row[key] is not None)
+
+        status, _, body = get(f"{base}/strategies/{strategy.address}/history")
+        (row,) = json.loads(body)["history"]
+        assert row["block"] == chain.height
+
+        assert get(f"{base}/strategies/{gov.address}")[0] == 404
+        assert get(f"{base}/strategies/{gov.address}/history")[0] == 404
+        assert get(f"{base}/strategies/nope/history")[0] == 404
+
+        chain.mine()
+        cache.publish(chain.height, [snapshot])
+        status, headers, _ = get(f"{base}/strategies", **{"If-None-Match": etag})
+        assert status == 200 and headers["ETag"] != etag
+    finally:
+        server.shutdown()
+        history.close()
@@ -0,0 +1,59 @@
+from brownie import chain
+from scripts.backfill import backfill, read_blocks
+from scripts.history import SnapshotStore
+
+
+def mine_history(vault, strategy, token, amount, user, gov):
+    token.approve(vault, amount, {"from": user})
+    start = chain.height
+    for _ in range(4):
+        vault.deposit(amount // 4, {"from": user})
+        chain.sleep(3600)
+        strategy.harvest({"from": gov})
+    return start, chain.height
+
+
+def test_read_blocks_matches_direct_reads(
+    vault, strategy, token, amount, user, gov, yvault, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    start, end = mine_history(vault, strategy, token, amount, user, gov)
+
+    blocks = list(range(start, end + 1))
+    records = read_blocks([strategy.address], blocks, multicall.address)
+    assert [record["block"] for record in records] == blocks
+    for record in records:
+        block = record["block"]
+        assert record["collateral"] == strategy.balanceOfMakerVault(
+            block_identifier=block
+        )
+        assert record["debt"] == strategy.balanceOfDebt(block_identifier=block)
+        assert record["shares"] == yvault.balanceOf(strategy, block_identifier=block)
+        assert record["price_per_share"] == yvault.pricePerShare(block_identifier=block)
+        assert record["estimated_total_assets"] == strategy.estimatedTotalAssets(
+            block_identifier=block
+        )
+        assert record["timestamp"] == chain[block].timestamp
+
+
+def test_backfill_resumes_from_checkpoint(
+    vault, strategy, token, amount, user, gov, TestMulticall2, tmp_path
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    start, end = mine_history(vault, strategy, token, amount, user, gov)
+
+    store = SnapshotStore(tmp_path / "history.sqlite")
+    checkpoint = tmp_path / "backfill.json"
+    args = ([strategy], start, end, 2, store, checkpoint)
+    kwargs = dict(processes=2, chunk_size=2, multicall_address=multicall.address)
+
+    assert backfill(*args, **kwargs) == len(range(start, end + 1, 2))
+    assert backfill(*args, **kwargs) == 0
+
+    rows = store.query(strategy)
+    assert [row["block"] for row in rows] == list(range(start, end + 1, 2))
+    assert (
+        rows[-1]["collateral"]
+        == strategy.balanceOfMakerVault(block_identifier=rows[-1]["block"]) / 1e18
+    )
+    store.close()
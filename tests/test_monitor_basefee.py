@@ -0,0 +1,112 @@
+from brownie import chain, web3
+from scripts.basefee import BaseFeeForecaster, next_base_fee
+from scripts.keeper import Keeper
+
+
+def test_next_base_fee_matches_chain(gov):
+    # A block that used some gas, then empty ones
+    gov.transfer(gov, 0)
+    chain.mine(3)
+    for number in range(chain.height - 3, chain.height):
+        block, following = web3.eth.get_block(number), web3.eth.get_block(number + 1)
+        assert following["baseFeePerGas"] == next_base_fee(
+            block["baseFeePerGas"], block["gasUsed"], block["gasLimit"]
+        )
+
+    assert next_base_fee(800, 15_000_000, 30_000_000) == 800
+    assert next_base_fee(800, 30_000_000, 30_000_000) == 900
+    assert next_base_fee(800, 0, 30_000_000) == 700
+
+
+def test_wake_block(gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    # Empty blocks, the base fee falls by 12.5% every block
+    chain.mine(40)
+
+    forecaster = BaseFeeForecaster(multicall_address=multicall.address, window=32)
+    latest = forecaster.update()
+    assert latest == chain.height
+    assert len(forecaster.headers) == 32
+    assert forecaster.threshold is not None
+
+    upcoming = forecaster.next_base_fee()
+    assert forecaster.wake_block(threshold=upcoming) == latest + 1
+    assert forecaster.probability_acceptable(1, upcoming) == 1.0
+
+    threshold = upcoming * 7 ** 5 // 8 ** 5
+    wake = forecaster.wake_block(threshold=threshold)
+    assert latest + 5 <= wake <= latest + 7
+    assert forecaster.wake_time(threshold=threshold) > forecaster.headers[-1][1]
+    # Never reached within the window
+    assert forecaster.wake_block(threshold=upcoming // 10 ** 6) is None
+
+    # Only the missing headers are fetched on the next update
+    chain.mine(2)
+    assert forecaster.update() == latest + 2
+    assert [h[0] for h in forecaster.headers][-3:] == [latest, latest + 1, latest + 2]
+
+
+class FixedForecaster:
+    def __init__(self, wake):
+        self.wake = wake
+
+    def update(self, block_identifier="latest"):
+        pass
+
+    def wake_block(self):
+        return self.wake
+
+
+def test_keeper_sleeps_until_base_fee_is_acceptable(keeper):
+    forecaster = FixedForecaster(None)
+    bot = Keeper(keeper, [], forecaster=forecaster, max_skip=10)
+
+    # Nothing known yet, the first block is always screened
+    assert bot.due(100)
+    bot.last_screened = 100
+    assert not bot.due(101)
+
+    forecaster.wake = 105
+    assert not bot.due(103)
+    assert bot.due(104)
+
+    # Screened anyway every max_skip blocks
+    forecaster.wake = None
+    assert bot.due(110)
+
+
+class BrokenForecaster(FixedForecaster):
+    def update(self, block_identifier="latest"):
+        raise ValueError("header not found")
+
+
+def test_keeper_screens_urgent_work_every_block(keeper):
+    screened = []
+
+    def urgent(strategies, block, *args):
+        screened.append(block)
+        return [], []
+
+    bot = Keeper(keeper, [], forecaster=FixedForecaster(None), urgent_screener=urgent)
+    bot.work(chain.height)
+    assert bot.last_screened == chain.height and screened == []
+
+    chain.mine()
+    assert not bot.due(chain.height)
+    assert bot.work(chain.height, bot.urgent_screener) == []
+    assert screened == [chain.height]
+    # The full screen is still due on its own schedule
+    assert bot.last_screened == chain.height - 1
+
+    # Without a forecast every block is due
+    bot.forecaster = BrokenForecaster(None)
+    assert bot.due(chain.height)
+
+
+def test_unreadable_oracle_wakes_at_once(gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    chain.mine(4)
+    forecaster = BaseFeeForecaster(multicall_address=multicall.address, window=4)
+    latest = forecaster.update()
+    forecaster.threshold = forecaster.provider = None
+    assert forecaster.wake_block() == latest + 1
@@ -0,0 +1,98 @@
+from brownie import chain
+from scripts.daemon import MonitorDaemon
+from scripts.snapshot import take_snapshot
+
+
+def test_daemon_only_refreshes_touched_strategies(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount // 2, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    refreshed = []
+    daemon = MonitorDaemon(
+        [strategy], refreshed.append, multicall_address=multicall.address
+    )
+    daemon.poll()
+    assert [s["strategy"] for s in refreshed] == [strategy.address]
+    assert daemon.block == chain.height
+
+    # Unrelated activity does not touch the urn
+    token.transfer(gov, 1, {"from": user})
+    assert daemon.strategies_touched_by_logs(daemon.block + 1, chain.height) == set()
+
+    # Locking more collateral frobs the urn
+    before = chain.height
+    vault.deposit(amount // 2, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    assert daemon.strategies_touched_by_logs(before + 1, chain.height) == {
+        strategy.address
+    }
+
+    daemon.poll()
+    assert refreshed[-1]["block"] == chain.height
+    assert refreshed[-1]["collateral"] == strategy.balanceOfMakerVault()
+
+
+def test_daemon_full_refresh(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    refreshed = []
+    daemon = MonitorDaemon(
+        [strategy],
+        refreshed.append,
+        multicall_address=multicall.address,
+        full_refresh_blocks=2,
+    )
+    daemon.poll()
+    chain.mine(2)
+    daemon.poll()
+
+    assert len(refreshed) == 2
+    assert daemon.last_full_refresh == chain.height
+
+
+def test_daemon_survives_unreadable_fields(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+
+    def reader(*args):
+        # Reads that reverted in tryAggregate come back as None
+        snapshot = take_snapshot(*args)
+        return dict(snapshot, chainlink=None, pip=None, price_per_share=None)
+
+    def on_snapshot(snapshot):
+        raise TypeError("unsupported operand type(s) for /: 'NoneType' and 'float'")
+
+    daemon = MonitorDaemon(
+        [strategy], on_snapshot, reader=reader, multicall_address=multicall.address
+    )
+    daemon.poll()
+    assert daemon.block == chain.height
+    assert None not in daemon._watched_addresses()
+
+    chain.mine()
+    daemon.poll()
+    assert daemon.snapshots[strategy.address]["block"] == chain.height
+
+
+def test_daemon_reads_through_read_many(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    batches = []
+
+    def read_many(strategies, block):
+        batches.append(list(strategies))
+        return [take_snapshot(s, block, multicall.address) for s in strategies], {}
+
+    refreshed = []
+    daemon = MonitorDaemon(
+        [strategy],
+        refreshed.append,
+        multicall_address=multicall.address,
+        read_many=read_many,
+    )
+    daemon.poll()
+    assert batches == [[strategy.address]]
+    assert [s["strategy"] for s in refreshed] == [strategy.address]
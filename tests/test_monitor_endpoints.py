@@ -0,0 +1,114 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from brownie import chain, web3
+from hexbytes import HexBytes
+from scripts.endpoints import HedgedProvider
+from scripts.multicall import Call
+from web3 import Web3
+
+import json
+import requests
+import threading
+import time
+
+
+class StandIn:
+    # JSON-RPC node in front of the dev chain, with an optional delay or
+    # failing every request. Ganache does not take EIP-1898 block hashes,
+    # they are turned back into numbers on the way.
+    def __init__(self, delay=0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.requests = []
+        upstream = web3.provider.endpoint_uri
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stand_in.requests.append(json.loads(body))
+                request = json.loads(body)
+                if stand_in.fail:
+                    self.send_error(500)
+                    return
+                time.sleep(stand_in.delay)
+                for i, param in enumerate(request.get("params", [])):
+                    if isinstance(param, dict) and "blockHash" in param:
+                        block = web3.eth.get_block(param["blockHash"])
+                        request["params"][i] = hex(block["number"])
+                body = requests.post(upstream, json=request).content
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.uri = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def methods(self):
+        return [request["method"] for request in self.requests]
+
+
+def test_routes_to_the_fastest_endpoint():
+    slow, fast = StandIn(delay=0.2), StandIn()
+    provider = HedgedProvider([slow.uri, fast.uri], hedge_after=10)
+    for _ in range(5):
+        assert int(provider.make_request("eth_blockNumber", [])["result"], 16) == (
+            chain.height
+        )
+    assert provider.ranked()[0].uri == fast.uri
+    assert provider.stats()[slow.uri]["p50"] > provider.stats()[fast.uri]["p50"]
+    assert len(fast.requests) >= 4
+
+
+def test_hedges_slow_reads():
+    slow, fast = StandIn(delay=2), StandIn()
+    provider = HedgedProvider([slow.uri, fast.uri], hedge_after=0.1)
+
+    start = time.perf_counter()
+    response = provider.make_request("eth_chainId", [])
+    assert time.perf_counter() - start < 1.5
+    assert int(response["result"], 16) == chain.id
+    assert provider.hedges == 1
+    assert slow.methods() == fast.methods() == ["eth_chainId"]
+
+
+def test_fails_over_unhealthy_endpoints():
+    broken, healthy = StandIn(fail=True), StandIn()
+    provider = HedgedProvider([broken.uri, healthy.uri], hedge_after=10)
+    assert Web3(provider).eth.block_number == chain.height
+    assert provider.stats()[broken.uri]["error_rate"] == 1.0
+    assert provider.ranked()[-1].uri == broken.uri
+
+
+def test_reads_are_pinned_to_a_block_hash(strategy):
+    first, second = StandIn(), StandIn()
+    client = Web3(HedgedProvider([first.uri, second.uri], hedge_after=10))
+    chain.mine()
+    block = chain.height - 1
+
+    call = Call(strategy, "want()(address)")
+    data = "0x" + call.calldata.hex()
+    raw = client.eth.call({"to": call.target, "data": data}, block)
+    assert call.decode_output(raw) == strategy.want()
+
+    (request,) = [
+        r for r in first.requests + second.requests if r["method"] == "eth_call"
+    ]
+    pinned = request["params"][1]["blockHash"]
+    assert HexBytes(pinned) == web3.eth.get_block(block)["hash"]
+
+
+def test_connection_check():
+    broken, healthy = StandIn(fail=True), StandIn()
+    client = Web3(HedgedProvider([broken.uri, healthy.uri]))
+    # isConnected under web3 v5 (brownie < 2), is_connected from v6 on
+    is_connected = getattr(client, "isConnected", None) or client.is_connected
+    assert is_connected()
+    assert client.provider.isConnected() and client.provider.is_connected()
+    assert not HedgedProvider([broken.uri]).isConnected()
@@ -0,0 +1,64 @@
+import urllib.request
+
+from brownie import chain
+from scripts.exporter import CONTENT_TYPE, MetricsStore, format_metrics, serve
+from scripts.triggers import read_trigger_state
+
+
+def test_metrics_from_snapshot(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    state = read_trigger_state(strategy, chain.height, multicall.address)
+    text = format_metrics([state])
+
+    series = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            series[key] = float(value)
+
+    labels = f'strategy="{strategy.address}",name="{strategy.name()}"'
+    assert "# TYPE maker_v3_debt_dai gauge" in text
+    debt = next(v for k, v in series.items() if k.startswith("maker_v3_debt_dai{"))
+    assert debt == state["debt"] / 1e18
+    assert any(
+        k.startswith("maker_v3_collateral_price{") and 'source="spotter"' in k
+        for k in series
+    )
+    assert all(labels in k for k in series)
+    assert series[next(k for k in series if "snapshot_block" in k)] == chain.height
+
+
+def test_metrics_endpoint(vault, strategy, token, amount, user, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    store = MetricsStore()
+    store.update(read_trigger_state(strategy, chain.height, multicall.address))
+    server = serve(store, host="127.0.0.1", port=0)
+    host, port = server.server_address
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read() == store.render()
+    finally:
+        server.shutdown()
+
+
+def test_unreadable_fields_are_left_out(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    state = read_trigger_state(strategy, chain.height, multicall.address)
+    state = dict(state, current_ratio=None, chainlink_answer=None, spot_price=None)
+
+    text = format_metrics([state])
+    assert "maker_v3_current_c_ratio{" not in text
+    assert "maker_v3_debt_dai{" in text
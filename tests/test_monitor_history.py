@@ -0,0 +1,55 @@
+import pytest
+
+from brownie import chain
+from scripts.history import DAY, SnapshotStore
+from scripts.snapshot import take_snapshot
+
+
+def test_history_is_downsampled(
+    vault, strategy, token, amount, user, gov, TestMulticall2, tmp_path
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    store = SnapshotStore(tmp_path / "history.sqlite", sample_retention=DAY)
+    old = take_snapshot(strategy, chain.height, multicall.address)
+    store.append(old)
+
+    chain.sleep(3 * DAY)
+    chain.mine()
+    new = take_snapshot(strategy, chain.height, multicall.address)
+    store.append(new)
+
+    rows = store.query(strategy)
+    assert [row["resolution"] for row in rows] == ["hourly", "samples"]
+    assert rows[0]["block"] == old["block"]
+    assert rows[0]["timestamp"] == old["timestamp"] // 3600 * 3600
+    assert rows[1]["block"] == new["block"]
+    assert store.c_ratio(strategy)[1] == (
+        new["timestamp"],
+        pytest.approx(new["current_ratio"] / 1e18),
+    )
+    assert store.profit(strategy, start=new["timestamp"]) == [
+        (new["timestamp"], pytest.approx(rows[1]["investment"] - rows[1]["debt"]))
+    ]
+    store.close()
+
+
+def test_unreadable_fields_are_stored_as_null(strategy, gov, TestMulticall2, tmp_path):
+    multicall = TestMulticall2.deploy({"from": gov})
+    store = SnapshotStore(tmp_path / "history.sqlite", sample_retention=DAY)
+    snapshot = take_snapshot(strategy, chain.height, multicall.address)
+    store.append(dict(snapshot, current_ratio=None, price_per_share=None))
+    store.append(dict(snapshot, block=snapshot["block"] + 1))
+
+    chain.sleep(3 * DAY)
+    chain.mine()
+    store.append(take_snapshot(strategy, chain.height, multicall.address))
+
+    (rolled,) = store.query(strategy, end=snapshot["timestamp"])
+    assert rolled["resolution"] == "hourly"
+    assert rolled["min_ratio"] == pytest.approx(snapshot["current_ratio"] / 1e18)
+    store.close()
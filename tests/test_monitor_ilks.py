@@ -0,0 +1,46 @@
+from brownie import Contract, chain
+from scripts.ilks import at_risk, ilk_capacity, scan
+from scripts.snapshot import RAY, VAT, WAD
+from scripts.triggers import MIN_MINTABLE
+
+
+def test_scans_every_ilk(strategy, ilk, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    rows = scan(chain.height, multicall.address)
+    assert [row["capacity"] for row in rows] == sorted(
+        (row["capacity"] for row in rows), reverse=True
+    )
+
+    (row,) = [r for r in rows if r["ilk"] == ilk.lower()]
+    Art, rate, spot, line, dust = Contract(VAT).ilks(ilk)
+    assert row["line"] == line and row["dust"] == dust
+    assert row["debt_floor"] == dust // RAY
+    assert row["available"] <= max(0, line - Art * rate) // RAY
+    assert row["capacity"] >= row["available"]
+    assert row["mintable"] == (row["available"] >= MIN_MINTABLE)
+
+    # Flagged once the headroom left is under MIN_MINTABLE plus the margin
+    flagged = at_risk([strategy], rows, 0, chain.height, multicall.address)
+    assert bool(flagged) == (row["available"] < MIN_MINTABLE)
+    flagged = at_risk(
+        [strategy], rows, row["available"], chain.height, multicall.address
+    )
+    assert flagged == [(strategy.address, row)]
+
+
+def test_capacity_math():
+    vat_ilk = (10 * WAD, RAY, 0, 2_000_000 * WAD * RAY, 15_000 * WAD * RAY)
+    row = ilk_capacity(b"ETH-A".ljust(32, b"\0"), vat_ilk)
+    assert row["name"] == "ETH-A"
+    assert row["available"] == 2_000_000 * WAD - 10 * WAD
+    assert row["max_mint"] == row["available"] - WAD
+    assert row["debt_floor"] == 15_000 * WAD
+
+    # Under MIN_MINTABLE _forceMintWithinLimits mints nothing
+    full = (1_600_000 * WAD, RAY, 0, 2_000_000 * WAD * RAY, 0)
+    row = ilk_capacity(b"ETH-A", full, (10_000_000 * WAD * RAY, 0, 0, 0, 0))
+    assert not row["mintable"] and row["max_mint"] == 0
+    assert row["capacity"] == 8_400_000 * WAD
+
+    row = ilk_capacity(b"ETH-A", full, global_room=WAD)
+    assert row["available"] == WAD
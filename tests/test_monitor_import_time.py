@@ -0,0 +1,24 @@
+from scripts.importtime import DEFERRED, ROOT, measure
+
+import subprocess
+import sys
+
+
+def test_monitor_imports_without_brownie():
+    # Checked in a fresh interpreter, the test session has them all loaded
+    code = (
+        "import sys, scripts.monitor; "
+        f"print(','.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_import_time_is_measured():
+    # Timings depend on the machine, `python -m scripts.importtime` reports them
+    cumulative, total = measure("scripts.monitor")
+    assert "scripts.monitor" in cumulative
+    assert total > 0
@@ -0,0 +1,49 @@
+from brownie import chain
+from scripts.indexer import EventIndexer
+
+
+def test_indexer_records_strategy_vault_and_urn_events(
+    vault, strategy, cloner, token, amount, user, gov, TestMulticall2, tmp_path
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    start = cloner.tx.block_number
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    harvest = strategy.harvest({"from": gov})
+    vault.updateStrategyDebtRatio(strategy, 5_000, {"from": gov})
+
+    indexer = EventIndexer(
+        [strategy],
+        [{"address": cloner.address, "from_block": start}],
+        path=tmp_path / "events.sqlite",
+        multicall_address=multicall.address,
+        start_block=start,
+        initial_range=1,
+    )
+    assert indexer.update(chain.height) > 0
+
+    (harvested,) = indexer.events(strategy, "Harvested")
+    assert harvested["block"] == harvest.block_number
+    assert int(harvested["args"]["profit"]) == harvest.events["Harvested"]["profit"]
+
+    (debt_ratio,) = indexer.events(strategy, "StrategyUpdateDebtRatio")
+    assert debt_ratio["args"]["debtRatio"] == "5000"
+
+    frobs = indexer.events(strategy, "frob")
+    assert frobs and frobs[0]["block"] == harvest.block_number
+    assert int(frobs[0]["args"]["dink"]) == strategy.balanceOfMakerVault(
+        block_identifier=harvest.block_number
+    )
+    assert [e["event"] for e in indexer.events(strategy, "Deployed")] == ["Deployed"]
+
+    # Nothing new to index, and sparse ranges grew past the single block start
+    assert indexer.update(chain.height) == 0
+    assert indexer.block_range > 1
+
+    # A second run only reads blocks past the checkpoint
+    strategy.harvest({"from": gov})
+    assert len(indexer.events(strategy, "Harvested")) == 1
+    indexer.update(chain.height)
+    assert len(indexer.events(strategy, "Harvested")) == 2
+    indexer.close()
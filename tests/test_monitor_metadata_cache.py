@@ -0,0 +1,31 @@
+from scripts.metadata_cache import MetadataCache
+from scripts.snapshot import resolve_strategy, take_snapshot
+
+
+def test_wiring_is_cached_on_disk(strategy, token, gov, TestMulticall2, tmp_path):
+    multicall = TestMulticall2.deploy({"from": gov})
+    path = tmp_path / "metadata.json"
+
+    snapshot = take_snapshot(strategy, "latest", multicall.address, MetadataCache(path))
+
+    # A fresh process only needs the file to know how the strategy is wired
+    cached = resolve_strategy(strategy, cache=MetadataCache(path))
+    assert cached["want_symbol"] == token.symbol()
+    assert cached["want_decimals"] == token.decimals()
+    assert cached["cdp_id"] == strategy.cdpId()
+    for key in ("want", "vault", "yvault", "ilk", "urn", "gem_join"):
+        assert cached[key] == snapshot[key]
+
+
+def test_migrated_yvault_invalidates_cache(
+    strategy, gov, new_dai_yvault, TestMulticall2, tmp_path
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    cache = MetadataCache(tmp_path / "metadata.json")
+    take_snapshot(strategy, "latest", multicall.address, cache)
+
+    strategy.migrateToNewDaiYVault(new_dai_yvault, {"from": gov})
+
+    snapshot = take_snapshot(strategy, "latest", multicall.address, cache)
+    assert snapshot["yvault"] == new_dai_yvault.address
+    assert cache.get(strategy.address)["yvault"] == new_dai_yvault.address
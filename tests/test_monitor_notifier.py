@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts.notifier import TelegramNotifier
+
+import scripts.monitor
+
+
+class BotAPI(BaseHTTPRequestHandler):
+    # Local stand-in for https://api.telegram.org/bot<key>/sendMessage
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.requests.append((time.monotonic(), self.path, body))
+        time.sleep(server.delay)
+
+        status, reply = 200, {"ok": True, "result": {}}
+        if server.responses:
+            status, reply = server.responses.pop(0)
+
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def bot_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BotAPI)
+    server.requests = []
+    server.responses = []
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def notifier_for(server, **kwargs):
+    host, port = server.server_address
+    kwargs.setdefault("coalesce_delay", 0.1)
+    kwargs.setdefault("backoff", 0.01)
+    return TelegramNotifier("KEY", "-1", api_url=f"http://{host}:{port}", **kwargs)
+
+
+def test_reports_are_coalesced(bot_api):
+    notifier = notifier_for(bot_api, min_interval=0)
+    for i in range(3):
+        notifier.send(f"report {i}")
+    notifier.send("other chat", chat_id="-2")
+    notifier.close(timeout=5)
+
+    assert [
+        (path, body["chat_id"], body["text"]) for _, path, body in bot_api.requests
+    ] == [
+        ("/botKEY/sendMessage", "-1", "report 0\nreport 1\nreport 2"),
+        ("/botKEY/sendMessage", "-2", "other chat"),
+    ]
+    assert notifier.sent == 2
+
+
+def test_rate_limit_per_chat(bot_api):
+    notifier = notifier_for(bot_api, min_interval=0.5, coalesce_delay=0)
+    notifier.send("first")
+    notifier.flush(timeout=5)
+    notifier.send("second")
+    notifier.close(timeout=5)
+
+    (first, _, _), (second, _, _) = bot_api.requests
+    assert second - first >= 0.5
+
+
+def test_retries_on_rate_limit_and_server_errors(bot_api):
+    bot_api.responses = [
+        (429, {"ok": False, "parameters": {"retry_after": 0}}),
+        (502, {"ok": False}),
+    ]
+    notifier = notifier_for(bot_api, min_interval=0)
+    notifier.send("report")
+    notifier.close(timeout=5)
+
+    assert len(bot_api.requests) == 3
+    assert (notifier.sent, notifier.failed) == (1, 0)
+
+
+def test_bad_request_is_not_retried(bot_api):
+    bot_api.responses = [(400, {"ok": False, "description": "can't parse entities"})]
+    notifier = notifier_for(bot_api, min_interval=0)
+    notifier.send("report")
+    notifier.close(timeout=5)
+
+    assert len(bot_api.requests) == 1
+    assert (notifier.sent, notifier.failed) == (0, 1)
+
+
+def test_queue_is_bounded(bot_api):
+    notifier = notifier_for(bot_api, max_queue=2, min_interval=0, coalesce_delay=0.5)
+    for i in range(5):
+        notifier.send(f"report {i}")
+    notifier.close(timeout=5)
+
+    assert notifier.dropped == 3
+    assert bot_api.requests[0][2]["text"] == "report 3\nreport 4"
+
+
+def test_backoff_does_not_hold_up_other_chats(bot_api):
+    bot_api.responses = [(429, {"ok": False, "parameters": {"retry_after": 1}})]
+    notifier = notifier_for(bot_api, min_interval=0, coalesce_delay=0)
+    notifier.send("rate limited")
+    time.sleep(0.2)
+    notifier.send("other chat", chat_id="-2")
+    notifier.close(timeout=5)
+
+    ((first, _, _), (other, _, other_body), (retry, _, body)) = bot_api.requests
+    assert other_body["text"] == "other chat" and other - first < 0.5
+    assert body["text"] == "rate limited" and retry - first >= 1
+    assert (notifier.sent, notifier.failed) == (2, 0)
+
+
+def test_retry_does_not_evict_newer_messages(bot_api):
+    bot_api.responses = [(502, {"ok": False})]
+    bot_api.delay = 0.3
+    notifier = notifier_for(bot_api, max_queue=1, min_interval=0, coalesce_delay=0)
+    notifier.send("failing")
+    time.sleep(0.1)
+    # Fills the queue while the first message is in flight
+    notifier.send("other chat", chat_id="-2")
+    notifier.close(timeout=5)
+
+    assert [body["text"] for _, _, body in bot_api.requests] == [
+        "failing",
+        "other chat",
+    ]
+    assert (notifier.sent, notifier.dropped) == (1, 1)
+
+
+def test_closed_notifier_is_replaced(bot_api, monkeypatch):
+    monkeypatch.setattr(
+        scripts.monitor,
+        "TelegramNotifier",
+        lambda *args: notifier_for(bot_api, min_interval=0, coalesce_delay=0),
+    )
+    scripts.monitor.send_msg("first run")
+    scripts.monitor.close_notifier(timeout=5)
+    scripts.monitor.send_msg("second run")
+    scripts.monitor.close_notifier(timeout=5)
+
+    texts = [body["text"] for _, _, body in bot_api.requests]
+    assert texts == ["first run", "second run"]
@@ -0,0 +1,60 @@
+from brownie import ZERO_ADDRESS, chain
+from scripts.prices import PriceEngine
+from scripts.triggers import read_osm
+
+
+def test_engine_matches_strategy_price(
+    vault, test_strategy, token, amount, user, gov, custom_osm, lib, ilk, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    test_strategy.harvest({"from": gov})
+
+    test_strategy.setChainlinkOracle(ZERO_ADDRESS, {"from": gov})
+    test_strategy.setCustomOSM(custom_osm)
+    spot = lib.getSpotPrice(ilk)
+    engine = PriceEngine(multicall.address)
+
+    custom_osm.setCurrentPrice(spot * 2 // 3, False)
+    custom_osm.setFuturePrice(spot // 2, False)
+    chain.mine()
+    quote = engine.quotes([test_strategy], chain.height)[test_strategy.address]
+    assert quote["price"] == test_strategy._getPrice()
+    assert quote["binding"] == "osm_future"
+    assert quote["sources"] == {
+        "spotter": spot,
+        "osm_current": spot * 2 // 3,
+        "osm_future": spot // 2,
+    }
+
+    # Reverting OSM reads fall back to the spotter like the try/catch does
+    custom_osm.setCurrentPrice(0, True)
+    custom_osm.setFuturePrice(0, True)
+    chain.mine()
+    quote = engine.quotes([test_strategy], chain.height)[test_strategy.address]
+    assert quote["price"] == test_strategy._getPrice()
+    assert quote["binding"] == "spotter"
+
+    # A past block is served from the cache of its inputs
+    block = chain.height
+    custom_osm.setCurrentPrice(spot // 3, False)
+    assert engine.quotes([test_strategy], block)[test_strategy.address] == quote
+
+
+def test_prefetch_serves_inputs_from_memory(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    engine = PriceEngine(multicall.address)
+    block = engine.prefetch([strategy, strategy], chain.height)
+    assert block == chain.height
+
+    # Nothing left to read for the strategies of the batch
+    engine._fetch = None
+    inputs = engine.inputs(strategy, block)
+    assert set(inputs) == {"osm_current", "osm_future", "chainlink_answer"}
+
+
+def test_osm_is_not_read_without_a_proxy(strategy):
+    state = {"strategy": strategy.address, "osm_proxy": None}
+    assert read_osm(state, "read()(uint256,bool)", chain.height) is None
@@ -0,0 +1,40 @@
+import pytest
+
+from brownie import chain
+from scripts.projection import Projection
+from scripts.triggers import read_trigger_state, tend_trigger
+
+
+def shocked(state, shock):
+    state = dict(state, spot=int(state["spot"] * shock))
+    for key in ("osm_current", "osm_future"):
+        if state[key] is not None:
+            state[key] = (int(state[key][0] * shock), state[key][1])
+    if state["chainlink_answer"] is not None:
+        state["chainlink_answer"] = int(state["chainlink_answer"] * shock)
+    return state
+
+
+def test_projection_matches_trigger_replica(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    state = read_trigger_state(strategy, chain.height, multicall.address)
+    shocks = [0.5, 0.7, 0.85, 1.0, 1.2, 1.5]
+    projection = Projection([state], shocks).for_strategy(strategy.address)
+
+    assert projection["ratio"][3] * 1e18 == pytest.approx(state["current_ratio"])
+    assert 0 < projection["liquidation_shock"] < projection["repay_shock"] < 1
+    for shock, repay in zip(shocks, projection["repay"]):
+        # Under the band tendTrigger fires regardless of the base fee
+        assert repay == (shock < projection["repay_shock"])
+        if repay:
+            assert tend_trigger(shocked(state, shock))
+    assert (projection["headroom"] < 0).tolist() == [
+        shock < projection["liquidation_shock"] for shock in shocks
+    ]
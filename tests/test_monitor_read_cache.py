@@ -0,0 +1,45 @@
+from brownie import chain
+from scripts.multicall import install_read_cache
+from scripts.read_cache import ReadCache
+from scripts.snapshot import take_snapshot
+
+
+def test_snapshots_share_block_reads(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    cache = ReadCache()
+    previous = install_read_cache(cache)
+    try:
+        block = chain.height
+        uncached = take_snapshot(strategy, block, multicall.address)
+        misses = cache.misses
+        assert take_snapshot(strategy, block, multicall.address) == uncached
+        assert cache.misses == misses
+
+        # Only the wiring that can never change survives a new block
+        chain.mine()
+        take_snapshot(strategy, chain.height, multicall.address)
+        assert 0 < cache.misses - misses < misses
+    finally:
+        install_read_cache(previous)
+
+    assert take_snapshot(strategy, block, multicall.address) == uncached
+
+
+def test_lru_eviction(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    cache = ReadCache(maxsize=8, permanent=frozenset())
+    previous = install_read_cache(cache)
+    try:
+        for _ in range(3):
+            chain.mine()
+            take_snapshot(strategy, chain.height, multicall.address)
+    finally:
+        install_read_cache(previous)
+    assert len(cache) == 8
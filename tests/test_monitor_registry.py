@@ -0,0 +1,53 @@
+from scripts.monitor import monitor_fleet
+from scripts.registry import discover_clones, load_strategies
+
+
+def test_discover_clones(
+    cloner, vault, yvault, strategist, token, gemJoinAdapter, osmProxy, ilk, chainlink
+):
+    clone_tx = cloner.cloneMakerDaiDelegate(
+        vault,
+        strategist,
+        strategist,
+        strategist,
+        yvault,
+        f"StrategyMaker{token.symbol()}",
+        ilk,
+        gemJoinAdapter,
+        osmProxy,
+        chainlink,
+    )
+
+    assert discover_clones(cloner, cloner.tx.block_number) == [
+        cloner.original(),
+        clone_tx.events["Cloned"]["clone"],
+    ]
+
+
+def test_registry_file(cloner, tmp_path):
+    registry = tmp_path / "strategies.yml"
+    registry.write_text(
+        f"strategies:\n"
+        f'  - "{cloner.original().lower()}"\n'
+        f"cloners:\n"
+        f'  - address: "{cloner.address}"\n'
+        f"    from_block: {cloner.tx.block_number}\n"
+    )
+
+    # The original strategy is listed and discovered but reported only once
+    assert load_strategies(registry) == [cloner.original()]
+
+
+def test_monitor_fleet(vault, strategy, token, amount, user, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    strategy.harvest({"from": gov})
+
+    reports = monitor_fleet(
+        [strategy.address, gov.address], multicall_address=multicall.address
+    )
+
+    assert len(reports) == 2
+    assert str(strategy.cdpId()) in reports[0][2]
+    assert "Failed to read strategy" in reports[1][1]
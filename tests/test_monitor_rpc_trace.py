@@ -0,0 +1,47 @@
+from brownie import chain
+from scripts.multicall import Call, aggregate, install_read_cache
+from scripts.read_cache import ReadCache
+from scripts.rpc_trace import install_tracer, tracing
+
+import json
+
+
+def test_traces_round_trips_and_cache_status(strategy, gov, TestMulticall2, tmp_path):
+    multicall = TestMulticall2.deploy({"from": gov})
+    calls = [Call(strategy, "want()(address)"), Call(strategy, "name()(string)")]
+    block = chain.height
+    path = tmp_path / "trace.json"
+
+    previous = install_read_cache(ReadCache())
+    try:
+        with tracing(str(path)) as tracer:
+            aggregate(calls, block, multicall.address)
+            aggregate(calls, block, multicall.address)
+    finally:
+        install_read_cache(previous)
+
+    (multicall_trip,) = [r for r in tracer.round_trips if r["method"] == "eth_call"]
+    assert multicall_trip["target"].lower() == multicall.address.lower()
+    assert multicall_trip["function"].startswith("tryBlockAndAggregate")
+    assert multicall_trip["calls"] == [
+        f"{strategy.address}.want()",
+        f"{strategy.address}.name()",
+    ]
+    assert multicall_trip["request_bytes"] > 0 < multicall_trip["response_bytes"]
+    assert multicall_trip["latency"] >= 0
+
+    assert [c["cache"] for c in tracer.calls] == ["miss", "miss", "hit", "hit"]
+    assert {c["block"] for c in tracer.calls} == {block}
+
+    summary = "\n".join(tracer.summary())
+    assert "Contract calls: 4, 2 cache hits, 2 misses" in summary
+    assert f"{strategy.address}.want()" in summary
+
+    trace = json.loads(path.read_text())
+    assert len(trace["traceEvents"]) == len(tracer.round_trips) + 4
+    assert {e["ph"] for e in trace["traceEvents"]} == {"X"}
+
+    # Nothing is recorded once tracing stops
+    aggregate(calls, block, multicall.address)
+    assert len(tracer.calls) == 4
+    assert install_tracer(None) is None
@@ -0,0 +1,56 @@
+from brownie import chain
+from scripts.multicall import Call, aggregate
+from scripts.scheduler import POST_HOP, PRE_HOP, HopScheduler, forecast_tend
+from scripts.triggers import read_trigger_state
+
+
+def test_evaluations_are_queued_around_the_hop(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    evaluated = []
+    scheduler = HopScheduler(
+        [strategy],
+        lambda state, reason, forecast: evaluated.append(reason),
+        multicall_address=multicall.address,
+        lead=30,
+        lag=15,
+    )
+    (state,) = scheduler.refresh(chain.height)
+    (pip,) = scheduler.pips
+    _, (zzz, hop) = aggregate(
+        [Call(pip, "zzz()(uint64)"), Call(pip, "hop()(uint16)")],
+        chain.height,
+        multicall.address,
+    )
+    assert scheduler.hops[pip] == zzz + hop
+
+    assert scheduler.run_pending(now=zzz + hop - 31) == []
+    scheduler.run_pending(now=zzz + hop - 30)
+    assert evaluated == [PRE_HOP]
+
+    # Nobody poked the OSM on the fork: the post-hop evaluation waits for it
+    scheduler.run_pending(now=zzz + hop + 15)
+    assert evaluated == [PRE_HOP]
+    assert scheduler.hops[pip] == zzz + hop
+
+
+def test_forecast_uses_the_future_price(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    state = read_trigger_state(strategy, chain.height, multicall.address)
+    price = state["spot_price"]
+    assert forecast_tend(dict(state, osm_future=(price, True))) is False
+    assert forecast_tend(dict(state, osm_future=(price // 2, True))) is True
+    assert forecast_tend(dict(state, osm_future=None)) is None
@@ -0,0 +1,51 @@
+from brownie import chain
+from scripts.shards import HashRing, ShardedMonitor
+from scripts.snapshot import take_snapshot
+
+import hashlib
+
+
+def addresses(count):
+    # Fixed addresses so the spread checked below is always the same
+    return [
+        "0x" + hashlib.sha256(str(i).encode()).hexdigest()[:40] for i in range(count)
+    ]
+
+
+def test_hash_ring_spreads_and_keeps_assignments():
+    strategies = addresses(2000)
+    ring = HashRing(4)
+    assignment = ring.assign(strategies)
+    assert sorted(assignment) == [0, 1, 2, 3]
+    assert all(300 < len(shard) < 700 for shard in assignment.values())
+
+    # A fifth shard only takes strategies from the others
+    grown = HashRing(5)
+    moved = [s for s in strategies if grown.shard(s) != ring.shard(s)]
+    assert all(grown.shard(s) == 4 for s in moved)
+    assert len(moved) < len(strategies) // 3
+
+
+def test_sharded_read_matches_single_process(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    block = chain.height
+    with ShardedMonitor(
+        [gov, strategy], shards=2, multicall_address=multicall.address
+    ) as monitor:
+        snapshots, errors = monitor.read(block)
+        # Workers keep their connection between reads
+        assert monitor.read(block) == (snapshots, errors)
+        # One process per shard
+        assert sorted(monitor._executors) == sorted(monitor.assignment)
+        # Any part of the fleet, like the strategies a MonitorDaemon refreshes
+        assert monitor.read_many([strategy], block) == (snapshots, {})
+
+    assert snapshots == [take_snapshot(strategy, block, multicall.address)]
+    assert list(errors) == [gov.address]
@@ -0,0 +1,68 @@
+from brownie import chain
+from scripts.multicall import Call, aggregate
+from scripts.snapshot import take_snapshot
+
+
+def test_snapshot_matches_direct_reads(
+    vault, strategy, token, amount, user, gov, yvault, lib, ilk, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    block = chain.height
+    snapshot = take_snapshot(strategy, block, multicall.address)
+
+    assert snapshot["block"] == block
+    assert snapshot["want"] == token.address
+    assert snapshot["vault"] == vault.address
+    assert snapshot["yvault"] == yvault.address
+    assert snapshot["cdp_id"] == strategy.cdpId()
+    assert snapshot["ilk"].hex() == ilk[2:]
+    assert snapshot["shares"] == yvault.balanceOf(strategy)
+    assert snapshot["price_per_share"] == yvault.pricePerShare()
+    assert snapshot["collateral"] == strategy.balanceOfMakerVault()
+    assert snapshot["debt"] == strategy.balanceOfDebt()
+    assert snapshot["current_ratio"] == strategy.getCurrentMakerVaultRatio()
+    assert snapshot["tend_trigger"] == strategy.tendTrigger(1)
+    assert snapshot["spot_price"] == lib.getSpotPrice(ilk)
+    assert snapshot["liquidation_ratio"] == lib.getLiquidationRatio(ilk)
+    assert snapshot["debt_ratio"] == vault.strategies(strategy).dict()["debtRatio"]
+    assert snapshot["ink"] == snapshot["collateral"]
+    assert snapshot["art"] * snapshot["rate"] // 10 ** 27 == snapshot["debt"]
+
+
+def test_snapshot_is_pinned_to_block(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount // 2, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    block = chain.height
+    collateral = strategy.balanceOfMakerVault()
+
+    vault.deposit(amount // 2, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    assert strategy.balanceOfMakerVault() > collateral
+
+    snapshot = take_snapshot(strategy, block, multicall.address)
+    assert snapshot["block"] == block
+    assert snapshot["collateral"] == collateral
+
+
+def test_failing_call_does_not_revert_batch(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    _, values = aggregate(
+        [
+            Call(strategy, "cdpId()(uint256)"),
+            Call(strategy, "thisDoesNotExist()(uint256)"),
+        ],
+        "latest",
+        multicall.address,
+    )
+    assert values == [strategy.cdpId(), None]
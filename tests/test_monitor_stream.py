@@ -0,0 +1,36 @@
+from brownie import chain
+from scripts.stream import stream_fleet
+
+import io
+import json
+
+
+def test_streams_raw_records(
+    vault, strategy, token, amount, user, gov, dai, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    out = io.StringIO()
+    stream_fleet([strategy, gov], out, chain.height, multicall.address)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(records) == 2
+
+    (record,) = [r for r in records if r["type"] == "snapshot"]
+    assert record["strategy"] == strategy.address
+    assert record["block"] == chain.height
+    # Amounts are always strings, every digit kept, other integers numbers
+    assert record["data"]["debt"] == str(strategy.balanceOfDebt())
+    assert record["data"]["collateral"] == str(strategy.balanceOfMakerVault())
+    assert record["data"]["dai_balance"] == str(dai.balanceOf(strategy))
+    assert all(isinstance(record["data"][key], str) for key in record["decimals"])
+    assert record["data"]["want_decimals"] == token.decimals()
+    assert record["data"]["ilk"].startswith("0x") and len(record["data"]["ilk"]) == 66
+    assert record["decimals"]["debt"] == 18
+    assert record["decimals"]["estimated_total_assets"] == token.decimals()
+
+    (error,) = [r for r in records if r["type"] == "error"]
+    assert error["strategy"] == gov.address
@@ -0,0 +1,61 @@
+from brownie import Contract, chain
+from scripts.snapshot import RAY
+from scripts.yields import DAY, JUG, YEAR, Window, YieldTracker, negative_carry
+
+import pytest
+
+
+def test_window_keeps_constant_memory():
+    window = Window(DAY, capacity=24)
+    # 10% a year, one sample a minute for a week
+    for minute in range(7 * 24 * 60):
+        window.add(minute * 60, 1 + 0.1 * minute * 60 / YEAR)
+        assert len(window.samples) <= 26
+        # The sample anchoring the start of the window is never evicted
+        if minute * 60 >= DAY:
+            elapsed, _ = window.growth()
+            assert DAY <= elapsed < DAY + 3600
+    assert window.full()
+    assert window.apr() == pytest.approx(0.1, rel=0.02)
+
+    # Stale or repeated samples are ignored
+    window.add(0, 1)
+    assert window.latest[0] == (7 * 24 * 60 - 1) * 60
+
+
+def test_tracks_yield_and_fee(
+    vault, strategy, token, amount, user, gov, ilk, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    tracker = YieldTracker([strategy], multicall.address)
+    first = tracker.update(chain.height)
+    assert tracker.update(first) == first
+    report = tracker.report(strategy.address)
+    assert report["windows"]["1d"]["spread_apr"] is None
+
+    chain.sleep(DAY // 2)
+    chain.mine()
+    assert tracker.update(chain.height) == chain.height
+
+    (report,) = tracker.reports()
+    duty, _ = Contract(JUG).ilks(ilk)
+    fee_apy = ((Contract(JUG).base() + duty) / RAY) ** YEAR - 1
+    assert report["fee_apy"] == pytest.approx(fee_apy)
+    row = report["windows"]["1d"]
+    assert row["fee_apy"] == pytest.approx(fee_apy, rel=1e-3)
+    assert row["yield_apr"] is not None and not row["full"]
+    assert row["spread_apr"] == pytest.approx(row["yield_apr"] - row["fee_apr"])
+
+
+def test_negative_carry():
+    windows = {
+        "1d": {"spread_apr": -0.01},
+        "7d": {"spread_apr": 0.02},
+        "30d": {"spread_apr": None},
+    }
+    assert negative_carry({"windows": windows}) == ["1d"]
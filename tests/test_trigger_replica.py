@@ -0,0 +1,115 @@
+from brownie import ZERO_ADDRESS, chain
+from scripts.triggers import (
+    collateral_price,
+    current_maker_vault_ratio,
+    estimated_total_assets,
+    evaluate,
+    find_force_harvest_slot,
+    read_trigger_state,
+)
+
+import scripts.triggers
+
+
+def assert_replica_matches(strategy, multicall):
+    state = read_trigger_state(strategy, chain.height, multicall.address)
+
+    assert evaluate(state) == (strategy.tendTrigger(1), strategy.harvestTrigger(1))
+    assert current_maker_vault_ratio(state) == strategy.getCurrentMakerVaultRatio()
+    assert estimated_total_assets(state) == strategy.estimatedTotalAssets()
+    return state
+
+
+def test_replica_matches_chain(
+    vault, test_strategy, token, amount, user, gov, custom_osm, lib, ilk, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    test_strategy.harvest({"from": gov})
+    state = assert_replica_matches(test_strategy, multicall)
+    assert collateral_price(state) == test_strategy._getPrice()
+
+    # Pessimistic OSM price pushes the position under the tolerance band
+    test_strategy.setCustomOSM(custom_osm)
+    spot = lib.getSpotPrice(ilk)
+    custom_osm.setCurrentPrice(spot * 2 // 3, False)
+    custom_osm.setFuturePrice(spot, False)
+    state = assert_replica_matches(test_strategy, multicall)
+    assert collateral_price(state) == test_strategy._getPrice()
+    assert test_strategy.tendTrigger(1)
+
+    # Reverting OSM reads are ignored like the try/catch in the Strategy
+    custom_osm.setCurrentPrice(0, True)
+    custom_osm.setFuturePrice(0, True)
+    assert_replica_matches(test_strategy, multicall)
+
+    # Optimistic price leaves room to mint more DAI
+    custom_osm.setCurrentPrice(spot * 2, False)
+    custom_osm.setFuturePrice(spot * 2, False)
+    assert_replica_matches(test_strategy, multicall)
+
+
+def test_replica_harvest_trigger(
+    vault, strategy, token, amount, user, gov, TestMulticall2
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    token.approve(vault, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    state = assert_replica_matches(strategy, multicall)
+    assert state["force_harvest_slot"] is not None
+
+    strategy.setForceHarvestTriggerOnce(True, {"from": gov})
+    state = assert_replica_matches(strategy, multicall)
+    assert state["force_harvest_trigger_once"]
+    strategy.setForceHarvestTriggerOnce(False, {"from": gov})
+
+    strategy.setCreditThreshold(0, {"from": gov})
+    assert_replica_matches(strategy, multicall)
+
+    chain.sleep(strategy.minReportDelay() + 1)
+    chain.mine(1)
+    assert_replica_matches(strategy, multicall)
+
+    chain.sleep(strategy.maxReportDelay())
+    chain.mine(1)
+    assert_replica_matches(strategy, multicall)
+
+    # Inactive strategy
+    vault.updateStrategyDebtRatio(strategy, 0, {"from": gov})
+    strategy.harvest({"from": gov})
+    assert_replica_matches(strategy, multicall)
+
+
+def test_force_harvest_slot_ignores_ilk_registry(strategy, gov, TestMulticall2):
+    multicall = TestMulticall2.deploy({"from": gov})
+    state = read_trigger_state(strategy, chain.height, multicall.address)
+    slot = state["force_harvest_slot"]
+    assert slot is not None
+
+    # Found from the strategy's own gemJoinAdapter, whatever IlkRegistry lists
+    for gem_join in (None, ZERO_ADDRESS, gov.address):
+        unlisted = dict(state, gem_join=gem_join)
+        assert (
+            find_force_harvest_slot(unlisted, chain.height, multicall.address) == slot
+        )
+
+
+def test_unknown_layout_uses_on_chain_harvest_trigger(
+    strategy, gov, TestMulticall2, monkeypatch
+):
+    multicall = TestMulticall2.deploy({"from": gov})
+    # A miss is remembered and never scanned again
+    monkeypatch.setattr(scripts.triggers, "_force_harvest_slots", {})
+    monkeypatch.setattr(scripts.triggers, "MAX_STORAGE_SLOT", 0)
+    state = read_trigger_state(strategy, chain.height, multicall.address)
+    assert state["force_harvest_slot"] is None
+    monkeypatch.setattr(scripts.triggers, "find_force_harvest_slot", None)
+
+    strategy.setForceHarvestTriggerOnce(True, {"from": gov})
+    state = assert_replica_matches(strategy, multicall)
+    assert state["force_harvest_trigger_once"] is None
+    assert evaluate(state)[1] == strategy.harvestTrigger(1)